@@ -0,0 +1,12 @@
+# Hook used by the websocket benchmark, records how long after being sent every message reached the hook
+import time
+import threading
+
+lags = []
+expected = 0
+done = threading.Event()
+
+def process_message(message):
+	lags.append(time.time() - message['sent'])
+	if len(lags) >= expected:
+		done.set()
@@ -0,0 +1,245 @@
+# Benchmarks get_jobs, get_stats, download, hash_lookup and the websocket listener against bench/server.py
+# Every benchmark runs in its own process so peak RSS belongs to that command alone
+# Results are written to bench/results/<time>.json and can be compared with an earlier run
+#
+# python bench/run.py -jobs 100000 -leftlistmb 300 -latency 20
+# python bench/run.py -compare bench/results/20240101-120000.json
+
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+import contextlib
+
+BENCH = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(BENCH)
+BENCHMARKS = ["get_jobs", "get_stats", "download", "hash_lookup", "websocket"]
+
+# Nearest rank percentile of a sorted list
+def percentile(values, pct):
+	if not values:
+		return None
+	return values[min(len(values) - 1, max(0, int(round(pct / 100 * len(values))) - 1))]
+
+# Peak RSS of this process in megabytes, None where the resource module does not exist
+def peak_rss():
+	try:
+		import resource
+	except ImportError:
+		return None
+	rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	# ru_maxrss is bytes on macOS and kilobytes everywhere else
+	return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+# Summary of one benchmark, times are seconds and throughput is units a second
+def result(name, times, units, unit):
+	times = sorted(times)
+	total = sum(times)
+	return {
+		"name": name,
+		"runs": len(times),
+		"unit": unit,
+		"throughput": units / total if total else None,
+		"p50": percentile(times, 50),
+		"p90": percentile(times, 90),
+		"p99": percentile(times, 99),
+		"max": times[-1] if times else None,
+		"rss": peak_rss(),
+	}
+
+## Benchmarks, run inside the child process
+
+def bench_get_jobs(hashes, parsed):
+	times = []
+	count = 0
+	for i in range(parsed.repeat):
+		start = time.perf_counter()
+		count += len(hashes.get_jobs(refresh = True))
+		times.append(time.perf_counter() - start)
+	return result("get_jobs", times, count, "jobs")
+
+def bench_get_stats(hashes, parsed):
+	jobs = hashes.get_jobs(refresh = True)
+	times = []
+	for i in range(parsed.repeat):
+		start = time.perf_counter()
+		hashes.get_stats(jobs)
+		times.append(time.perf_counter() - start)
+	return result("get_stats", times, len(jobs) * parsed.repeat, "jobs")
+
+def bench_download(hashes, parsed):
+	jobids = ",".join(str(i + 1) for i in range(max(1, parsed.big)))
+	times = []
+	size = 0
+	for i in range(max(1, parsed.repeat // 5)):
+		outdir = tempfile.mkdtemp(dir=".")
+		try:
+			start = time.perf_counter()
+			hashes.download(jobids, None, None, False, None, outdir = outdir)
+			times.append(time.perf_counter() - start)
+			for name in os.listdir(outdir):
+				size += os.path.getsize(os.path.join(outdir, name))
+		finally:
+			shutil.rmtree(outdir, ignore_errors=True)
+	return result("download", times, size / (1024 * 1024), "MB")
+
+def bench_hash_lookup(hashes, parsed):
+	sys.path.insert(0, BENCH)
+	from server import left_hash
+	wanted = [left_hash(0, i) for i in range(parsed.lookups)]
+	times = []
+	for i in range(max(1, parsed.repeat // 5)):
+		start = time.perf_counter()
+		hashes.hash_lookup(wanted, "lookup.txt", False, False)
+		times.append(time.perf_counter() - start)
+	return result("hash_lookup", times, len(wanted) * len(times), "hashes")
+
+# Times from a message being sent until the hook ran, throughput is messages a second through the hook
+def bench_websocket(hashes, parsed):
+	import asyncio
+	sys.path.insert(0, BENCH)
+	import bench_hook
+	bench_hook.expected = parsed.messages
+
+	async def run():
+		task = asyncio.ensure_future(hashes.main("bench_hook"))
+		start = time.perf_counter()
+		while not bench_hook.done.is_set() and not task.done():
+			await asyncio.sleep(0.01)
+		elapsed = time.perf_counter() - start
+		task.cancel()
+		try:
+			await task
+		except asyncio.CancelledError:
+			None
+		return elapsed
+
+	elapsed = asyncio.run(run())
+	summary = result("websocket", sorted(bench_hook.lags), 0, "messages")
+	summary['throughput'] = len(bench_hook.lags) / elapsed if elapsed else None
+	return summary
+
+# Runs one benchmark with output of the cli sent to devnull and prints its result as JSON
+# The work directory with the left lists and caches the benchmark wrote is removed afterwards
+def child(parsed):
+	cwd = os.getcwd()
+	workdir = tempfile.mkdtemp(prefix="hashes-bench-")
+	try:
+		os.chdir(workdir)
+		sys.path.insert(0, ROOT)
+		import hashes
+		with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+			hashes.setup(interactive = False)
+			summary = globals()["bench_" + parsed.child](hashes, parsed)
+	finally:
+		os.chdir(cwd)
+		shutil.rmtree(workdir, ignore_errors=True)
+	print(json.dumps(summary))
+
+## Runner
+
+def free_port():
+	with socket.socket() as sock:
+		sock.bind(("127.0.0.1", 0))
+		return sock.getsockname()[1]
+
+def wait_for(port, timeout = 30):
+	deadline = time.time() + timeout
+	while time.time() < deadline:
+		try:
+			socket.create_connection(("127.0.0.1", port), 1).close()
+			return True
+		except OSError:
+			time.sleep(0.1)
+	return False
+
+# Prints results as a table, with the change from an earlier run when one is given
+def report(results, previous = None):
+	from prettytable import PrettyTable
+	before = dict((row['name'], row) for row in previous['results']) if previous else {}
+	table = PrettyTable()
+	table.field_names = ["Benchmark", "Runs", "Throughput", "p50", "p90", "p99", "Peak RSS"] + (["Throughput change", "p50 change"] if previous else [])
+	table.align = "l"
+	def change(new, old):
+		if new is None or not old:
+			return "N/A"
+		return "{0:+.1f}%".format((new - old) / old * 100)
+	for row in results:
+		if "error" in row:
+			table.add_row([row['name'], 0, row['error'], "", "", "", ""] + (["", ""] if previous else []))
+			continue
+		line = [row['name'], row['runs'], "{0:.2f} {1}/s".format(row['throughput'] or 0, row['unit'])] + ["{0:.4f}s".format(row[pct]) if row[pct] is not None else "N/A" for pct in ("p50", "p90", "p99")]
+		line.append("{0:.1f} MB".format(row['rss']) if row['rss'] is not None else "N/A")
+		if previous:
+			old = before.get(row['name'], {})
+			line += [change(row['throughput'], old.get('throughput')), change(row['p50'], old.get('p50'))]
+		table.add_row(line)
+	print(table)
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(description='Benchmark the hashes.com-cli against a local stand-in server', prog='run.py')
+	parser.add_argument("-only", help='Benchmarks to run. Multiple can be given e.g. get_jobs,download', default=",".join(BENCHMARKS))
+	parser.add_argument("-repeat", help='Number of times every benchmark is repeated. download and hash_lookup run a fifth as often.', default=20, type=int)
+	parser.add_argument("-jobs", help='Number of jobs the server lists.', default=10000, type=int)
+	parser.add_argument("-big", help='Number of jobs with a big left list, these are downloaded.', default=2, type=int)
+	parser.add_argument("-leftlistmb", help='Size of big left lists in megabytes.', default=32, type=int)
+	parser.add_argument("-lookups", help='Number of hashes looked up.', default=10000, type=int)
+	parser.add_argument("-messages", help='Number of websocket messages.', default=2000, type=int)
+	parser.add_argument("-latency", help='Milliseconds added before every response.', default=0, type=float)
+	parser.add_argument("-bandwidth", help='Response bandwidth limit in KB/s. 0 is unlimited.', default=0, type=float)
+	parser.add_argument("-etag", help='Server sends ETags on job lists.', action='store_true')
+	parser.add_argument("-out", help='Directory results are written to.', default=os.path.join(BENCH, "results"))
+	parser.add_argument("-compare", help='Earlier results file to compare with.', default=None)
+	parser.add_argument("-child", help=argparse.SUPPRESS, default=None)
+	parsed = parser.parse_args(argv)
+
+	if parsed.child is not None:
+		child(parsed)
+		return
+
+	port, wsport = free_port(), free_port()
+	server = subprocess.Popen([sys.executable, os.path.join(BENCH, "server.py"), "-port", str(port), "-wsport", str(wsport),
+		"-jobs", str(parsed.jobs), "-big", str(parsed.big), "-leftlistmb", str(parsed.leftlistmb), "-latency", str(parsed.latency),
+		"-bandwidth", str(parsed.bandwidth), "-messages", str(parsed.messages)] + (["-etag"] if parsed.etag else []), stdout=subprocess.DEVNULL)
+	results = []
+	try:
+		if not wait_for(port):
+			print("Stand-in server did not start.", file=sys.stderr)
+			sys.exit(1)
+		env = dict(os.environ, HASHES_BASE_URL="http://127.0.0.1:%s" % (port), HASHES_WSS_URL="ws://127.0.0.1:%s/en/api/jobs_wss/?key=%%s" % (wsport), HASHES_API_KEY="bench")
+		for name in parsed.only.split(","):
+			if name not in BENCHMARKS:
+				print("Unknown benchmark %s" % (name), file=sys.stderr)
+				continue
+			print("Running %s..." % (name), file=sys.stderr)
+			args = [sys.executable, os.path.abspath(__file__), "-child", name] + [item for key in ("repeat", "big", "lookups", "messages") for item in ("-" + key, str(getattr(parsed, key)))]
+			proc = subprocess.run(args, env=env, capture_output=True, text=True)
+			try:
+				results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+			except (ValueError, IndexError):
+				error = proc.stderr.strip().splitlines()
+				results.append({"name": name, "error": error[-1] if error else "exit status %s" % (proc.returncode)})
+	finally:
+		server.terminate()
+		server.wait()
+
+	previous = None
+	if parsed.compare is not None:
+		with open(parsed.compare, "r") as prevfile:
+			previous = json.load(prevfile)
+	report(results, previous)
+
+	os.makedirs(parsed.out, exist_ok=True)
+	outfile = os.path.join(parsed.out, time.strftime("%Y%m%d-%H%M%S") + ".json")
+	settings = dict((key, getattr(parsed, key)) for key in ("repeat", "jobs", "big", "leftlistmb", "lookups", "messages", "latency", "bandwidth", "etag"))
+	with open(outfile, "w") as resfile:
+		json.dump({"time": time.time(), "python": sys.version.split()[0], "settings": settings, "results": results}, resfile, indent=4)
+	print("Wrote results to: %s" % (outfile))
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,239 @@
+# Local stand-in for the parts of hashes.com the cli talks to, used by the benchmark suite
+# Serves synthetic job lists, left lists, searches and conversion rates with configurable latency and bandwidth
+# and pushes new jobs on a jobs_wss websocket when websockets is installed
+#
+# python bench/server.py -jobs 10000 -leftlistmb 300 -latency 50 -bandwidth 10000
+
+import sys
+import json
+import time
+import hashlib
+import argparse
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ALGORITHMS = [(0, "MD5"), (100, "SHA1"), (1000, "NTLM"), (1400, "SHA256")]
+CURRENCIES = ["BTC", "LTC", "XMR"]
+RATES = {"BTC": "60000.00", "LTC": "70.00", "XMR": "150.00"}
+# Every left list line is a 32 character hex digest and a newline so any byte offset maps to a line
+LINE = 33
+
+# Synthetic hash number i of job jobid
+def left_hash(jobid, i):
+	return hashlib.md5(("%s:%s" % (jobid, i)).encode()).hexdigest()
+
+# Half of all hashes are "found" by the stand-in search endpoint
+def found(digest):
+	return digest[0] < "8"
+
+# Builds the job list, the first big jobs have left lists of leftlistmb megabytes
+def make_jobs(count, left, big, leftlistmb):
+	jobs = []
+	for i in range(count):
+		algid, name = ALGORITHMS[i % len(ALGORITHMS)]
+		leftcount = (leftlistmb * 1024 * 1024) // LINE if i < big else left
+		jobs.append({
+			"id": i + 1,
+			"createdAt": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(1700000000 + i * 60)),
+			"lastUpdate": time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(1700000000 + i * 90)),
+			"algorithmName": name,
+			"algorithmId": algid,
+			"totalHashes": leftcount + i % 7,
+			"foundHashes": i % 7,
+			"leftHashes": leftcount,
+			"currency": CURRENCIES[i % len(CURRENCIES)],
+			"pricePerHash": "{0:.8f}".format(0.0000001 * (i % 50 + 1)),
+			"pricePerHashUsd": "{0:.4f}".format(0.001 * (i % 50 + 1)),
+			"maxCracksNeeded": leftcount,
+			"leftList": "/unfound/%s-unfound.txt" % (i + 1),
+			"hints": "",
+		})
+	return jobs
+
+class Handler(BaseHTTPRequestHandler):
+	protocol_version = "HTTP/1.1"
+
+	def log_message(self, *args):
+		None
+
+	# Writes body in blocks, sleeping between blocks to keep to the bandwidth limit
+	def send_body(self, blocks):
+		bandwidth = self.server.bandwidth
+		for block in blocks:
+			self.wfile.write(block)
+			if bandwidth:
+				time.sleep(len(block) / bandwidth)
+
+	def send_json(self, body, status = 200, headers = {}):
+		data = json.dumps(body).encode()
+		self.send_response(status)
+		self.send_header("Content-Type", "application/json")
+		self.send_header("Content-Length", str(len(data)))
+		for name, value in headers.items():
+			self.send_header(name, value)
+		self.end_headers()
+		self.send_body(data[i:i + 65536] for i in range(0, len(data), 65536))
+
+	def do_GET(self):
+		time.sleep(self.server.latency)
+		self.server.count(self.command)
+		path = urllib.parse.urlsplit(self.path).path
+		if path in ("/en/api/jobs", "/en/api/jobs_self"):
+			etag = self.server.etag
+			if etag is not None and self.headers.get("If-None-Match") == etag:
+				self.send_response(304)
+				self.send_header("Content-Length", "0")
+				self.end_headers()
+				return
+			self.send_json(self.server.jobs_response, headers={"ETag": etag} if etag is not None else {})
+		elif path.startswith("/unfound/"):
+			self.send_leftlist(path)
+		elif path == "/en/api/conversion":
+			self.send_json(RATES)
+		elif path == "/en/api/balance":
+			self.send_json(dict({"success": True, "credits": "1000"}, **dict((cur, "0.5") for cur in CURRENCIES)))
+		elif path == "/en/api/algorithms":
+			self.send_json({"success": True, "list": [{"id": algid, "algorithmName": name} for algid, name in ALGORITHMS]})
+		else:
+			self.send_json({"success": False, "message": "Not found"}, 404)
+
+	def do_HEAD(self):
+		self.do_GET()
+
+	def do_POST(self):
+		time.sleep(self.server.latency)
+		self.server.count(self.command)
+		path = urllib.parse.urlsplit(self.path).path
+		length = int(self.headers.get("Content-Length", 0))
+		form = urllib.parse.parse_qs(self.rfile.read(length).decode())
+		if path == "/en/api/search":
+			hashes = form.get("hashes[]", [])
+			founds = [{"hash": digest, "salt": "", "plaintext": "pass" + digest[0:6], "algorithm": "MD5"} for digest in hashes if found(digest)]
+			self.send_json({"success": True, "founds": founds, "cost": len(founds) + 1})
+		else:
+			self.send_json({"success": False, "message": "Not found"}, 404)
+
+	# Serves the left list of a job, generated on the fly so lists of hundreds of megabytes need no disk space
+	# Supports single byte ranges so downloads can be resumed
+	def send_leftlist(self, path):
+		try:
+			jobid = int(path.rsplit("/", 1)[1].split("-")[0])
+			job = self.server.jobs[jobid - 1]
+		except (ValueError, IndexError):
+			self.send_json({"success": False, "message": "Not found"}, 404)
+			return
+		size = job['leftHashes'] * LINE
+		start, end = 0, size - 1
+		status = 200
+		ranged = self.headers.get("Range")
+		if ranged and ranged.startswith("bytes="):
+			first, last = ranged[6:].split(",")[0].split("-")
+			start = int(first) if first else max(0, size - int(last))
+			end = min(int(last), size - 1) if first and last else size - 1
+			if start >= size:
+				self.send_response(416)
+				self.send_header("Content-Range", "bytes */%s" % (size))
+				self.send_header("Content-Length", "0")
+				self.end_headers()
+				return
+			status = 206
+		self.send_response(status)
+		self.send_header("Content-Type", "text/plain")
+		self.send_header("Content-Length", str(end - start + 1))
+		self.send_header("Accept-Ranges", "bytes")
+		self.send_header("ETag", '"%s-%s"' % (jobid, size))
+		if status == 206:
+			self.send_header("Content-Range", "bytes %s-%s/%s" % (start, end, size))
+		self.end_headers()
+		if self.command == "HEAD":
+			return
+		def blocks():
+			line = start // LINE
+			skip = start - line * LINE
+			remaining = end - start + 1
+			while remaining > 0:
+				block = "".join(left_hash(jobid, i) + "\n" for i in range(line, min(line + 2048, job['leftHashes']))).encode()
+				block = block[skip:skip + remaining]
+				skip = 0
+				line += 2048
+				remaining -= len(block)
+				yield block
+		try:
+			self.send_body(blocks())
+		except (BrokenPipeError, ConnectionResetError):
+			None
+
+class StandIn(ThreadingHTTPServer):
+	daemon_threads = True
+
+	def __init__(self, address, jobs, latency = 0, bandwidth = 0, etag = False):
+		ThreadingHTTPServer.__init__(self, address, Handler)
+		self.jobs = jobs
+		self.jobs_response = {"success": True, "list": jobs}
+		self.latency = latency
+		self.bandwidth = bandwidth
+		self.etag = '"jobs-%s"' % (len(jobs)) if etag else None
+		self.requests = {}
+		self.lock = threading.Lock()
+
+	def count(self, method):
+		with self.lock:
+			self.requests[method] = self.requests.get(method, 0) + 1
+
+# Pushes messages new jobs to every websocket client, rate messages a second or as fast as possible when rate is 0
+# Every message carries the time it was sent in 'sent' so clients can measure lag
+def serve_websocket(host, port, jobs, messages, rate, perjob):
+	import asyncio
+	import websockets
+
+	async def handler(ws, path = None):
+		for i in range(messages):
+			new = [jobs[(i * perjob + j) % len(jobs)] for j in range(perjob)]
+			await ws.send(json.dumps({"success": True, "new": new, "sent": time.time()}))
+			if rate:
+				await asyncio.sleep(1 / rate)
+		# hashes.com keeps the socket open, clients disconnect when they are done
+		await ws.wait_closed()
+
+	async def run():
+		async with websockets.serve(handler, host, port, max_queue=None):
+			await asyncio.Future()
+
+	asyncio.run(run())
+
+def main(argv = None):
+	parser = argparse.ArgumentParser(description='Local hashes.com stand-in for benchmarks', prog='server.py')
+	parser.add_argument("-host", help='Address to listen on.', default="127.0.0.1")
+	parser.add_argument("-port", help='HTTP port to listen on.', default=8780, type=int)
+	parser.add_argument("-wsport", help='Websocket port to listen on. 0 disables the websocket.', default=8781, type=int)
+	parser.add_argument("-jobs", help='Number of jobs in the job list.', default=1000, type=int)
+	parser.add_argument("-left", help='Hashes left in every job that is not big.', default=100, type=int)
+	parser.add_argument("-big", help='Number of jobs with a big left list.', default=2, type=int)
+	parser.add_argument("-leftlistmb", help='Size of big left lists in megabytes.', default=16, type=int)
+	parser.add_argument("-latency", help='Milliseconds added before every response.', default=0, type=float)
+	parser.add_argument("-bandwidth", help='Response bandwidth limit in KB/s. 0 is unlimited.', default=0, type=float)
+	parser.add_argument("-etag", help='Send ETags on job lists so unchanged lists are answered with 304.', action='store_true')
+	parser.add_argument("-messages", help='Number of websocket messages sent to every client.', default=1000, type=int)
+	parser.add_argument("-rate", help='Websocket messages a second. 0 is as fast as possible.', default=0, type=float)
+	parser.add_argument("-perjob", help='Jobs in every websocket message.', default=1, type=int)
+	parsed = parser.parse_args(argv)
+
+	jobs = make_jobs(parsed.jobs, parsed.left, parsed.big, parsed.leftlistmb)
+	server = StandIn((parsed.host, parsed.port), jobs, parsed.latency / 1000, parsed.bandwidth * 1024, parsed.etag)
+	if parsed.wsport:
+		try:
+			import websockets
+			threading.Thread(target=serve_websocket, args=(parsed.host, parsed.wsport, jobs, parsed.messages, parsed.rate, parsed.perjob), daemon=True).start()
+		except ImportError:
+			print("websockets is not installed, jobs_wss is disabled.", file=sys.stderr)
+	print("Serving %s jobs on http://%s:%s" % (len(jobs), parsed.host, server.server_address[1]), flush=True)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		None
+	finally:
+		server.server_close()
+
+if __name__ == "__main__":
+	main()
@@ -1,6 +1,7 @@
 # This is an example hook file for the hashes.com-cli websocket API implementation
 # The code within the proccess_message function will be ran everytime a new job is added
 # The message variable that is passed to the function is a dict with the results of new jobs
+# process_message can also be defined with 'async def', otherwise it is run in a thread (or process) pool so it never blocks the websocket
 # Example of message result:
 # {
 #	'success': True, 
@@ -1,166 +1,238 @@
+import time
+# Used to report how long the script took to start
+started = time.perf_counter()
 import os
 import re
 import sys
-import bs4
-import time
 import json
 import shlex
 import pickle
-import asyncio
 import requests
 import argparse
 import importlib
-import websockets
 from getpass import getpass
 from datetime import datetime
 from binascii import a2b_base64
 from prettytable import PrettyTable
 from inc.algorithms import validalgs
 from inc.header import header
+from inc.api import APIClient
+from inc.rates import RateCache
+from inc.jobcache import JobCache
+from inc.downloader import Downloader
+from inc.sync import LeftListStore
+from inc.merge import merge_leftlists
+from inc.lookup import LookupEngine, read_hashes, potential_cost, format_found
+from inc.lookupcache import LookupCache
+from inc.uploader import Uploader, UploadLog
+from inc.matcher import PotfileMatcher
+from inc.leftbin import BinaryLeftList, build, write_text
+from inc.jobtable import JobTable
+from inc.stats import escrow_stats
+from inc.watcher import Watcher
+from inc.registry import AlgorithmRegistry
+from inc.identifier import Signatures, identify_file
+from inc.ranking import get_speeds, rank_jobs
+from inc.metrics import Metrics
+from inc.history import HistoryStore
+from inc.market import MarketStore, price_trends, crack_velocity
+from inc import config
+
+# Modules only some commands need are imported inside them so one shot commands start quickly:
+# bs4 by login and recent_logins, asyncio by the websocket, broker and record commands, websockets and the hook runner by main,
+# the broker and recorder by their commands and cProfile/tracemalloc by profile
 
-if sys.platform == 'win32':
-	import pyreadline3
-else:
-	import readline
+# Set by --json to print results as JSON instead of tables
+output_json = False
+# Set when a command fails, one shot mode exits with it
+exit_status = 0
+session = None
+apikey = None
 
 # Functions
 
-# Returns json of current jobs in escrow
-def get_jobs(sortby = 'createdAt', algid = None, reverse = True, currency = None, self = False):
-	if self == True:
-		url = "https://hashes.com/en/api/jobs_self"
-	else:
-		url = "https://hashes.com/en/api/jobs?key=%s" % (apikey)
-	json1 = requests.get(url).json()
-	if json1["success"] == True:
-		json1 = json1['list']
-		if currency is not None:
-			json3 = []
-			for rows in json1:
-				if str(rows['currency']) in currency.upper().split(","):
-					json3.append(rows)
-			json1 = json3
-		if algid is not None:
-			json2 = []
-			for rows in json1:
-				if str(rows['algorithmId']) in algid:
-					json2.append(rows)
-			json1 = json2
-		json1 = sorted(json1, key=lambda x : x[sortby], reverse=reverse)
-		return json1
+# Prints why a command failed and marks it as failed so one shot mode exits with a non zero status
+def fail(message):
+	global exit_status
+	exit_status = 1
+	print(message)
 
-# Downloads or prints jobs in escrow
-def download(jobid, algid, file, printr, currency):
-	urls = []
-	jobs = get_jobs(currency = currency)
+# Returns table of current jobs in escrow
+# Served from the local job snapshot unless it is stale or refresh is set
+def get_jobs(sortby = 'createdAt', algid = None, reverse = True, currency = None, self = False, refresh = False):
+	jobs = jobcache.table("jobs_self" if self == True else "jobs", force=refresh)
+	if jobs is None:
+		fail("Failed to get the job list.")
+		return JobTable([])
+	jobs = jobs.filter(algids = algid, currencies = currency.split(",") if currency is not None else None)
+	return jobs.sort(sortby, reverse)
+
+# Returns the jobs picked by the -jobid, -algid and -currency flags of download and sync
+def select_jobs(jobid, algid, currency, refresh = False):
+	selected = []
+	jobs = get_jobs(currency = currency, refresh = refresh)
 	if jobid is not None:
-		if "," in str(jobid):
-			jobid = jobid.split(",")
-		else:
-			jobid = [jobid]
-		for rows in jobs:
-			if str(rows['id']) in jobid:
-				urls.append(rows['leftList'])
-				jobid.remove(str(rows['id']))
-		if jobid:
-			print (",".join(jobid) + " not valid jobs")
+		jobid = str(jobid).split(",")
+		selected = list(jobs.filter(jobids = jobid))
+		missing = jobs.missing(jobid)
+		if missing:
+			fail(",".join(missing) + " not valid jobs")
 	elif algid is not None:
-		for rows in jobs:
-			if str(rows['algorithmId']) == algid:
-				urls.append(rows['leftList'])
-		if not urls:
-			print ("No jobs for " + validalgs[algid])
+		selected = list(jobs.filter(algids = [algid]))
+		if not selected:
+			fail("No jobs for " + validalgs[algid])
 	else:
 		if currency is not None:
-			for rows in jobs:
-				urls.append(rows['leftList'])
-	if urls:
+			selected = list(jobs)
+	return selected
+
+# Downloads or prints jobs in escrow
+# Files are written to a single file with file or one file per job with outdir
+# With merge the jobs are saved to <outdir>/jobs and merged into one deduplicated <outdir>/<algid>.txt per algorithm
+# along with <outdir>/<algid>.idx listing the job ids that contain each hash
+def download(jobid, algid, file, printr, currency, refresh = False, outdir = None, workers = config.DOWNLOAD_WORKERS, chunksize = config.DOWNLOAD_CHUNK_SIZE, merge = False, budget = config.MERGE_MEMORY_BUDGET):
+	selected = select_jobs(jobid, algid, currency, refresh)
+	if selected and merge:
+		try:
+			jobdir = os.path.join(outdir, "jobs")
+			downloaded = Downloader(api, workers, chunksize).run(selected, outdir=jobdir)
+			algorithms = {}
+			for rows in selected:
+				if rows['id'] in downloaded:
+					algorithms.setdefault(str(rows['algorithmId']), []).append((rows['id'], os.path.join(jobdir, "%s.txt" % (rows['id']))))
+			for aid, sources in algorithms.items():
+				total, unique = merge_leftlists(sources, os.path.join(outdir, aid + ".txt"), os.path.join(outdir, aid + ".idx"), budget)
+				print("Merged %s hashes from %s jobs into %s unique %s hashes: %s" % (total, len(sources), unique, validalgs.get(aid, aid), os.path.join(outdir, aid + ".txt")))
+		except OSError as e:
+			fail(e)
+	elif selected:
 		if printr:
-			for url in urls:
-				req = requests.get("http://hashes.com"+url).text.rstrip()
+			for rows in selected:
+				req = api.get(rows['leftList']).text.rstrip()
 				print(req)
-		if file:
+		if file or outdir:
 			try:
-				with open(file, "ab+") as outfile:
-					for url in urls:
-						req = requests.get("http://hashes.com"+url, stream=True, headers={'Accept-Encoding': None})
-						total_size = int(req.headers.get('Content-Length'))
-						downloaded = 0
-						if total_size < 1048576:
-							suffix = "KB"
-							factor = float(1<<10)
-						else:
-							suffix = "MB"
-							factor = float(1<<20)
-						for chunk in req.iter_content(1024):
-							outfile.write(chunk)
-							downloaded += len(chunk)
-							end = int(50 * downloaded / total_size)
-							print("\r[%s%s]%s %s/%s %s   " % ('=' * end, ' ' * (50-end), "{0:.2f}".format(downloaded / factor), suffix, "{0:.2f}".format(total_size / factor), suffix), flush=True, end='')
-					print ("\nWrote hashes to: "+file)
+				Downloader(api, workers, chunksize).run(selected, outfile=file, outdir=outdir)
+				if file:
+					print ("Wrote hashes to: "+file)
+				else:
+					print ("Wrote hashes to: "+outdir)
 			except OSError as e:
-				print(e)
+				fail(e)
+
+# Updates local copies of left lists and writes remove lists of hashes found since the last sync
+def sync(jobid, algid, currency, outdir = None, workers = config.DOWNLOAD_WORKERS, chunksize = config.DOWNLOAD_CHUNK_SIZE, budget = config.MERGE_MEMORY_BUDGET):
+	selected = select_jobs(jobid, algid, currency, refresh = True)
+	if selected:
+		try:
+			results, closed = LeftListStore(api).sync(selected, get_jobs(), outdir, workers, chunksize, budget)
+		except OSError as e:
+			fail(e)
+			return
+		table = PrettyTable()
+		table.field_names = ["ID", "Algorithm", "Left", "Status", "Removed", "Added"]
+		table.align = "l"
+		removed, added = 0, 0
+		for row in results:
+			removed += row['removed']
+			added += row['added']
+			table.add_row([row['id'], validalgs.get(str(row['algorithmId']), row['algorithmId']), row['leftHashes'], row['status'], row['removed'], row['added']])
+		print(table)
+		print("Total hashes removed: %s" % (removed))
+		print("Total hashes added: %s" % (added))
+		if closed:
+			print("Job IDs %s are no longer in escrow and were removed." % (",".join(closed)))
+		print("Remove lists written to: %s" % (outdir if outdir else config.LEFTLIST_DIR))
 
 # Gets stats about hashes that are left in escrow
-def get_stats(json):
-	stats = {}
-	btc,xmr,ltc = 0,0,0
-	for rows in json:
-		algid = rows['algorithmId']
-		currency = rows['currency']
-		neededleft = float(rows['maxCracksNeeded']) - float(rows['foundHashes']) if rows['foundHashes'] > 0 else rows['maxCracksNeeded']
-		if algid in stats:
-			found = stats[algid]['totalFound'] + rows['foundHashes']
-			left = stats[algid]['totalLeft'] + rows['leftHashes']
-			usd = float(stats[algid]['totalUSD']) + float(rows['pricePerHashUsd']) * neededleft
-			if currency == "BTC":
-				btc = float(stats[algid]['totalBTC']) + float(rows['pricePerHash']) * neededleft
-				xmr = float(stats[algid]['totalXMR'])
-				ltc = float(stats[algid]['totalLTC'])
-			elif currency == "XMR":
-				xmr = float(stats[algid]['totalXMR']) + float(rows['pricePerHash']) * neededleft
-				btc = float(stats[algid]['totalBTC'])
-				ltc = float(stats[algid]['totalLTC'])
-			elif currency == "LTC":
-				ltc = float(stats[algid]['totalLTC']) + float(rows['pricePerHash']) * neededleft
-				xmr = float(stats[algid]['totalXMR'])
-				btc = float(stats[algid]['totalBTC'])
-		else:
-			found = rows['foundHashes']
-			left = rows['leftHashes']
-			usd = float(rows['pricePerHashUsd']) * neededleft
-			if currency == "BTC":
-				btc = float(rows['pricePerHash']) * neededleft
-				xmr = 0
-				ltc = 0
-			elif currency == "XMR":
-				xmr = float(rows['pricePerHash']) * neededleft
-				btc = 0
-				ltc = 0
-			elif currency == "LTC":
-				ltc = float(rows['pricePerHash']) * neededleft
-				btc = 0
-				xmr = 0
-		stats[algid] = {"totalFound": found, "totalLeft": left, "totalUSD": "{0:.3f}".format(float(usd)), "totalBTC": "{0:.7f}".format(float(btc)), "totalXMR": "{0:.7f}".format(float(xmr)), "totalLTC": "{0:.7f}".format(float(ltc))}
-	table = PrettyTable()
-	table.field_names = ["ID", "Algorithm", "Left", "Found", "USD", "BTC", "XMR", "LTC"]
-	table.align = "l"
-	escrowleft,escrowfound,escrowusdvalue,escrowbtcvalue,escrowxmrvalue,escrowltcvalue = 0,0,0,0,0,0
-	for aid in stats:
-		escrowleft += stats[aid]['totalLeft']
-		escrowfound += stats[aid]['totalFound']
-		escrowusdvalue += float(stats[aid]['totalUSD'])
-		escrowbtcvalue += float(stats[aid]['totalBTC'])
-		escrowxmrvalue += float(stats[aid]['totalXMR'])
-		escrowltcvalue += float(stats[aid]['totalLTC'])
-		table.add_row([aid, validalgs[str(aid)], stats[aid]['totalLeft'], stats[aid]['totalFound'], "$"+stats[aid]['totalUSD'], stats[aid]['totalBTC'], stats[aid]['totalXMR'], stats[aid]['totalLTC']])
-	print(table)
-	print("Total hashes left: "+str(escrowleft))
-	print("Total hashes found: "+str(escrowfound))
-	print("Total USD value: $"+"{0:.3f}".format(escrowusdvalue))
-	print("Total BTC value: %s / %s" % ("{0:.7f}".format(escrowbtcvalue), to_usd("{0:.7f}".format(escrowbtcvalue), "BTC")['converted'] if escrowbtcvalue > 0 else "$0.00"))
-	print("Total XMR value: %s / %s" % ("{0:.7f}".format(escrowxmrvalue), to_usd("{0:.7f}".format(escrowxmrvalue), "XMR")['converted'] if escrowxmrvalue > 0 else "$0.00"))
-	print("Total LTC value: %s / %s" % ("{0:.7f}".format(escrowltcvalue), to_usd("{0:.7f}".format(escrowltcvalue), "LTC")['converted'] if escrowltcvalue > 0 else "$0.00"))
+# Prints the stats table and returns the stats dict from escrow_stats so other code can reuse it
+def get_stats(jobs, p = True):
+	stats = escrow_stats(jobs)
+	if p == True and output_json:
+		print(json.dumps(stats, indent=4))
+	elif p == True:
+		currencies = stats['currencies']
+		table = PrettyTable()
+		table.field_names = ["ID", "Algorithm", "Left", "Found", "USD"] + currencies
+		table.align = "l"
+		for aid, row in stats['algorithms'].items():
+			table.add_row([aid, validalgs.get(str(aid), str(aid)), row['left'], row['found'], "$"+"{0:.3f}".format(row['usd'])] + ["{0:.7f}".format(row['currencies'].get(cur, 0.0)) for cur in currencies])
+		print(table)
+		totals = stats['totals']
+		print("Total hashes left: "+str(totals['left']))
+		print("Total hashes found: "+str(totals['found']))
+		print("Total USD value: $"+"{0:.3f}".format(totals['usd']))
+		converted = rates.convert_many([(totals['currencies'][cur], cur) for cur in currencies if totals['currencies'][cur] > 0])
+		for cur in currencies:
+			value = totals['currencies'][cur]
+			print("Total %s value: %s / %s" % (cur, "{0:.7f}".format(value), converted.pop(0)['converted'] if value > 0 else "$0.00"))
+	return stats
+
+# Ranks jobs by expected USD per unit of compute and prints them best first
+# Returns the ranked list of dicts so other code can reuse it
+def rank(jobs, limit = None, override = None, rerun = False, p = True):
+	speeds = get_speeds(override = override, rerun = rerun)
+	ranked = rank_jobs(jobs, speeds, validalgs)
+	if limit:
+		ranked = ranked[0:limit]
+	if p == True and output_json:
+		print(json.dumps(ranked, indent=4))
+	elif p == True:
+		table = PrettyTable()
+		table.field_names = ["ID", "Algorithm", "Currency", "Left", "Payout USD", "Speed (MH/s)", "Salted", "Score"]
+		table.align = "l"
+		for row in ranked:
+			speed = "{0:.2f}".format(row['speed'] / 1e6) if row['speed'] else "Unknown"
+			score = "{0:.4g}".format(row['score']) if row['score'] is not None else "N/A"
+			table.add_row([row['id'], validalgs.get(row['algorithmId'], row['algorithmId']), row['currency'], row['leftHashes'], "$"+"{0:.3f}".format(row['payoutUsd']), speed, "Yes" if row['salted'] else "No", score])
+		print(table)
+		print("Score is payout USD divided by the seconds one candidate costs against the job.")
+		print("Jobs with unknown speeds can be ranked by loading a hashcat benchmark with -speeds.")
+	return ranked
+
+# Formats seconds as the largest units that fit e.g. 2d 4h or 3h 12m
+def duration(seconds):
+	seconds = int(seconds)
+	for size, unit, smaller, subunit in ((86400, "d", 3600, "h"), (3600, "h", 60, "m"), (60, "m", 1, "s")):
+		if seconds >= size:
+			return "%s%s %s%s" % (seconds // size, unit, (seconds % size) // smaller, subunit)
+	return "%ss" % (seconds)
+
+# Shows price trends per algorithm or crack velocity and time to completion per job from recorded samples
+# since is in hours. Returns the rows so other code can reuse them
+def market(trends, algid = None, jobid = None, since = None, bucket = 1, limit = None, p = True):
+	data = MarketStore().load(algids = algid, jobids = jobid, since = time.time() - since * 3600 if since else None)
+	if not data['time']:
+		print("No samples recorded yet. Use the 'record' command to start recording.")
+		return []
+	if trends:
+		rows = price_trends(data, int(bucket * 3600))
+		if limit:
+			rows = rows[-limit:]
+		if p == True and output_json:
+			print(json.dumps([dict(zip(("algorithmId", "time", "samples", "min", "avg", "max"), row)) for row in rows], indent=4))
+		elif p == True:
+			table = PrettyTable()
+			table.field_names = ["Algorithm", "From", "Samples", "Min USD", "Avg USD", "Max USD"]
+			table.align = "l"
+			for aid, start, count, low, avg, high in rows:
+				table.add_row([validalgs.get(str(aid), str(aid)), datetime.fromtimestamp(start).strftime("%m/%d/%y %H:%M"), count, "$"+"{0:.4f}".format(low), "$"+"{0:.4f}".format(avg), "$"+"{0:.4f}".format(high)])
+			print(table)
+	else:
+		rows = crack_velocity(data)
+		if limit:
+			rows = rows[0:limit]
+		if p == True and output_json:
+			print(json.dumps(rows, indent=4))
+		elif p == True:
+			table = PrettyTable()
+			table.field_names = ["ID", "Algorithm", "Cracked", "Left", "Per Hour", "Observed", "Estimated Completion"]
+			table.align = "l"
+			for row in rows:
+				eta = "Unknown" if row['eta'] is None else datetime.fromtimestamp(row['last'] + row['eta']).strftime("%m/%d/%y %H:%M") + " (" + duration(row['eta']) + ")"
+				table.add_row([row['id'], validalgs.get(str(row['algorithmId']), str(row['algorithmId'])), row['cracked'], row['left'], "{0:.2f}".format(row['velocity']), duration(row['last'] - row['first']), eta])
+			print(table)
+	return rows
 
 # Converts data URI to binary and saves to jpeg
 def save_captcha(uri):
@@ -173,6 +245,7 @@ def save_captcha(uri):
 # Creates requests session for actions that require you to be logged into hashes.com
 def login(email, password, rememberme):
 	global session
+	import bs4
 	session = requests.Session()
 	url = "https://hashes.com/en/login"
 	get = session.get(url).text
@@ -189,10 +262,10 @@ def login(email, password, rememberme):
 	error = bs2.find("div", {"class": "my-center alert alert-dismissible alert-danger"})
 	error2 = bs2.find('p', attrs={'class':'mb-0'})
 	if error is not None:
-		print("".join([t for t in error.contents if type(t)==bs4.element.NavigableString]).strip())
+		fail("".join([t for t in error.contents if type(t)==bs4.element.NavigableString]).strip())
 		session = None
 	elif error2 is not None:
-		print(error2.text.strip())
+		fail(error2.text.strip())
 		session = None
 	else:
 		print("Login successful.")
@@ -203,109 +276,166 @@ def login(email, password, rememberme):
 			print("Wrote session data to: session.txt")
 
 # Gets paid recovery history from escrow
-def get_escrow_history(reverse, limit, stats):
-	uploadurl = "https://hashes.com/en/api/uploads?key=%s" % (apikey)
-	get = requests.get(uploadurl).json()
-
-	if get['success'] == True:
-		data = []
-		for row in get['list']:
-			cid = row['id']
-			date = row['date']
-			alg = row['algorithm']
-			status = row['status']
-			total = row['totalHashes']
-			finds = row['validHashes']
-			btc = row['btc']
-			xmr = row['xmr']
-			ltc = row['ltc']
-			data.append([str(cid), str(date), str(alg), str(status), str(total), str(finds), str(btc), str(xmr), str(ltc)])
+# History is kept in a local store that only takes in new and changed uploads, limit and reverse are applied by the query
+def get_escrow_history(reverse, limit, stats, refresh = False):
+	store = HistoryStore(api)
+	try:
+		try:
+			store.sync(force = refresh)
+		except ValueError as e:
+			fail(e)
+		except requests.exceptions.RequestException as e:
+			print("Could not fetch history, showing saved history: %s" % (e))
 		if stats:
-			totalsub,totalvalid,totalearnedusd,totalearnedbtc,totalearnedxmr,totalearnedltc = 0,0,0,0,0,0
-			algorithms = {}
-			for row in data:
-				usd = 0
-				btc = row[6]
-				xmr = row[7]
-				ltc = row[8]
-				totalsub += int(row[4])
-				totalvalid += int(row[5])
-				totalearnedusd += float(usd)
-				totalearnedbtc += float(btc)
-				totalearnedxmr += float(xmr)
-				totalearnedltc += float(ltc)
-				if row[2] not in algorithms:
-					algorithms[row[2]] = [row[4], row[5], btc, xmr, ltc]
-				else:
-					algorithms[row[2]] = [int(algorithms[row[2]][0]) + int(row[4]), int(algorithms[row[2]][1]) + int(row[5]), float(algorithms[row[2]][2]) + float(btc), float(algorithms[row[2]][3]) + float(xmr), float(algorithms[row[2]][4]) + float(ltc)]
+			algorithms, totals = store.stats()
 			table = PrettyTable()
 			table.field_names = ["Algorithm", "Hashes Submitted", "Valid Hashes Submitted", "BTC", "XMR", "LTC"]
 			table.align = "l"
-			for k,v in algorithms.items():
-				table.add_row([k, v[0], v[1], "{0:.7f}".format(float(v[2])), "{0:.7f}".format(float(v[3])), "{0:.7f}".format(float(v[4]))])
-			table.sortby = "BTC"
-			table.reversesort = True
+			for alg, total, valid, btc, xmr, ltc in algorithms:
+				table.add_row([alg, total, valid, "{0:.7f}".format(btc), "{0:.7f}".format(xmr), "{0:.7f}".format(ltc)])
 			print("USD prices are based on BTCs current price.")
 			print(table)
-			print("Total hashes submitted: %s" % (totalsub))
-			print("Total valid hashes submitted: %s" % (totalvalid))
-			print("Total BTC value: %s / %s" % ("{0:.7f}".format(totalearnedbtc), to_usd("{0:.7f}".format(totalearnedbtc), "BTC")['converted'] if totalearnedbtc > 0 else "$0.00"))
-			print("Total XMR value: %s / %s" % ("{0:.7f}".format(totalearnedxmr), to_usd("{0:.7f}".format(totalearnedxmr), "XMR")['converted'] if totalearnedxmr > 0 else "$0.00"))
-			print("Total LTC value: %s / %s" % ("{0:.7f}".format(totalearnedltc), to_usd("{0:.7f}".format(totalearnedltc), "LTC")['converted'] if totalearnedltc > 0 else "$0.00"))
-
+			print("Total hashes submitted: %s" % (totals['totalHashes']))
+			print("Total valid hashes submitted: %s" % (totals['validHashes']))
+			for cur in ("btc", "xmr", "ltc"):
+				value = totals[cur]
+				print("Total %s value: %s / %s" % (cur.upper(), "{0:.7f}".format(value), to_usd("{0:.7f}".format(value), cur.upper())['converted'] if value > 0 else "$0.00"))
 		else:
 			table = PrettyTable()
 			table.field_names = ["ID", "Created", "Algorithm", "Status", "Total Hashes", "Valid Finds", "BTC", "XMR", "LTC"]
 			table.align = "l"
-			for row in data:
-				table.add_row(row)
-			if reverse:
-				table = table[::-1]
-			if limit:
-				table = table[0:limit]
+			for row in store.rows(reverse, limit):
+				table.add_row([str(value) for value in row])
 			print(table)
+	finally:
+		store.close()
 
 # Gets current balance in escrow
 def get_escrow_balance(p = True):
-	get = requests.get("https://hashes.com/en/api/balance?key=%s" % (apikey)).json()
+	get = api.get_json("/en/api/balance", params=api.keyed())
 	if get['success'] == True:
-		if p == True:
+		if p == True and output_json:
+			get.pop('success')
+			print(json.dumps(get, indent=4))
+		elif p == True:
 			table = PrettyTable()
 			table.field_names = ["Currency", "Amount", "USD"]
 			table.align = "l"
 			get.pop('success')
+			converted = rates.convert_many([(value, currency) for currency,value in get.items() if float(value) > 0])
 			for currency,value in get.items():
 				if float(value) > 0:
-					usd  = to_usd(value, currency)["converted"]
+					usd = converted.pop(0)["converted"]
 				else:
 					usd = "$0.00"
 				table.add_row([currency, value, usd])
 			print(table)
 		elif p == False:
 			return get
+	else:
+		fail(get.get('message', "Failed to get balance."))
 
 
 # Upload found hashes to hashes.com
-def upload(algid, file):
-	uploadurl =  "https://hashes.com/en/api/founds"
-	data = {"key": apikey, "algo": algid}
-	file = {"userfile": open(file, "rb")}
-	post = requests.post(uploadurl, files=file, data=data).json()
-	if post["success"] == True:
+# Lines are checked and deduplicated first, lines uploaded before are dropped and large files are sent in chunks
+def upload(algid, file, chunklines = config.UPLOAD_CHUNK_LINES, workers = config.UPLOAD_WORKERS):
+	uploader = Uploader(api, chunklines=chunklines, workers=workers)
+	try:
+		lines, stats = uploader.prepare(algid, file)
+		print("Read %s lines: %s new, %s uploaded before, %s duplicates, %s malformed." % (stats['read'], stats['new'], stats['uploaded before'], stats['duplicate'], stats['malformed']))
+		if not lines:
+			print("Nothing new to upload.")
+			return
+		results = uploader.upload(algid, file, lines)
+	finally:
+		uploader.log.close()
+	# New uploads show up in history straight away
+	store = HistoryStore(api)
+	store.invalidate()
+	store.close()
+	table = PrettyTable()
+	table.field_names = ["Chunk", "Lines", "Status", "Uploaded"]
+	table.align = "l"
+	for row in results:
+		table.add_row([row['chunk'], row['lines'], row['status'], row['time']])
+	print(table)
+	if all(row['status'] == "uploaded" for row in results):
 		print("File successfully uploaded.")
-		print("Use the 'history' command to check the status.")
 	else:
-		print("Failed to upload file!")
+		fail("Failed to upload file!")
+	print("Use the 'history' command to check the status.")
+
+# Matches a potfile against local left lists and writes one founds file per algorithm to outdir
+# Left lists come from leftdir, by default the copies kept by sync. With send every founds file is uploaded straight away
+# With binary unsalted left lists are matched from binary left lists instead of being loaded into memory
+def match(potfile, outdir = config.MATCH_DIR, leftdir = config.LEFTLIST_DIR, algids = None, send = False, binary = False):
+	log = UploadLog()
+	matcher = PotfileMatcher(log)
+	try:
+		skipped = matcher.add_dir(leftdir, algids, binary)
+		if skipped:
+			print("Skipped %s left lists with an unknown algorithm, run sync or give a single -algid." % (len(skipped)))
+		if matcher.jobs == 0:
+			print("No left lists found in %s. Use the 'sync' command to download them." % (leftdir))
+			return
+		totals, written = matcher.match(potfile, outdir)
+	finally:
+		matcher.close()
+		log.close()
+	table = PrettyTable()
+	table.field_names = ["Algorithm", "Founds", "File"]
+	table.align = "l"
+	for algid, count in sorted(written.items()):
+		table.add_row([validalgs.get(algid, algid), count, os.path.join(outdir, algid + ".txt")])
+	print(table)
+	print("Matched %s of %s potfile lines against %s left lists." % (totals['matched'], totals['read'], matcher.jobs))
+	print("Already uploaded: %s, duplicates: %s, unmatched: %s, malformed: %s" % (totals['already uploaded'], totals['duplicate'], totals['unmatched'], totals['malformed']))
+	if send:
+		for algid in sorted(written):
+			print("Uploading %s founds..." % (validalgs.get(algid, algid)))
+			upload(algid, os.path.join(outdir, algid + ".txt"))
+
+# Converts, compares and searches binary left lists
+def leftbin(parsed):
+	if parsed.build:
+		sources = parsed.infile.split(",") if parsed.infile else []
+		if not sources:
+			manifest = LeftListStore(api).manifest
+			sources = [os.path.join(config.LEFTLIST_DIR, "%s.txt" % (jobid)) for jobid, entry in sorted(manifest.items()) if str(entry['algorithmId']) == parsed.algid]
+			sources = [source for source in sources if os.path.exists(source)]
+		if not sources:
+			print("No left lists for algorithm %s. Use the 'sync' command or give -infile." % (parsed.algid))
+			return
+		outfile = parsed.o if parsed.o else os.path.join(config.LEFTLIST_DIR, "%s.hbin" % (parsed.algid if parsed.algid else "leftlist"))
+		total, unique = build(sources, outfile, 0 if parsed.nobloom else config.LEFTBIN_BLOOM_BITS)
+		print("Stored %s unique hashes from %s lines of %s left lists in %s (%s bytes)" % (unique, total, len(sources), outfile, os.path.getsize(outfile)))
+	elif parsed.totext:
+		with BinaryLeftList(parsed.totext) as store:
+			count = write_text(store, parsed.o)
+		print("Wrote %s hashes to: %s" % (count, parsed.o))
+	elif parsed.diff:
+		first, second = parsed.diff.split(",")
+		with BinaryLeftList(first) as store, BinaryLeftList(second) as other:
+			count = write_text(store.difference(other), parsed.o)
+		print("Wrote %s hashes in %s that are not in %s to: %s" % (count, first, second, parsed.o))
+	elif parsed.contains:
+		with BinaryLeftList(parsed.contains) as store:
+			for hashh in parsed.hash.split(","):
+				print("%s: %s" % (hashh, "Found" if hashh in store else "Not found"))
+	elif parsed.info:
+		with BinaryLeftList(parsed.info) as store:
+			print("Hashes: %s\nDigest width: %s bytes\nBloom filter: %s" % (len(store), store.width, "%s bits, %s probes" % (store.bits, store.probes) if store.probes else "None"))
 
 # Shows all withdraw requests
 def withdraw_requests():
-	get = requests.get("https://hashes.com/en/api/withdrawals?key=%s" % (apikey)).json()
+	get = api.get_json("/en/api/withdrawals", params=api.keyed())
 	table = PrettyTable()
 	table.field_names = ["ID", "Created", "Status", "Currency", "Amount", "Final", "USD", "Destination Address", "Transaction Hash"]
 	table.align = "l"
 
 	if get['success'] == True:
-		for row in get['list']:
+		converted = rates.convert_many([("{0:.7f}".format(float(row['afterFee'])), row['currency']) for row in get['list']])
+		for row, conversion in zip(get['list'], converted):
 			wid = row['id']
 			date = row['date']
 			status = row['status']
@@ -314,127 +444,112 @@ def withdraw_requests():
 			thash = row['transaction']
 			currency = row['currency']
 			destination = row['destination']
-			usd = to_usd(final, currency)['converted']
+			usd = conversion['converted']
 			table.add_row([wid, date, status, currency, amount, final, usd, destination, thash])
+	else:
+		fail(get.get('message', "Failed to get withdrawals."))
+		return
 	print(table)
 
-# Watch status of job
-def watch(jobid, start, length, prev):
-    data = []
-    bid =[]
-    # This is used to count how many lines are going to be displayed
-    # Starts at 4 to account for the 3 line header and 1 line bottom
-    count = 4
-    jobid = jobid.split(",")
-    elapsed = time.time() - start
-    
-    if elapsed >=  60 * length:
-    	print("\033[2F\033[J", end="")
-    	print("Watch completed on job IDs: %s\n" % (",".join(jobid)), end="")
-    	return False
-    for j in get_jobs():
-        if str(j["id"]) in jobid:
-            data.append(j)
-            count += 1
-            jobid.remove(str(j["id"]))
-    if data:
-    	table = PrettyTable()
-    	table.field_names = ["ID", "Hashes Cracked", "Hashes Left"]
-    	table.align = "l"
-    	for row in data:
-    		table.add_row([row['id'], row['foundHashes'], row['leftHashes']])
-    	print(table)
-    	if len(jobid) > 0:
-    		count += 1
-    		print("Job IDs %s are no longer valid." % (",".join(jobid)))
-    	return count
-    else:
-    	if prev != None:
-    		print("\033[2F\033[J", end="")
-    	print("Job IDs %s are no longer valid." % (",".join(jobid)))
-    	return False
-
 # Check and update valid algorithm list
-def update_algs():
-	url = "https://hashes.com/en/api/algorithms"
-	json2 = requests.get(url).json()
-	if json2['success'] == True:
-		if len(json2['list']) > len(validalgs):
-			temp = {}
-			for alg in json2['list']:
-				temp[str(alg['id'])] = alg['algorithmName']
-			new = set(temp) - set(validalgs)
-
-			with open("./inc/algorithms.py", "w+") as test:
-				test.write("validalgs = " + str(json.dumps(temp, indent=4)))
-				print("\nNew algorithms added to list:")
-				for nalg in new:
-					print("%s: %s" % (nalg, temp[nalg]))
-			print("\nIn order for update to be applied the script must be reloaded.")
-			exit()
+# Runs in the background and applies changes without a restart
+def update_algs(background = True):
+	def report(changes):
+		global validalgs
+		# The registry swaps in a new dict when the list changes
+		validalgs = registry.algorithms
+		if changes is None:
+			fail("Failed to get algorithm list to check for updates.")
+			return
+		added, removed, renamed = changes
+		if added:
+			print("\nNew algorithms added to list:")
+			for nalg in added:
+				print("%s: %s" % (nalg, validalgs[nalg]))
+		if removed:
+			print("\nAlgorithms removed from list: %s" % (",".join(removed)))
+		for aid, names in renamed.items():
+			print("\nAlgorithm %s renamed from '%s' to '%s'" % (aid, names[0], names[1]))
+	if background:
+		registry.refresh_async(report)
 	else:
-		print("Failed to get algorithm list to check for updates.")
+		report(registry.refresh(force = True))
 
 # Hash ID
-def hashid(hashh, extended):
-	url = "https://hashes.com/en/api/identifier?hash=%s&extended=%s" % (hashh, str(extended).lower())
-	get = requests.get(url).json()
+# Prints possible algorithms or returns them when p is False
+def hashid(hashh, extended, p = True):
+	get = api.get_json("/en/api/identifier", params={"hash": hashh, "extended": str(extended).lower()})
+	if p == False:
+		return get['algorithms'] if get['success'] == True else None
 	if get['success'] == True:
 		for algs in get['algorithms']:
 			print(algs)
 	elif get['success'] == False:
-		print(get['message'])
+		fail(get['message'])
+
+# Identifies every hash in a file offline and writes one file per candidate algorithm
+# Up to remote hashes that matched no local signature are sent to the remote identifier
+def bulk_hashid(infile, outdir, processes = None, remote = 0):
+	counts, unknown = identify_file(infile, outdir, processes, keep = remote)
+	table = PrettyTable()
+	table.field_names = ["ID", "Algorithm", "Hashes"]
+	table.align = "l"
+	for aid, count in sorted(counts.items(), key=lambda item: -item[1]):
+		table.add_row([aid, validalgs.get(aid, "No local match"), count])
+	print(table)
+	if unknown:
+		with open(os.path.join(outdir, "remote.txt"), "w") as remotefile:
+			for hashh in unknown:
+				algs = hashid(hashh, False, p = False)
+				remotefile.write("%s\t%s\n" % (hashh, "|".join(algs) if algs else ""))
+		print("Identified %s unmatched hashes with hashes.com: %s" % (len(unknown), os.path.join(outdir, "remote.txt")))
+	print("Wrote hashes to: %s" % (outdir))
 
 # Hash lookup
-def hash_lookup(hashes, outfile, printr, verbose):
-	url = "https://hashes.com/en/api/search"
-	data = {"key": apikey, "hashes[]": hashes}
-	post = requests.post(url, data=data).json()
-	if post['success'] == True:
-		cost = post['cost']
-		hcount = post['count']
-		founds = post['founds']
-		print("There were %s/%s hashes found." % (len(founds), hcount))
-		print("Potential cost: %s" % (len(hashes) + 1))
-		print("Actual cost: %s\n\n" % (cost))
-		if len(founds) > 0:
-			for found in founds:
-				hashh = found['hash']
-				salt = found['salt']
-				plain = found['plaintext']
-				alg = found['algorithm']
-				if len(salt) == 0:
-					line = "%s:%s" % (hashh, plain)
-				else:
-					line = "%s:%s:%s" % (hashh, salt, plain)
-				if verbose == True:
-					line += ":"+alg
-				if printr == True:
-					print(line)
-				elif outfile is not None:
-					with open(outfile, "a+") as ofile:
-						ofile.write(line+"\n")
-			if outfile is not None:
-				print("Wrote search results to '%s'" % (outfile))
+# Hashes are sent in batches of 250 with up to workers batches searched at once and no more than budget credits spent
+# cached is a list of results already known from the local lookup cache, they are output without being searched
+def hash_lookup(hashes, outfile, printr, verbose, budget = None, workers = config.LOOKUP_WORKERS, cache = None, cached = None):
+	cached = [] if cached is None else cached
+	ofile = open(outfile, "a+") if outfile is not None and printr != True else None
+	def on_found(found):
+		line = format_found(found, verbose)
+		if printr == True:
+			print(line)
+		elif ofile is not None:
+			ofile.write(line+"\n")
+	try:
+		for found in cached:
+			on_found(found)
+		if cached:
+			print("%s results came from the local lookup cache." % (len(cached)))
+		if hashes:
+			summary = LookupEngine(api, workers).run(hashes, on_found, budget, cache)
 		else:
+			summary = {"hashes": 0, "found": 0, "cost": 0, "batches": 0, "skipped": 0, "error": None}
+	finally:
+		if ofile is not None:
+			ofile.close()
+	if summary['batches'] > 0:
+		print("There were %s/%s hashes found." % (summary['found'], summary['hashes']))
+		print("Potential cost: %s" % (potential_cost(summary['hashes'])))
+		print("Actual cost: %s\n\n" % (summary['cost']))
+		if summary['found'] == 0 and not cached:
 			print("No hashes found.")
-	elif post['success'] == False:
-		print(post['message'])
+	if (summary['found'] > 0 or cached) and outfile is not None and printr != True:
+		print("Wrote search results to '%s'" % (outfile))
+	if summary['skipped'] > 0:
+		print("%s hashes were not looked up because the credit budget was reached." % (summary['skipped']) if summary['error'] is None else "%s hashes were not looked up." % (summary['skipped']))
+	if summary['error'] is not None:
+		fail(summary['error'])
 
 
 # Converts crypto to USD values
 def to_usd(value, currency):
-	if currency != "credits":
-		url = "https://hashes.com/en/api/conversion"
-		resp = requests.get(url).json()
-		currentprice = resp[currency.upper()]
-		converted = "${0:.3f}".format(float(value) * float(currentprice))
-		return {"currentprice": currentprice, "converted": converted}
-	else:
-		return {"currentprice": None, "converted": "N/A"}
+	return rates.convert(value, currency)
 
 # Get recent logins
 def recent_logins(limit = None):
+	import bs4
 	url = "https://hashes.com/en/profile"
 	get = session.get(url).text
 	bs = bs4.BeautifulSoup(get, features="html.parser")
@@ -465,215 +580,229 @@ def confirm(message):
 # Websocket async functions
 
 # Websocket listener
-async def wslistener(websocket, hookcode):
+async def wslistener(websocket, runner):
     while True:
         message = await websocket.recv()
         message = json.loads(message)
         if message['success'] == False:
             print(message['message'])
         elif message['success'] == True:
-            hookcode.process_message(message)
+            await runner.submit(message)
+
+# Prints hook counters
+def hook_stats(runner):
+    stats = runner.stats()
+    table = PrettyTable()
+    table.field_names = ["Received", "Processed", "Errors", "Dropped", "Coalesced", "Queue Depth", "Max Depth", "Avg Latency", "Max Latency", "Avg Wait"]
+    table.align = "l"
+    table.add_row([stats['received'], stats['processed'], stats['errors'], stats['dropped'], stats['coalesced'], stats['depth'], stats['max depth'], "{0:.3f}s".format(stats['avg latency']), "{0:.3f}s".format(stats['max latency']), "{0:.3f}s".format(stats['avg wait'])])
+    print(table)
+
+# url can point at a local broker instead of hashes.com
+async def main(hook, workers = config.HOOK_WORKERS, queue_size = config.HOOK_QUEUE_SIZE, policy = "block", executor = "thread", url = None):
+    import asyncio
+    import websockets
+    from inc.hooks import HookRunner
 
-async def main(hook):
     # Import hook code
     try:
         hookcode = importlib.import_module(hook.rstrip(".py"))
     except ModuleNotFoundError:
-        print("Hook code failed to import.")
+        fail("Hook code failed to import.")
         return None
 
+    # Hook calls run from a queue so a slow hook never holds up the websocket
+    runner = HookRunner(hookcode, workers, queue_size, policy, executor, metrics)
+    await runner.start()
+
     # Start websocket loop
-    url =  "wss://hashes.com/en/api/jobs_wss/?key=%s" % (apikey)
-    async for ws in websockets.connect(url):
-        try:
-            print("Connected to hashes.com websocket API...")
-            print("Use Ctrl + C to disconnect from websocket.\n")
-            await wslistener(ws, hookcode)
-        except websockets.exceptions.ConnectionClosedError:
-        	# Redundant close request to avoid 3 connection limit error
-        	await ws.close()
-        	print("\nConnection closed. Reconnecting...")
-        	time.sleep(5)
-        	continue
-        except websockets.exceptions.ConnectionClosedOK:
-        	break
+    if url is None:
+        url = config.WSS_URL % (apikey)
+    try:
+        async for ws in websockets.connect(url):
+            try:
+                print("Connected to hashes.com websocket API...")
+                print("Use Ctrl + C to disconnect from websocket.\n")
+                await wslistener(ws, runner)
+            except websockets.exceptions.ConnectionClosedError:
+            	# Redundant close request to avoid 3 connection limit error
+            	await ws.close()
+            	print("\nConnection closed. Reconnecting...")
+            	await asyncio.sleep(5)
+            	continue
+            except websockets.exceptions.ConnectionClosedOK:
+            	break
+    finally:
+        await runner.stop()
+        hook_stats(runner)
 
 
 
 ## Initial checks and header
 
+# Loads the session saved by login -rememberme. Asks first unless ask is False
+def load_session(ask = True):
+	global session
+	session = None
+	if os.path.exists("session.txt"):
+		if ask == False or confirm("Load saved session?"):
+			session = requests.session()
+			with open("session.txt", "rb") as sessionfile:
+				session.cookies.update(pickle.load(sessionfile))
+			if ask == True:
+				print("Loaded existing session from session.txt")
 
-# Print header at start of script
-print(header)
-
-# Check if there is an exisiting session saved
-if os.path.exists("session.txt"):
-	if confirm("Load saved session?"):
-		session = requests.session()
-		with open("session.txt", "rb") as sessionfile:
-			session.cookies.update(pickle.load(sessionfile))
-		print("Loaded existing session from session.txt")
+# Loads the api key and creates the objects shared by every command
+# When not interactive the key must come from api.txt or the HASHES_API_KEY environment variable
+def setup(interactive = True):
+	global apikey, api, rates, jobcache, watcher, registry, metrics, validalgs
+	if os.path.exists("api.txt"):
+		with open("api.txt", "r") as apifile:
+			apikey = apifile.read()
+		if interactive:
+			print("Loaded API key from api.txt")
+	elif not interactive:
+		apikey = os.environ.get("HASHES_API_KEY")
+		if apikey is None:
+			print("No API key found. Create api.txt or set HASHES_API_KEY.", file=sys.stderr)
+			sys.exit(1)
 	else:
-		session = None
-else:
-	session = None
+		apikey = input("Enter API Key: ")
+		with open("api.txt", "w+") as apifile:
+			apifile.write(apikey)
 
-# Check if api key exists
-if os.path.exists("api.txt"):
-	with open("api.txt", "r") as apifile:
-		apikey = apifile.read()
-	print("Loaded API key from api.txt")
-else:
-	apikey = input("Enter API Key: ")
-	with open("api.txt", "w+") as apifile:
-		apifile.write(apikey)
-
-# Check if valid algorithm list is updated
-update_algs()
-
-# If logged in display last 3 attempted logins
-if session is not None:
-	print("\nLast 3 login attempts:")
-	recent_logins(3)
-
-## Start command line
-try:
-	while True:
-		cmd = input("hashes.com:~$ ")
-
-		if cmd[0:8] == "get jobs":
-			if len(cmd) > 8:
-				args = cmd[8:]
-				validsort = {"price": "pricePerHash", "total": "totalHashes", "left": "leftHashes", "found": "foundHashes", "lastcrack": "lastUpdate", "created": "createdAt"}
-				parser = argparse.ArgumentParser(description='Get escrow jobs from hashes.com', prog='get jobs')
-				parser.add_argument("-sortby", help='Parameter to sort jobs by.', default='created', choices=validsort)
-				parser.add_argument("-r", help='Reverse display order.', action='store_false')
-				parser.add_argument("-limit", help='Rows to limit results by.', default=None, type=int)
-				parser.add_argument("-currency", help='Currenct to filter jobs by. Multiple can be given e.g. BTC,LTC', default=None)
-				g = parser.add_mutually_exclusive_group()
-				g.add_argument("-algid", help='Algorithm to filter jobs by. Multiple can be given e.g. 20,300,220', default=None)
-				g.add_argument("-jobid", help='Job ID to filter jobs by. Multiple can be given e.g. 1,2,3,4,5', default=None)
-				g.add_argument("-self", help='Search jobs you have created.', action='store_true')
-				try:
-					parsed = parser.parse_args(shlex.split(args))
-					if parsed.algid is not None:
-						if "," in parsed.algid:
-							s = set(parsed.algid.split(","))
-							d = s.difference(validalgs)
-							s.intersection_update(validalgs)
-							if s is not None:
-								if len(d) > 0:
-									print (",".join(d)+" are not valid algorithm IDs.")
-								jobs = get_jobs(validsort[parsed.sortby], s, parsed.r, parsed.currency)
-							else:
-								jobs = False
-								print (",".join(d)+ " are not valid algorithm IDs.")
-						else:
-							if parsed.algid not in validalgs:
-								jobs = False
-								print (parsed.algid+" not a valid algorithm ID.")
-							else:
-						 		jobs = get_jobs(validsort[parsed.sortby], [parsed.algid], parsed.r, parsed.currency)
-					elif parsed.jobid is not None:
-						if "," in parsed.jobid:
-							jids = parsed.jobid.split(",")
-						else:
-							jids = [parsed.jobid]
-						jobs = get_jobs(validsort[parsed.sortby], None, parsed.r, parsed.currency)
-						temp = []
-						for j in jobs:
-							if str(j["id"]) in jids:
-								temp.append(j)
-								jids.remove(str(j["id"]))
-						jobs = temp
-						if jids:
-							print("No valid jobs for ids: " + ",".join(jids))
-					elif parsed.self == True:
-						jobs = get_jobs(validsort[parsed.sortby], None, parsed.r, parsed.currency, parsed.self)
-					else:
-						jobs = get_jobs(validsort[parsed.sortby], None, parsed.r, parsed.currency)
-					limit = parsed.limit
-				except SystemExit:
-					jobs = False
-					None
-			else:
-				jobs = get_jobs()
-				limit = None
-			if jobs:
-				table = PrettyTable()
-				table.field_names = ["Created", "ID", "Algorithm", "Total", "Found", "Left", "Max", "Currency", "Price Per Hash", "Hints"]
-				table.align = "l"
-				for rows in jobs[0:limit] if limit else jobs:
-					ids = rows['id']
-					created = datetime.strptime(rows['createdAt'], '%Y-%m-%d %H:%M:%S').strftime("%m/%d/%y")
-					algorithm = rows['algorithmName']
-					total = rows['totalHashes']
-					found = rows['foundHashes']
-					left = rows['leftHashes']
-					maxcracks = rows['maxCracksNeeded']
-					currency = rows['currency']
-					price = rows['pricePerHash'] + " / $" + rows['pricePerHashUsd']
-					try:
-						hints = rows['hints']
-						if hints != "":
-							hints = "Hints available"
-						else:
-							hints = "No hints available"
-					except KeyError:
-						hints = "Disabled"
-					table.add_row([created, ids, algorithm, total, found, left, maxcracks, currency, price, hints])
-				print(table)
-			else:
-				print ("No jobs found.")
-		if cmd[0:8] == "download":
+	# Counters for every API call, command and websocket message
+	metrics = Metrics()
+	# Shared API client used for every call to hashes.com
+	api = APIClient(apikey, metrics=metrics)
+	# Conversion rates shared by every USD conversion
+	rates = RateCache(api)
+	# Local snapshot of the escrow job list shared by every command
+	jobcache = JobCache(api)
+	# Background watch of job IDs shared by every watch command
+	watcher = Watcher(lambda: get_jobs(refresh = True))
+	# Supported algorithms, validalgs is pointed at its current list after every refresh
+	registry = AlgorithmRegistry(api)
+	validalgs = registry.algorithms
+
+## Command line
+
+# Commands dispatch knows, matched against the start of a command line like dispatch does
+COMMANDS = ("get jobs", "download", "sync", "rank", "help", "stats", "algs", "login", "upload", "match", "leftbin", "history", "watch", "id", "lookup", "hints", "websocket", "broker", "record", "market", "metrics", "balance", "withdrawals", "logout", "clear", "exit")
+
+# Argument parser that marks the command as failed when its arguments are invalid
+class ArgumentParser(argparse.ArgumentParser):
+	def error(self, message):
+		global exit_status
+		exit_status = 2
+		super().error(message)
+
+# Name a command is recorded under in metrics
+def command_name(cmd):
+	words = cmd.split()
+	if not words:
+		return None
+	return "get jobs" if words[0:2] == ["get", "jobs"] else words[0]
+
+# Runs a single command, recording its time in metrics. Returns False when the console should exit
+def run_command(cmd):
+	if cmd[0:8] == "profile ":
+		return profile(cmd[8:])
+	name = command_name(cmd)
+	if name is None:
+		return True
+	if not cmd.startswith(COMMANDS):
+		fail("'%s' is not a command. Use 'help' to list the commands." % (name))
+		return True
+	with metrics.command(name):
+		result = dispatch(cmd)
+	if config.METRICS_FILE:
+		try:
+			metrics.export(config.METRICS_FILE)
+		except OSError as e:
+			print(e)
+	return result
+
+# Runs cmd under cProfile and tracemalloc and writes the report to path
+def profile(cmd, path = None):
+	import io
+	import pstats
+	import cProfile
+	import tracemalloc
+	if path is None:
+		path = os.path.join(config.PROFILE_DIR, "%s-%s.txt" % (time.strftime("%Y%m%d-%H%M%S"), (command_name(cmd) or "empty").replace(" ", "_")))
+	profiler = cProfile.Profile()
+	tracemalloc.start()
+	start = time.perf_counter()
+	profiler.enable()
+	try:
+		result = run_command(cmd)
+	finally:
+		profiler.disable()
+		elapsed = time.perf_counter() - start
+		current, peak = tracemalloc.get_traced_memory()
+		allocations = tracemalloc.take_snapshot().statistics("lineno")
+		tracemalloc.stop()
+		report = io.StringIO()
+		report.write("Command: %s\nTime: %.3f s\nPeak traced memory: %.1f KB\nMemory still allocated: %.1f KB\n\n" % (cmd, elapsed, peak / 1024, current / 1024))
+		stats = pstats.Stats(profiler, stream=report)
+		stats.sort_stats("cumulative").print_stats(40)
+		report.write("Top allocations still held:\n")
+		for stat in allocations[0:20]:
+			report.write("%s\n" % (stat))
+		try:
+			os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+			with open(path, "w") as reportfile:
+				reportfile.write(report.getvalue())
+			print("Wrote profile to: %s" % (path), file=sys.stderr)
+		except OSError as e:
+			print(e)
+	return result
+
+# Prints API, command and websocket metrics
+def show_metrics():
+	snapshot = metrics.snapshot()
+	if output_json:
+		print(json.dumps(snapshot, indent=4))
+		return
+	table = PrettyTable()
+	table.field_names = ["Endpoint", "Requests", "Errors", "Bytes", "Avg", "p50", "p95", "Max"]
+	table.align = "l"
+	for name, row in sorted(metrics.endpoints.items()):
+		hist = row['latency']
+		table.add_row([name, row['requests'], row['errors'], row['bytes']] + ["{0:.3f}s".format(value) for value in (hist.avg(), hist.quantile(0.5), hist.quantile(0.95), hist.max)])
+	print(table)
+	table = PrettyTable()
+	table.field_names = ["Command", "Runs", "Avg", "Max", "Network", "JSON parsing", "Render/other"]
+	table.align = "l"
+	for name, row in sorted(metrics.commands.items()):
+		hist = row['latency']
+		table.add_row([name, row['runs'], "{0:.3f}s".format(hist.avg()), "{0:.3f}s".format(hist.max)] + ["{0:.3f}s".format(row[phase]) for phase in ("network", "parse", "other")])
+	print(table)
+	ws = snapshot['websocket']
+	if ws['messages'] > 0:
+		lag = metrics.websocket['lag']
+		print("Websocket messages: %s (%.2f/s), hook lag avg %.3fs p95 %.3fs max %.3fs" % (ws['messages'], ws['rate'], lag.avg(), lag.quantile(0.95), lag.max))
+	print("Network and JSON parsing only count requests made by the command itself, not its download or lookup workers.")
+
+# Runs a single command. Returns False when the console should exit
+def dispatch(cmd):
+	global session
+
+	if cmd[0:8] == "get jobs":
+		if len(cmd) > 8:
 			args = cmd[8:]
-			parser = argparse.ArgumentParser(description='Download escrow jobs from hashes.com', prog='download')
-			parser.add_argument("-currency", help='Crytocurrency to filter downloads by. Multiple can be given e.g. BTC,LTC', default=None)
-			g1 = parser.add_mutually_exclusive_group()
-			g1.add_argument("-jobid", help='Job ID to download. Multiple IDs can be seperated with a comma. e.g. 3,4,5.', default=None)
-			g1.add_argument("-algid", help='Algorithm ID to download', default=None)
-			g2 = parser.add_mutually_exclusive_group(required=True)
-			g2.add_argument("-f", help='Download to file.')
-			g2.add_argument("-p", help='Print to screen', action='store_true')
-			try:
-				parsed = parser.parse_args(shlex.split(args))
-				if parsed.algid is not None:
-					if parsed.algid not in validalgs:	
-						print(parsed.algid+" is not a valid algorithm.")
-					else:
-						download(parsed.jobid, parsed.algid, parsed.f, parsed.p, parsed.currency)
-				else:
-					download(parsed.jobid, parsed.algid, parsed.f, parsed.p, parsed.currency)
-			except SystemExit:
-				None
-		if cmd[0:4] == "help":
-			table = PrettyTable()
-			table.field_names = ["Command", "Description", "Flags"]
-			table.align = "l"
-			table.add_row(["get jobs", "Get current jobs in escrow", "-algid, -jobid, -currency, -sortby, -r, -limit, --help"])
-			table.add_row(["download", "Download to file or print jobs from escrow", "-jobid, -algid, -currency, -f, -p, --help"])
-			table.add_row(["stats", "Get stats about hashes left in escrow", "-algid, --help"])
-			table.add_row(["watch", "Watch status of jobs (updates every 10 seconds)", "-jobid, -length, --help"])
-			table.add_row(["algs", "Get the algorithms hashes.com currently supports", "-algid, -search, --help"])
-			table.add_row(["lookup", "Hash lookup **", "-single, -infile, -outfile, -p, -verbose, --help"])
-			table.add_row(["id", "Hash identifier", "-hash, -extended, --help"])
-			table.add_row(["login", "Login to hashes.com or view login history.", "-email, -rememberme, -history*, --help"])
-			table.add_row(["upload", "Upload cracks to hashes.com **", "-algid, -file, --help"])
-			table.add_row(["history", "Show history of submitted cracks **", "-limit, -r, -stats, --help"])
-			table.add_row(["hints", "Display any available hints for a specified job ID **", "-jobid, --help"])
-			table.add_row(["websocket", "Connect to hashes.com websocket API using a hook file **", "-hook, --help"])
-			table.add_row(["withdrawals", "Show all withdrawal requests **", "No flags"])
-			table.add_row(["balance", "Show BTC balance **", "No flags"])
-			table.add_row(["logout", "Clear logged in session *", "No flags"])
-			table.add_row(["clear", "Clear console", "No flags"])
-			table.add_row(["exit", "Exit console", "No flags"])
-			print(table)
-			print("* = Must be logged in")
-			print("** = Only requires apikey")
-		if cmd[0:5] == "stats":
-			args = cmd[5:]
-			parser = argparse.ArgumentParser(description='Get stats for hashes left in escrow from hashes.com', prog='stats')
-			parser.add_argument("-algid", help='Algorithm ID to sort stats by. Multiple can be given e.g. 20,300,220', default=None)
+			validsort = {"price": "pricePerHash", "total": "totalHashes", "left": "leftHashes", "found": "foundHashes", "lastcrack": "lastUpdate", "created": "createdAt"}
+			parser = ArgumentParser(description='Get escrow jobs from hashes.com', prog='get jobs')
+			parser.add_argument("-sortby", help='Parameter to sort jobs by.', default='created', choices=validsort)
+			parser.add_argument("-r", help='Reverse display order.', action='store_false')
+			parser.add_argument("-limit", help='Rows to limit results by.', default=None, type=int)
+			parser.add_argument("-currency", help='Currenct to filter jobs by. Multiple can be given e.g. BTC,LTC', default=None)
+			parser.add_argument("-refresh", help='Ignore cached job list and fetch a new one.', action='store_true')
+			g = parser.add_mutually_exclusive_group()
+			g.add_argument("-algid", help='Algorithm to filter jobs by. Multiple can be given e.g. 20,300,220', default=None)
+			g.add_argument("-jobid", help='Job ID to filter jobs by. Multiple can be given e.g. 1,2,3,4,5', default=None)
+			g.add_argument("-self", help='Search jobs you have created.', action='store_true')
 			try:
 				parsed = parser.parse_args(shlex.split(args))
 				if parsed.algid is not None:
@@ -683,248 +812,659 @@ try:
 						s.intersection_update(validalgs)
 						if s is not None:
 							if len(d) > 0:
-								print (",".join(d)+" are not valid algorithm IDs.")
-							get_stats(get_jobs("createdAt", s))
+								fail(",".join(d)+" are not valid algorithm IDs.")
+							jobs = get_jobs(validsort[parsed.sortby], s, parsed.r, parsed.currency, refresh=parsed.refresh)
 						else:
-							print (",".join(d)+ " are not valid algorithm IDs.")
+							jobs = False
+							fail(",".join(d)+ " are not valid algorithm IDs.")
 					else:
 						if parsed.algid not in validalgs:
-							print(parsed.algid+" is not a vlaid algorithm.")
+							jobs = False
+							fail(parsed.algid+" not a valid algorithm ID.")
 						else:
-							get_stats(get_jobs("createdAt", [parsed.algid]))
+					 		jobs = get_jobs(validsort[parsed.sortby], [parsed.algid], parsed.r, parsed.currency, refresh=parsed.refresh)
+				elif parsed.jobid is not None:
+					jids = parsed.jobid.split(",")
+					jobs = get_jobs(validsort[parsed.sortby], None, parsed.r, parsed.currency, refresh=parsed.refresh).filter(jobids = jids)
+					jids = jobs.missing(jids)
+					if jids:
+						fail("No valid jobs for ids: " + ",".join(jids))
+				elif parsed.self == True:
+					jobs = get_jobs(validsort[parsed.sortby], None, parsed.r, parsed.currency, parsed.self, parsed.refresh)
 				else:
-					get_stats(get_jobs())
+					jobs = get_jobs(validsort[parsed.sortby], None, parsed.r, parsed.currency, refresh=parsed.refresh)
+				limit = parsed.limit
 			except SystemExit:
+				jobs = False
 				None
-		if cmd[0:4] == "algs":
-			args = cmd[4:]
-			parser = argparse.ArgumentParser(description='List of all algorithms that hashes.com supports', prog='algs')
-			parser.add_argument("-algid", help='Algorithm ID to lookup. Multiple can be given e.g. 20,300,220', default=None)
-			parser.add_argument("-search", help='Search algorithm by name.', default=None)
-
-			try:
-				parsed = parser.parse_args(shlex.split(args))
-				if parsed.algid:
-					ids = parsed.algid.split(",")
-				table = PrettyTable()
-				table.field_names = ["ID", "Algorithm"]
-				table.align = "l"
-
-				for aid, name in validalgs.items():
-					if parsed.algid:
-						if aid in ids:
-							table.add_row([aid, name])
-							ids.remove(aid)
-					elif parsed.search:
-						if parsed.search.upper() in name.upper():
-							table.add_row([aid, name])
+		else:
+			jobs = get_jobs()
+			limit = None
+		if jobs and output_json:
+			print(json.dumps(list(jobs[0:limit] if limit else jobs), indent=4))
+		elif jobs:
+			table = PrettyTable()
+			table.field_names = ["Created", "ID", "Algorithm", "Total", "Found", "Left", "Max", "Currency", "Price Per Hash", "Hints"]
+			table.align = "l"
+			for rows in jobs[0:limit] if limit else jobs:
+				ids = rows['id']
+				created = datetime.strptime(rows['createdAt'], '%Y-%m-%d %H:%M:%S').strftime("%m/%d/%y")
+				algorithm = rows['algorithmName']
+				total = rows['totalHashes']
+				found = rows['foundHashes']
+				left = rows['leftHashes']
+				maxcracks = rows['maxCracksNeeded']
+				currency = rows['currency']
+				price = rows['pricePerHash'] + " / $" + rows['pricePerHashUsd']
+				try:
+					hints = rows['hints']
+					if hints != "":
+						hints = "Hints available"
+					else:
+						hints = "No hints available"
+				except KeyError:
+					hints = "Disabled"
+				table.add_row([created, ids, algorithm, total, found, left, maxcracks, currency, price, hints])
+			print(table)
+		else:
+			print ("No jobs found.")
+	if cmd[0:8] == "download":
+		args = cmd[8:]
+		parser = ArgumentParser(description='Download escrow jobs from hashes.com', prog='download')
+		parser.add_argument("-currency", help='Crytocurrency to filter downloads by. Multiple can be given e.g. BTC,LTC', default=None)
+		parser.add_argument("-refresh", help='Ignore cached job list and fetch a new one.', action='store_true')
+		g1 = parser.add_mutually_exclusive_group()
+		g1.add_argument("-jobid", help='Job ID to download. Multiple IDs can be seperated with a comma. e.g. 3,4,5.', default=None)
+		g1.add_argument("-algid", help='Algorithm ID to download', default=None)
+		g2 = parser.add_mutually_exclusive_group(required=True)
+		g2.add_argument("-f", help='Download to file.')
+		g2.add_argument("-p", help='Print to screen', action='store_true')
+		g2.add_argument("-d", help='Download each job to its own file in this directory.')
+		parser.add_argument("-workers", help='Number of jobs to download at the same time.', default=config.DOWNLOAD_WORKERS, type=int)
+		parser.add_argument("-chunksize", help='Bytes to read at a time while downloading.', default=config.DOWNLOAD_CHUNK_SIZE, type=int)
+		parser.add_argument("-merge", help='Merge jobs into one deduplicated file per algorithm in the -d directory.', action='store_true')
+		parser.add_argument("-membudget", help='Megabytes of memory merging may use before spilling to disk.', default=config.MERGE_MEMORY_BUDGET, type=int)
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			if parsed.merge and parsed.d is None:
+				print("-merge requires an output directory given with -d.")
+			elif parsed.algid is not None:
+				if parsed.algid not in validalgs:	
+					fail(parsed.algid+" is not a valid algorithm.")
+				else:
+					download(parsed.jobid, parsed.algid, parsed.f, parsed.p, parsed.currency, parsed.refresh, parsed.d, parsed.workers, parsed.chunksize, parsed.merge, parsed.membudget)
+			else:
+				download(parsed.jobid, parsed.algid, parsed.f, parsed.p, parsed.currency, parsed.refresh, parsed.d, parsed.workers, parsed.chunksize, parsed.merge, parsed.membudget)
+		except SystemExit:
+			None
+	if cmd[0:4] == "sync":
+		args = cmd[4:]
+		parser = ArgumentParser(description='Keep local copies of escrow left lists up to date and write what changed', prog='sync')
+		parser.add_argument("-currency", help='Crytocurrency to filter jobs by. Multiple can be given e.g. BTC,LTC', default=None)
+		parser.add_argument("-o", help='Directory to write remove and add lists to.', default=None)
+		parser.add_argument("-workers", help='Number of jobs to download at the same time.', default=config.DOWNLOAD_WORKERS, type=int)
+		parser.add_argument("-chunksize", help='Bytes to read at a time while downloading.', default=config.DOWNLOAD_CHUNK_SIZE, type=int)
+		parser.add_argument("-membudget", help='Megabytes of memory sorting left lists may use before spilling to disk.', default=config.MERGE_MEMORY_BUDGET, type=int)
+		g1 = parser.add_mutually_exclusive_group()
+		g1.add_argument("-jobid", help='Job ID to sync. Multiple IDs can be seperated with a comma. e.g. 3,4,5.', default=None)
+		g1.add_argument("-algid", help='Algorithm ID to sync', default=None)
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			if parsed.algid is not None and parsed.algid not in validalgs:
+				fail(parsed.algid+" is not a valid algorithm.")
+			elif parsed.jobid is None and parsed.algid is None and parsed.currency is None:
+				fail("A job ID, algorithm ID or currency is required.")
+			else:
+				sync(parsed.jobid, parsed.algid, parsed.currency, parsed.o, parsed.workers, parsed.chunksize, parsed.membudget)
+		except SystemExit:
+			None
+	if cmd[0:4] == "rank":
+		args = cmd[4:]
+		parser = ArgumentParser(description='Rank escrow jobs by expected USD per unit of compute', prog='rank')
+		parser.add_argument("-algid", help='Algorithm ID to filter jobs by. Multiple can be given e.g. 20,300,220', default=None)
+		parser.add_argument("-currency", help='Currency to filter jobs by. Multiple can be given e.g. BTC,LTC', default=None)
+		parser.add_argument("-limit", help='Rows to limit results by.', default=None, type=int)
+		parser.add_argument("-speeds", help='JSON file of algorithm ID to H/s or hashcat --benchmark output to use as speeds.', default=None)
+		parser.add_argument("-benchmark", help='Measure hashlib speeds again.', action='store_true')
+		parser.add_argument("-refresh", help='Ignore cached job list and fetch a new one.', action='store_true')
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			if parsed.speeds is not None and not os.path.exists(parsed.speeds):
+				fail("The file '%s' does not exist." % (parsed.speeds))
+			else:
+				algids = parsed.algid.split(",") if parsed.algid is not None else None
+				try:
+					rank(get_jobs(algid = algids, currency = parsed.currency, refresh = parsed.refresh), parsed.limit, parsed.speeds, parsed.benchmark)
+				except ValueError as e:
+					fail(e)
+		except SystemExit:
+			None
+	if cmd[0:4] == "help":
+		table = PrettyTable()
+		table.field_names = ["Command", "Description", "Flags"]
+		table.align = "l"
+		table.add_row(["get jobs", "Get current jobs in escrow", "-algid, -jobid, -currency, -sortby, -r, -limit, -refresh, --help"])
+		table.add_row(["download", "Download to file or print jobs from escrow", "-jobid, -algid, -currency, -f, -p, -d, -merge, -membudget, -workers, -chunksize, -refresh, --help"])
+		table.add_row(["sync", "Update local left lists and write hashes removed since the last sync", "-jobid, -algid, -currency, -o, -workers, -chunksize, -membudget, --help"])
+		table.add_row(["rank", "Rank jobs by expected USD per unit of compute", "-algid, -currency, -limit, -speeds, -benchmark, -refresh, --help"])
+		table.add_row(["stats", "Get stats about hashes left in escrow", "-algid, -refresh, --help"])
+		table.add_row(["watch", "Watch status of jobs in the background (printed when they change)", "-jobid, -length, -list, -stop, --help"])
+		table.add_row(["algs", "Get the algorithms hashes.com currently supports", "-algid, -search, -update, --help"])
+		table.add_row(["lookup", "Hash lookup **", "-single, -infile, -outfile, -p, -verbose, -workers, -budget, -nocache, -yes, --help"])
+		table.add_row(["id", "Hash identifier", "-hash, -infile, -extended, -local, -outdir, -processes, -remote, --help"])
+		table.add_row(["login", "Login to hashes.com or view login history.", "-email, -rememberme, -history*, --help"])
+		table.add_row(["upload", "Upload cracks to hashes.com **", "-algid, -file, -chunklines, -workers, --help"])
+		table.add_row(["match", "Match a potfile against local left lists and write founds files per algorithm", "-potfile, -outdir, -leftdir, -algid, -upload, -binary, --help"])
+		table.add_row(["leftbin", "Convert left lists to binary files for fast low memory matching", "-build, -totext, -diff, -contains, -info, -algid, -infile, -hash, -o, -nobloom, --help"])
+		table.add_row(["history", "Show history of submitted cracks **", "-limit, -r, -stats, -refresh, --help"])
+		table.add_row(["hints", "Display any available hints for a specified job ID **", "-jobid, -refresh, --help"])
+		table.add_row(["websocket", "Connect to hashes.com websocket API using a hook file **", "-hook, -workers, -queue, -policy, -executor, -broker, --help"])
+		table.add_row(["broker", "Share one hashes.com websocket with local subscribers **", "-host, -port, -replay, -buffer, --help"])
+		table.add_row(["record", "Record job list samples and new jobs for the market command **", "-interval, -nows, -broker, --help"])
+		table.add_row(["market", "Show price trends or crack velocity and completion estimates from recorded samples", "-trends, -velocity, -algid, -jobid, -since, -bucket, -limit, --help"])
+		table.add_row(["metrics", "Show request, command and websocket metrics", "-export, -reset, --help"])
+		table.add_row(["profile", "Run a command under cProfile and tracemalloc, e.g. profile stats", "Command to profile"])
+		table.add_row(["withdrawals", "Show all withdrawal requests **", "No flags"])
+		table.add_row(["balance", "Show BTC balance **", "No flags"])
+		table.add_row(["logout", "Clear logged in session *", "No flags"])
+		table.add_row(["clear", "Clear console", "No flags"])
+		table.add_row(["exit", "Exit console", "No flags"])
+		print(table)
+		print("* = Must be logged in")
+		print("** = Only requires apikey")
+	if cmd[0:5] == "stats":
+		args = cmd[5:]
+		parser = ArgumentParser(description='Get stats for hashes left in escrow from hashes.com', prog='stats')
+		parser.add_argument("-algid", help='Algorithm ID to sort stats by. Multiple can be given e.g. 20,300,220', default=None)
+		parser.add_argument("-refresh", help='Ignore cached job list and fetch a new one.', action='store_true')
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			if parsed.algid is not None:
+				if "," in parsed.algid:
+					s = set(parsed.algid.split(","))
+					d = s.difference(validalgs)
+					s.intersection_update(validalgs)
+					if s is not None:
+						if len(d) > 0:
+							fail(",".join(d)+" are not valid algorithm IDs.")
+						get_stats(get_jobs("createdAt", s, refresh=parsed.refresh))
 					else:
-						table.add_row([aid, name])
+						fail(",".join(d)+ " are not valid algorithm IDs.")
+				else:
+					if parsed.algid not in validalgs:
+						fail(parsed.algid+" is not a vlaid algorithm.")
+					else:
+						get_stats(get_jobs("createdAt", [parsed.algid], refresh=parsed.refresh))
+			else:
+				get_stats(get_jobs(refresh=parsed.refresh))
+		except SystemExit:
+			None
+	if cmd[0:4] == "algs":
+		args = cmd[4:]
+		parser = ArgumentParser(description='List of all algorithms that hashes.com supports', prog='algs')
+		parser.add_argument("-algid", help='Algorithm ID to lookup. Multiple can be given e.g. 20,300,220', default=None)
+		parser.add_argument("-search", help='Search algorithm by name.', default=None)
+		parser.add_argument("-update", help='Check hashes.com for changes to the algorithm list now.', action='store_true')
 
-				if len(table.get_string()) > 75:
-					print(table)
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			if parsed.update:
+				update_algs(background = False)
+			if parsed.algid:
+				ids = parsed.algid.split(",")
+			table = PrettyTable()
+			table.field_names = ["ID", "Algorithm"]
+			table.align = "l"
+
+			if parsed.algid:
+				for aid in list(ids):
+					if aid in validalgs:
+						table.add_row([aid, validalgs[aid]])
+						ids.remove(aid)
+			elif parsed.search:
+				for aid in registry.search(parsed.search):
+					table.add_row([aid, validalgs[aid]])
+			else:
+				for aid, name in registry.items():
+					table.add_row([aid, name])
+
+			if len(table.get_string()) > 75:
+				print(table)
+			else:
+				if parsed.search:
+					print("No results found for '%s'" % (parsed.search))
+			if parsed.algid:
+				if len(ids) > 0:
+					fail("%s not currently supported." % (",".join(ids)))
+		except SystemExit:
+			None
+	if cmd[0:5] == "login":
+		args = cmd[5:]
+		parser = ArgumentParser(description='Login to hashes.com', prog='login')
+		g1 = parser.add_mutually_exclusive_group(required=True)
+		g1.add_argument("-email", help='Email to hashes.com account.', default=None)
+		g1.add_argument("-history", help='Show login history.', action='store_true')
+		parser.add_argument("-rememberme", help='Save session to reload after closing console.', action='store_true')
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			if parsed.history:
+				if session is not None:
+					recent_logins()
 				else:
-					if parsed.search:
-						print("No results found for '%s'" % (parsed.search))
-				if parsed.algid:
-					if len(ids) > 0:
-						print("%s not currently supported." % (",".join(ids)))
-			except SystemExit:
-				None
-		if cmd[0:5] == "login":
-			args = cmd[5:]
-			parser = argparse.ArgumentParser(description='Login to hashes.com', prog='login')
-			g1 = parser.add_mutually_exclusive_group(required=True)
-			g1.add_argument("-email", help='Email to hashes.com account.', default=None)
-			g1.add_argument("-history", help='Show login history.', action='store_true')
-			parser.add_argument("-rememberme", help='Save session to reload after closing console.', action='store_true')
+					fail("You must be logged in for this action.")
+			elif parsed.email is not None:
+				if session is None:
+					email = parsed.email
+					password = getpass()
+					login(email, password, parsed.rememberme)
+				else:
+					print("You are already logged in!")
+		except SystemExit:
+			None
+	if cmd[0:6] == "upload":
+		if apikey is not None:
+			args = cmd[6:]
+			parser = ArgumentParser(description='Upload cracked hashes to hashes.com', prog='upload')
+			parser.add_argument("-algid", help='Algorithm ID of cracked hashes', required=True, default=None)
+			parser.add_argument("-file", help='File of cracked hashes', required=True, default=None)
+			parser.add_argument("-chunklines", help='Most lines to send in one upload.', default=config.UPLOAD_CHUNK_LINES, type=int)
+			parser.add_argument("-workers", help='Number of chunks to upload at the same time.', default=config.UPLOAD_WORKERS, type=int)
 			try:
 				parsed = parser.parse_args(shlex.split(args))
-				if parsed.history:
-					if session is not None:
-						recent_logins()
-					else:
-						print("You must be logged in for this action.")
-				elif parsed.email is not None:
-					if session is None:
-						email = parsed.email
-						password = getpass()
-						login(email, password, parsed.rememberme)
-					else:
-						print("You are already logged in!")
+				if parsed.algid not in validalgs:
+					fail(parsed.algid+" is not a valid algorithm ID")
+				elif os.path.exists(parsed.file) == False:
+					fail(parsed.file+" does not exist")
+				elif not parsed.file.lower().endswith(".txt"):
+					fail("File type must be .txt")
+				else:
+					upload(parsed.algid, parsed.file, parsed.chunklines, parsed.workers)
 			except SystemExit:
 				None
-		if cmd[0:6] == "upload":
-			if apikey is not None:
-				args = cmd[6:]
-				parser = argparse.ArgumentParser(description='Upload cracked hashes to hashes.com', prog='upload')
-				parser.add_argument("-algid", help='Algorithm ID of cracked hashes', required=True, default=None)
-				parser.add_argument("-file", help='File of cracked hashes', required=True, default=None)
-				try:
-					parsed = parser.parse_args(shlex.split(args))
-					if parsed.algid not in validalgs:
-						print (parsed.algid+" is not a valid algorithm ID")
-					elif os.path.exists(parsed.file) == False:
-						print (parsed.file+" does not exist")
-					elif not parsed.file.lower().endswith(".txt"):
-						print ("File type must be .txt")
-					else:
-						upload(parsed.algid, parsed.file)
-				except SystemExit:
-					None
+		else:
+			fail("API key is required for this action.")
+	if cmd[0:5] == "match":
+		args = cmd[5:]
+		parser = ArgumentParser(description='Match a potfile against local left lists and write founds files ready to upload.', prog='match')
+		parser.add_argument("-potfile", help='Potfile to match e.g. hashcat.potfile', required=True)
+		parser.add_argument("-outdir", help='Directory founds files are written to.', default=config.MATCH_DIR)
+		parser.add_argument("-leftdir", help='Directory of left lists. Defaults to the copies kept by sync.', default=config.LEFTLIST_DIR)
+		parser.add_argument("-algid", help='Algorithm IDs to match. Multiple can be given e.g. 0,1000', default=None)
+		parser.add_argument("-upload", help='Upload the founds files once they are written.', action='store_true')
+		parser.add_argument("-binary", help='Match unsalted algorithms from binary left lists to save memory.', action='store_true')
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			if not os.path.exists(parsed.potfile):
+				fail("The file '%s' does not exist." % (parsed.potfile))
+			elif not os.path.isdir(parsed.leftdir):
+				fail("The directory '%s' does not exist." % (parsed.leftdir))
+			elif parsed.upload and apikey is None:
+				fail("API key is required for this action.")
 			else:
-				print("API key is required for this action.")
-		if cmd[0:7] == "history":
-			if apikey is not None:
-				args = cmd[7:]
-				parser = argparse.ArgumentParser(description='View history of submitted cracks.', prog='history')
-				parser.add_argument("-r", help='Reverse order of history.', required=False, action='store_true')
-				parser.add_argument("-limit", help='Number of rows to limit results.', required=False, type=int)
-				parser.add_argument("-stats", help='See history stats.', required=False, action='store_true')
-				try:
-					parsed = parser.parse_args(shlex.split(args))
-					get_escrow_history(parsed.r, parsed.limit, parsed.stats)
-				except SystemExit:
-					None
+				match(parsed.potfile, parsed.outdir, parsed.leftdir, parsed.algid.split(",") if parsed.algid else None, parsed.upload, parsed.binary)
+		except SystemExit:
+			None
+	if cmd[0:7] == "leftbin":
+		args = cmd[7:]
+		parser = ArgumentParser(description='Convert left lists to sorted binary files that are searched with mmap.', prog='leftbin')
+		g = parser.add_mutually_exclusive_group(required=True)
+		g.add_argument("-build", help='Convert text left lists to a binary left list.', action='store_true')
+		g.add_argument("-totext", help='Convert a binary left list back to text.', default=None)
+		g.add_argument("-diff", help='Write hashes in the first binary left list that are not in the second e.g. old.hbin,new.hbin', default=None)
+		g.add_argument("-contains", help='Binary left list to check -hash against.', default=None)
+		g.add_argument("-info", help='Show the header of a binary left list.', default=None)
+		parser.add_argument("-algid", help='Algorithm ID of the left lists kept by sync to convert.', default=None)
+		parser.add_argument("-infile", help='Text left lists to convert instead. Multiple can be given e.g. 1.txt,2.txt', default=None)
+		parser.add_argument("-hash", help='Hashes to check. Multiple can be given e.g. hash1,hash2', default=None)
+		parser.add_argument("-o", help='Output file.', default=None)
+		parser.add_argument("-nobloom", help='Leave out the Bloom filter.', action='store_true')
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			if parsed.build and parsed.algid is None and parsed.infile is None:
+				print("-build needs -algid or -infile.")
+			elif (parsed.totext or parsed.diff) and parsed.o is None:
+				fail("-o is required to write hashes.")
+			elif parsed.diff and len(parsed.diff.split(",")) != 2:
+				print("-diff needs two binary left lists e.g. old.hbin,new.hbin")
+			elif parsed.contains and parsed.hash is None:
+				print("-contains needs -hash.")
 			else:
-				print("API key is required for this action.")
-		if cmd[0:5] == "watch":
-				args = cmd[5:]
-				parser = argparse.ArgumentParser(description='Watch status of job ID.', prog='watch')
-				parser.add_argument("-jobid", help='Job ID to watch. Multiple can be given e.g. 29374,29294,8', required=True)
-				parser.add_argument("-length", help='Length in minutes to watch job.', required=False, default=5, type=int)
 				try:
-					parsed = parser.parse_args(shlex.split(args))
-					stime = time.time()
-
-					# In order to use ANSI escape codes on Windows they must be activated first.
-					# The easiest way that I have found is to simply run the color command first
-					if sys.platform == 'win32':
-						os.system("color")
-
-					print ("Watching job IDs: %s" % (parsed.jobid))
-					print ("Use Ctrl + C to end watch session.\n")
-					prev = None
-					try:
-						while True:
-							count = watch(parsed.jobid, stime, parsed.length, prev)
-							if count == False:
-								break
-							time.sleep(10)
-							prev = count
-							print("\033[%sF\033[J" % (count), end="")
-					except KeyboardInterrupt:
-						print("\n")
-						continue
-				except SystemExit:
-					None
-		if cmd[0:2] == "id":
-			args = cmd[2:]
-			parser = argparse.ArgumentParser(description='List potential hash algorithms for a given hash.', prog='id')
-			parser.add_argument("-hash", help="Hash to identify.", required=True)
-			parser.add_argument("-extended", help="Show extended results.", action='store_true')
+					leftbin(parsed)
+				except (OSError, ValueError) as e:
+					fail(e)
+		except SystemExit:
+			None
+	if cmd[0:7] == "history":
+		if apikey is not None:
+			args = cmd[7:]
+			parser = ArgumentParser(description='View history of submitted cracks.', prog='history')
+			parser.add_argument("-r", help='Reverse order of history.', required=False, action='store_true')
+			parser.add_argument("-limit", help='Number of rows to limit results.', required=False, type=int)
+			parser.add_argument("-stats", help='See history stats.', required=False, action='store_true')
+			parser.add_argument("-refresh", help='Ignore saved history and fetch it again.', action='store_true')
 			try:
 				parsed = parser.parse_args(shlex.split(args))
-				print("Possible algorithms for '%s':" % (parsed.hash))
-				hashid(parsed.hash, parsed.extended)
+				get_escrow_history(parsed.r, parsed.limit, parsed.stats, parsed.refresh)
 			except SystemExit:
 				None
-		if cmd[0:6] == "lookup":
-			if apikey is not None:
-				args = cmd[6:]
-				parser = argparse.ArgumentParser(description='Hash lookup', prog='lookup')
-				parser.add_argument("-verbose", help='Display algorithm of hashes that are found.', action='store_true')
-				g1 = parser.add_mutually_exclusive_group()
-				g1.add_argument("-infile", help='Input file with hashes to lookup', default=None)
-				g1.add_argument("-single", help='Sinlge line hash to lookup', default=None)
-				g2 = parser.add_mutually_exclusive_group(required=True)
-				g2.add_argument("-outfile", help='Output lookup results to a file', default=None)
-				g2.add_argument("-p", help='Print lookup results', action='store_true')
-				try:
-					parsed = parser.parse_args(shlex.split(args))
-					hashes = None
-					if parsed.single is not None:
-						hashes = [parsed.single]
-					elif parsed.infile is not None:
-						if os.path.exists(parsed.infile):
-							with open(parsed.infile) as infile:
-								hashes = infile.read().splitlines()
-						else:
-							print("The file '%s' does not exist." % (parsed.infile))
-					if hashes is not None:
-						if len(hashes) <= 250:
-							credits = get_escrow_balance(p = False)['credits']
-							pcost = 1 + len(hashes)
-							if int(credits) > 1:
-								if pcost > int(credits):
-									print("Warning: Depending on search results, you may not have enough credits for this transaction.")
-								if confirm("This transaction has a potential cost of %s credits. You have a balance of %s credits. Continue?" % (pcost, credits)):
-									hash_lookup(hashes, parsed.outfile, parsed.p, parsed.verbose)
-								else:
-									print("Lookup transaction canceled.")
-							else:
-								print("You don't have enough credits to process a lookup. You need at least 2 credits to process a lookup.")
-						else:
-							print("The maximum hashes allowed per request is 250!")
-				except SystemExit:
-					None
-			else:
-				print("API key is required for this action.")
-		if cmd[0:5] == "hints":
+		else:
+			fail("API key is required for this action.")
+	if cmd[0:5] == "watch":
 			args = cmd[5:]
-			parser = argparse.ArgumentParser(description='Get hints for job ID.', prog='hints')
-			parser.add_argument("-jobid", help="Job ID to get hints for.", required=True)
+			parser = ArgumentParser(description='Watch status of job IDs in the background.', prog='watch')
+			g1 = parser.add_mutually_exclusive_group(required=True)
+			g1.add_argument("-jobid", help='Job ID to watch. Multiple can be given e.g. 29374,29294,8')
+			g1.add_argument("-list", help='List jobs being watched.', action='store_true')
+			g1.add_argument("-stop", help='Stop watching job IDs. Multiple can be given e.g. 29374,29294,8 or all.')
+			parser.add_argument("-length", help='Length in minutes to watch job.', required=False, default=5, type=int)
 			try:
 				parsed = parser.parse_args(shlex.split(args))
-				data = []
-				for j in get_jobs():
-					if str(j["id"]) == parsed.jobid:
-						data.append(j)
-				if len(data) == 0:
-					print("%s is an invalid job id." % (parsed.jobid))
+				if parsed.jobid is not None:
+					watcher.watch(parsed.jobid.split(","), parsed.length)
+					print ("Watching job IDs: %s" % (parsed.jobid))
+					print ("Changes are printed as they happen. Use 'watch -stop' to end the watch.")
+				elif parsed.list:
+					table = PrettyTable()
+					table.field_names = ["ID", "Hashes Cracked", "Hashes Left", "Next Poll", "Time Left"]
+					table.align = "l"
+					for row in watcher.status():
+						table.add_row([row[0], row[1], row[2], "%ss" % (row[3]), "%ss" % (row[4])])
+					print(table)
 				else:
-					for hints in data:
-						try:
-							if hints['hints'] != "":
-								print("Hints for job id %s:" % (parsed.jobid))
-								print(hints['hints'])
-							else:
-								print("No available hints for job id %s." % (parsed.jobid))
-						except KeyError:
-							print("Hints are disabled for your usergroup.")
+					watcher.stop(None if parsed.stop == "all" else parsed.stop.split(","))
+					print ("Stopped watching job IDs: %s" % (parsed.stop))
 			except SystemExit:
 				None
-		if cmd[0:9] == "websocket":
-			args = cmd[9:]
-			parser = argparse.ArgumentParser(description='Connect to hashes.com Websocket API.', prog='websocket')
-			parser.add_argument("-hook", help="Name of hook file. (Must be stored in same dir)", required=True)
+	if cmd[0:2] == "id":
+		args = cmd[2:]
+		parser = ArgumentParser(description='List potential hash algorithms for a given hash.', prog='id')
+		g1 = parser.add_mutually_exclusive_group(required=True)
+		g1.add_argument("-hash", help="Hash to identify.")
+		g1.add_argument("-infile", help="File of hashes to identify offline.")
+		parser.add_argument("-extended", help="Show extended results.", action='store_true')
+		parser.add_argument("-local", help="Identify -hash offline, only asking hashes.com when nothing matches.", action='store_true')
+		parser.add_argument("-outdir", help="Directory to write one file per candidate algorithm to when using -infile.", default="identified")
+		parser.add_argument("-processes", help="Number of processes used with -infile. Defaults to one per CPU.", default=None, type=int)
+		parser.add_argument("-remote", help="Number of unmatched hashes from -infile to send to hashes.com.", default=0, type=int)
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			if parsed.infile is not None:
+				if os.path.exists(parsed.infile):
+					bulk_hashid(parsed.infile, parsed.outdir, parsed.processes, parsed.remote)
+				else:
+					fail("The file '%s' does not exist." % (parsed.infile))
+			else:
+				print("Possible algorithms for '%s':" % (parsed.hash))
+				candidates = Signatures().classify(parsed.hash) if parsed.local else []
+				if candidates:
+					for aid in candidates:
+						print("%s: %s" % (aid, validalgs[aid]))
+				else:
+					hashid(parsed.hash, parsed.extended)
+		except SystemExit:
+			None
+	if cmd[0:6] == "lookup":
+		if apikey is not None:
+			args = cmd[6:]
+			parser = ArgumentParser(description='Hash lookup', prog='lookup')
+			parser.add_argument("-verbose", help='Display algorithm of hashes that are found.', action='store_true')
+			g1 = parser.add_mutually_exclusive_group()
+			g1.add_argument("-infile", help='Input file with hashes to lookup', default=None)
+			g1.add_argument("-single", help='Sinlge line hash to lookup', default=None)
+			g2 = parser.add_mutually_exclusive_group(required=True)
+			g2.add_argument("-outfile", help='Output lookup results to a file', default=None)
+			g2.add_argument("-p", help='Print lookup results', action='store_true')
+			parser.add_argument("-workers", help='Number of batches of 250 hashes to look up at the same time.', default=config.LOOKUP_WORKERS, type=int)
+			parser.add_argument("-budget", help='Most credits to spend. Defaults to your credit balance.', default=None, type=int)
+			parser.add_argument("-nocache", help='Ignore the local lookup cache and search every hash.', action='store_true')
+			parser.add_argument("-yes", help='Do not ask before spending credits, needed when running without a console.', action='store_true')
+			cache = None
 			try:
 				parsed = parser.parse_args(shlex.split(args))
-				try:
-					asyncio.run(main(parsed.hook))
-				except KeyboardInterrupt:
-					print("\nDisconnected from hashes.com Websocket API.")
+				hashes = None
+				cached = []
+				if parsed.single is not None:
+					hashes = [parsed.single]
+				elif parsed.infile is not None:
+					if os.path.exists(parsed.infile):
+						hashes = read_hashes(parsed.infile)
+					else:
+						fail("The file '%s' does not exist." % (parsed.infile))
+				if hashes:
+					cache = None if parsed.nocache else LookupCache()
+					if cache is not None:
+						cached, hashes, negatives = cache.split(hashes)
+						if cached or negatives:
+							print("%s results found in the local lookup cache. %s hashes were recently searched without results and will be skipped." % (len(cached), negatives))
+				if hashes:
+					credits = get_escrow_balance(p = False)['credits']
+					pcost = potential_cost(len(hashes))
+					budget = parsed.budget if parsed.budget is not None else int(credits)
+					if int(credits) > 1:
+						if pcost > int(credits):
+							print("Warning: Depending on search results, you may not have enough credits for this transaction.")
+						message = "This transaction of %s unique hashes has a potential cost of %s credits. You have a balance of %s credits and a budget of %s credits." % (len(hashes), pcost, credits, budget)
+						if not parsed.yes and not sys.stdin.isatty():
+							# Scripts and cron jobs have no one to answer the prompt
+							print(message)
+							fail("Lookup transaction canceled. Use -yes to confirm it without a console.")
+						elif parsed.yes or confirm(message + " Continue?"):
+							hash_lookup(hashes, parsed.outfile, parsed.p, parsed.verbose, budget, parsed.workers, cache, cached)
+						else:
+							print("Lookup transaction canceled.")
+					else:
+						fail("You don't have enough credits to process a lookup. You need at least 2 credits to process a lookup.")
+				elif hashes is not None and cached:
+					hash_lookup(hashes, parsed.outfile, parsed.p, parsed.verbose, cached=cached)
+				elif hashes is not None:
+					print("No hashes to look up.")
 			except SystemExit:
 				None
-		if cmd[0:7] == "balance":
-			if apikey is not None:
-				get_escrow_balance()
-			else:
-				print("API key is required for this action.")
-		if cmd == "withdrawals":
-			if apikey is not None:
-				withdraw_requests()
+			finally:
+				if cache is not None:
+					cache.close()
+		else:
+			fail("API key is required for this action.")
+	if cmd[0:5] == "hints":
+		args = cmd[5:]
+		parser = ArgumentParser(description='Get hints for job ID.', prog='hints')
+		parser.add_argument("-jobid", help="Job ID to get hints for.", required=True)
+		parser.add_argument("-refresh", help='Ignore cached job list and fetch a new one.', action='store_true')
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			data = list(get_jobs(refresh=parsed.refresh).filter(jobids = [parsed.jobid]))
+			if len(data) == 0:
+				fail("%s is an invalid job id." % (parsed.jobid))
 			else:
-				print("API key is required for this action.")
-		if cmd[0:6] == "logout":
-			if session is not None:
-				session = None
-				print("Logged out.")
+				for hints in data:
+					try:
+						if hints['hints'] != "":
+							print("Hints for job id %s:" % (parsed.jobid))
+							print(hints['hints'])
+						else:
+							print("No available hints for job id %s." % (parsed.jobid))
+					except KeyError:
+						print("Hints are disabled for your usergroup.")
+		except SystemExit:
+			None
+	if cmd[0:9] == "websocket":
+		args = cmd[9:]
+		parser = ArgumentParser(description='Connect to hashes.com Websocket API.', prog='websocket')
+		parser.add_argument("-hook", help="Name of hook file. (Must be stored in same dir)", required=True)
+		parser.add_argument("-workers", help="Number of hook calls to run at the same time.", default=config.HOOK_WORKERS, type=int)
+		parser.add_argument("-queue", help="Number of messages that can wait for a free worker.", default=config.HOOK_QUEUE_SIZE, type=int)
+		parser.add_argument("-policy", help="What to do when the queue is full.", default="block", choices=("block", "drop", "coalesce"))
+		parser.add_argument("-executor", help="Where sync hooks run.", default="thread", choices=("thread", "process"))
+		parser.add_argument("-broker", help="Connect to a local broker e.g. ws://127.0.0.1:8765 instead of hashes.com.", default=None)
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			import asyncio
+			try:
+				asyncio.run(main(parsed.hook, parsed.workers, parsed.queue, parsed.policy, parsed.executor, parsed.broker))
+			except KeyboardInterrupt:
+				print("\nDisconnected from hashes.com Websocket API.")
+		except SystemExit:
+			None
+	if cmd[0:6] == "broker":
+		args = cmd[6:]
+		parser = ArgumentParser(description='Share one hashes.com websocket connection with local subscribers.', prog='broker')
+		parser.add_argument("-host", help="Address to listen on.", default=config.BROKER_HOST)
+		parser.add_argument("-port", help="Port to listen on.", default=config.BROKER_PORT, type=int)
+		parser.add_argument("-replay", help="Number of recent events sent to new subscribers.", default=config.BROKER_REPLAY, type=int)
+		parser.add_argument("-buffer", help="Number of events held for each subscriber.", default=config.BROKER_BUFFER, type=int)
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			import asyncio
+			from inc.broker import Broker
+			broker = Broker(config.WSS_URL % (apikey), parsed.host, parsed.port, parsed.replay, parsed.buffer)
+			try:
+				asyncio.run(broker.run())
+			except KeyboardInterrupt:
+				print("\nBroker stopped after %s events to %s subscribers, %s dropped." % (broker.counters['events'], broker.counters['subscribers'], broker.counters['dropped']))
+		except SystemExit:
+			None
+	if cmd[0:6] == "record":
+		args = cmd[6:]
+		parser = ArgumentParser(description='Record job list samples and new jobs from the websocket for the market command.', prog='record')
+		parser.add_argument("-interval", help='Seconds between job list samples.', default=config.RECORD_INTERVAL, type=int)
+		parser.add_argument("-nows", help='Only sample the job list, do not listen for new jobs on the websocket.', action='store_true')
+		parser.add_argument("-broker", help='Listen for new jobs on a local broker url e.g. ws://127.0.0.1:8765 instead of hashes.com.', default=None)
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			import asyncio
+			from inc.recorder import Recorder
+			url = None if parsed.nows else parsed.broker if parsed.broker is not None else config.WSS_URL % (apikey)
+			recorder = Recorder(MarketStore(), lambda: get_jobs(refresh = True), url, max(1, parsed.interval))
+			try:
+				asyncio.run(recorder.run())
+			except KeyboardInterrupt:
+				print("\nRecording stopped after %s polls, %s samples and %s new jobs." % (recorder.counters['polls'], recorder.counters['sampled'], recorder.counters['new']))
+		except SystemExit:
+			None
+	if cmd[0:6] == "market":
+		args = cmd[6:]
+		parser = ArgumentParser(description='Show price trends or crack velocity from recorded samples.', prog='market')
+		g = parser.add_mutually_exclusive_group()
+		g.add_argument("-trends", help='Show USD price per hash of every algorithm over time.', action='store_true')
+		g.add_argument("-velocity", help='Show hashes cracked per hour and estimated completion of every job (default).', action='store_true')
+		parser.add_argument("-algid", help='Algorithm ID to filter by. Multiple can be given e.g. 20,300,220', default=None)
+		parser.add_argument("-jobid", help='Job ID to filter by. Multiple can be given e.g. 1,2,3', default=None)
+		parser.add_argument("-since", help='Only use samples from the last number of hours.', default=None, type=float)
+		parser.add_argument("-bucket", help='Hours in every price trend row.', default=1, type=float)
+		parser.add_argument("-limit", help='Rows to limit results by.', default=None, type=int)
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			market(parsed.trends, parsed.algid.split(",") if parsed.algid else None, parsed.jobid.split(",") if parsed.jobid else None, parsed.since, parsed.bucket, parsed.limit)
+		except SystemExit:
+			None
+		except ValueError:
+			fail("Algorithm and job IDs must be numbers.")
+	if cmd[0:7] == "metrics":
+		args = cmd[7:]
+		parser = ArgumentParser(description='Show request, command and websocket metrics', prog='metrics')
+		parser.add_argument("-export", help='File to write metrics to, JSON when it ends in .json otherwise Prometheus text format.', default=None)
+		parser.add_argument("-reset", help='Clear all metrics.', action='store_true')
+		try:
+			parsed = parser.parse_args(shlex.split(args))
+			if parsed.export is not None:
+				try:
+					metrics.export(parsed.export)
+					print("Wrote metrics to: %s" % (parsed.export))
+				except OSError as e:
+					fail(e)
+			elif parsed.reset:
+				metrics.reset()
+				print("Metrics cleared.")
 			else:
-				print("You are not logged in.")
-		if cmd[0:5] == "clear":
-			os.system('cls||clear');
-		if cmd[0:4] == "exit":
-			break
-except KeyboardInterrupt:
-	False
\ No newline at end of file
+				show_metrics()
+		except SystemExit:
+			None
+	if cmd[0:7] == "balance":
+		if apikey is not None:
+			get_escrow_balance()
+		else:
+			fail("API key is required for this action.")
+	if cmd == "withdrawals":
+		if apikey is not None:
+			withdraw_requests()
+		else:
+			fail("API key is required for this action.")
+	if cmd[0:6] == "logout":
+		if session is not None:
+			session = None
+			print("Logged out.")
+		else:
+			fail("You are not logged in.")
+	if cmd[0:5] == "clear":
+		os.system('cls||clear');
+	if cmd[0:4] == "exit":
+		return False
+	return True
+
+# Interactive console
+def console():
+	# Print header at start of script
+	print(header)
+
+	# Check if there is an exisiting session saved
+	load_session()
+
+	# Check if api key exists
+	setup()
+
+	# Check if valid algorithm list is updated
+	update_algs()
+
+	# If logged in display last 3 attempted logins
+	if session is not None:
+		print("\nLast 3 login attempts:")
+		recent_logins(3)
+
+	if sys.platform == 'win32':
+		import pyreadline3
+	else:
+		import readline
+
+	try:
+		while True:
+			cmd = input("hashes.com:~$ ")
+			if run_command(cmd) == False:
+				break
+	except KeyboardInterrupt:
+		False
+
+# Runs one command given as arguments without any prompts and exits
+# Returns the exit status, 0 unless the command failed
+# e.g. python3 hashes.py get jobs -algid 1000 --json
+# --json prints results as JSON where supported and --timing reports start up and command time on stderr
+# --profile runs the command under cProfile and tracemalloc and writes the report to the profiles directory
+def oneshot(argv):
+	global output_json
+	timing = "--timing" in argv
+	profiled = "--profile" in argv
+	output_json = "--json" in argv
+	argv = [arg for arg in argv if arg not in ("--json", "--timing", "--profile")]
+	load_session(ask = False)
+	setup(interactive = False)
+	ready = time.perf_counter()
+	try:
+		if profiled:
+			profile(shlex.join(argv))
+		else:
+			run_command(shlex.join(argv))
+		# A watch runs in the background so wait for it before exiting
+		while watcher.thread is not None:
+			time.sleep(1)
+	except KeyboardInterrupt:
+		None
+	if timing:
+		done = time.perf_counter()
+		print("Start up: {0:.1f} ms, command: {1:.1f} ms, total: {2:.1f} ms".format((ready - started) * 1000, (done - ready) * 1000, (done - started) * 1000), file=sys.stderr)
+	return exit_status
+
+if __name__ == "__main__":
+	if len(sys.argv) > 1:
+		sys.exit(oneshot(sys.argv[1:]))
+	else:
+		console()
@@ -0,0 +1,77 @@
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from inc import config
+
+# API client shared by every call made to hashes.com
+# Holds one pooled keep-alive session so connections are reused between calls
+# Every request is recorded in metrics when one is given
+class APIClient:
+	def __init__(self, apikey = None, base = config.BASE_URL, pool_size = config.POOL_SIZE, timeout = config.TIMEOUT, retries = config.RETRIES, backoff = config.BACKOFF, metrics = None):
+		self.apikey = apikey
+		self.metrics = metrics
+		self.base = base.rstrip("/")
+		self.timeout = timeout
+		self.session = requests.Session()
+		# Only idempotent requests are retried on a bad status so uploads and searches are never sent twice
+		retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504), allowed_methods=frozenset(["GET", "HEAD"]), raise_on_status=False)
+		adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+		self.session.mount("https://", adapter)
+		self.session.mount("http://", adapter)
+
+	# Builds full url from an API path. Full urls are passed through untouched
+	def url(self, path):
+		if path.startswith("http://") or path.startswith("https://"):
+			return path
+		return self.base + path
+
+	# Returns params dict with the api key added
+	def keyed(self, params = None):
+		params = dict(params or {})
+		params["key"] = self.apikey
+		return params
+
+	# Streamed responses are recorded with their Content-Length as the body has not been read yet
+	def request(self, method, path, **kwargs):
+		kwargs.setdefault("timeout", self.timeout)
+		url = self.url(path)
+		if self.metrics is None:
+			return self.session.request(method, url, **kwargs)
+		start = time.perf_counter()
+		try:
+			resp = self.session.request(method, url, **kwargs)
+		except requests.exceptions.RequestException:
+			self.metrics.request(method, url, None, 0, time.perf_counter() - start, True)
+			raise
+		if kwargs.get("stream"):
+			size = int(resp.headers.get("Content-Length", 0) or 0)
+		else:
+			size = len(resp.content)
+		self.metrics.request(method, url, resp.status_code, size, time.perf_counter() - start)
+		return resp
+
+	def get(self, path, **kwargs):
+		return self.request("GET", path, **kwargs)
+
+	def post(self, path, **kwargs):
+		return self.request("POST", path, **kwargs)
+
+	# Decodes a JSON response, timing it when metrics are kept
+	def decode(self, resp):
+		if self.metrics is None:
+			return resp.json()
+		start = time.perf_counter()
+		try:
+			return resp.json()
+		finally:
+			self.metrics.parse(time.perf_counter() - start)
+
+	def get_json(self, path, **kwargs):
+		return self.decode(self.get(path, **kwargs))
+
+	def post_json(self, path, **kwargs):
+		return self.decode(self.post(path, **kwargs))
+
+	def close(self):
+		self.session.close()
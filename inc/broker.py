@@ -0,0 +1,70 @@
+import json
+import asyncio
+import websockets
+from collections import deque
+from inc import config
+
+# Holds the single hashes.com jobs websocket and republishes every event to local subscribers
+# Subscribers connect to ws://host:port and get the same JSON messages hashes.com sends, starting with the
+# last replay events. Every subscriber has its own buffer so a slow one never holds up the others
+class Broker:
+	def __init__(self, upstream, host = config.BROKER_HOST, port = config.BROKER_PORT, replay = config.BROKER_REPLAY, buffer = config.BROKER_BUFFER):
+		self.upstream = upstream
+		self.host = host
+		self.port = port
+		self.buffer = max(1, buffer)
+		self.recent = deque(maxlen=replay)
+		self.subscribers = {}
+		self.counters = {"events": 0, "subscribers": 0, "dropped": 0}
+
+	# Sends an event to every subscriber, dropping the oldest buffered event of subscribers that are full
+	def publish(self, raw):
+		self.counters['events'] += 1
+		self.recent.append(raw)
+		for queue in self.subscribers.values():
+			if queue.full():
+				queue.get_nowait()
+				self.counters['dropped'] += 1
+			queue.put_nowait(raw)
+
+	async def subscriber(self, websocket):
+		queue = asyncio.Queue(self.buffer)
+		for raw in list(self.recent)[-self.buffer:]:
+			queue.put_nowait(raw)
+		self.subscribers[websocket] = queue
+		self.counters['subscribers'] += 1
+		print("Subscriber connected (%s connected)." % (len(self.subscribers)))
+		try:
+			while True:
+				await websocket.send(await queue.get())
+		except websockets.exceptions.ConnectionClosed:
+			None
+		finally:
+			del self.subscribers[websocket]
+			print("Subscriber disconnected (%s connected)." % (len(self.subscribers)))
+
+	# Reads the upstream websocket forever, reconnecting when it drops
+	async def listen(self):
+		async for ws in websockets.connect(self.upstream):
+			try:
+				print("Connected to hashes.com websocket API...")
+				while True:
+					raw = await ws.recv()
+					message = json.loads(raw)
+					if message.get('success') == False:
+						print(message.get('message'))
+					self.publish(raw)
+			except websockets.exceptions.ConnectionClosedError:
+				# Redundant close request to avoid 3 connection limit error
+				await ws.close()
+				print("\nConnection closed. Reconnecting...")
+				await asyncio.sleep(5)
+				continue
+			except websockets.exceptions.ConnectionClosedOK:
+				break
+
+	async def run(self):
+		async with websockets.serve(self.subscriber, self.host, self.port):
+			print("Broker listening on ws://%s:%s" % (self.host, self.port))
+			print("Use Ctrl + C to stop the broker.\n")
+			await self.listen()
@@ -0,0 +1,101 @@
+# Default settings used by the hashes.com-cli
+# Values here can be changed to tune how the cli talks to hashes.com
+
+import os
+
+# Base url used for every API call
+# HASHES_BASE_URL points the cli at another server such as the benchmark stand-in in bench/server.py
+BASE_URL = os.environ.get("HASHES_BASE_URL", "https://hashes.com")
+# Websocket url new jobs are pushed from, %s is replaced with the api key
+WSS_URL = os.environ.get("HASHES_WSS_URL", BASE_URL.replace("http", "ws", 1) + "/en/api/jobs_wss/?key=%s")
+
+# HTTP connection pool settings
+# POOL_SIZE is the max number of keep-alive connections held open to hashes.com
+POOL_SIZE = 10
+# (connect, read) timeouts in seconds
+TIMEOUT = (10, 60)
+# Number of times a failed request is retried and the backoff factor between retries
+RETRIES = 3
+BACKOFF = 0.5
+
+# Seconds crypto to USD conversion rates are cached before being fetched again
+RATE_TTL = 60
+
+# Directory used for local caches and stores
+CACHE_DIR = "cache"
+
+# Seconds a job list snapshot is used before it is revalidated with hashes.com
+JOB_MAX_AGE = 60
+# File job snapshots are saved to so they survive restarts, one per API key and server e.g. jobs-<hash>.json. Set to None to keep them in memory only
+JOB_CACHE_FILE = CACHE_DIR + "/jobs.json"
+
+# Number of left lists downloaded at the same time
+DOWNLOAD_WORKERS = 4
+# Bytes read from the connection at a time when downloading left lists
+DOWNLOAD_CHUNK_SIZE = 1 << 16
+
+# Directory local copies of left lists are kept in by the sync command
+LEFTLIST_DIR = CACHE_DIR + "/leftlists"
+
+# Megabytes of memory the merge stage may use before spilling sorted runs to disk
+MERGE_MEMORY_BUDGET = 256
+
+# Number of hash lookup requests sent at the same time
+LOOKUP_WORKERS = 4
+
+# SQLite database lookup results are cached in
+LOOKUP_CACHE_FILE = CACHE_DIR + "/lookups.db"
+# Seconds a hash that was not found is remembered before it is looked up again
+LOOKUP_NEGATIVE_TTL = 7 * 24 * 60 * 60
+
+# SQLite database that tracks founds already uploaded
+UPLOAD_DB_FILE = CACHE_DIR + "/uploads.db"
+
+# SQLite database submitted crack history is kept in and seconds before history is fetched again
+HISTORY_DB_FILE = CACHE_DIR + "/history.db"
+HISTORY_MAX_AGE = 60
+# Most lines sent in a single upload, larger files are split into chunks of this size
+UPLOAD_CHUNK_LINES = 100000
+# Number of chunks uploaded at the same time
+UPLOAD_WORKERS = 2
+
+# Seconds between polls of watched jobs that changed recently and of jobs that have been idle
+WATCH_FAST_INTERVAL = 10
+WATCH_SLOW_INTERVAL = 120
+
+# Number of websocket hook calls run at the same time and how many messages may wait for a free worker
+HOOK_WORKERS = 4
+HOOK_QUEUE_SIZE = 100
+
+# Local websocket broker that shares one hashes.com websocket connection with other tools
+BROKER_HOST = "127.0.0.1"
+BROKER_PORT = 8765
+# Number of recent events sent to subscribers when they connect
+BROKER_REPLAY = 50
+# Number of events held for a subscriber that is not keeping up before the oldest are dropped
+BROKER_BUFFER = 1000
+
+# File the algorithm list from hashes.com is kept in and seconds before it is checked for changes
+ALGORITHMS_FILE = CACHE_DIR + "/algorithms.json"
+ALGORITHMS_TTL = 24 * 60 * 60
+
+# File hash speeds used to rank jobs are kept in. Speeds from hashcat benchmarks can be loaded over the top of it
+SPEEDS_FILE = CACHE_DIR + "/speeds.json"
+
+# Metrics are written to this file after every command when it is set, as JSON when it ends in .json and in the
+# Prometheus text format otherwise so a node_exporter textfile collector can read it
+METRICS_FILE = os.environ.get("HASHES_METRICS_FILE")
+# Directory --profile reports are written to
+PROFILE_DIR = "profiles"
+
+# File market samples are recorded to
+MARKET_FILE = CACHE_DIR + "/market.bin"
+# Seconds between job list samples of the record command and number of websocket jobs buffered before they are written
+RECORD_INTERVAL = 300
+RECORD_FLUSH = 500
+
+# Directory the match command writes founds files to
+MATCH_DIR = "matched"
+
+# Bloom filter bits per hash in binary left lists, 0 leaves the filter out. 10 bits gives about 1% false positives
+LEFTBIN_BLOOM_BITS = 10
@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from inc import config
+
+# Formats a byte count as KB or MB
+def human(size):
+	if size < 1048576:
+		return "{0:.2f} KB".format(size / float(1<<10))
+	return "{0:.2f} MB".format(size / float(1<<20))
+
+# Progress bar of width characters
+def bar(done, total, width):
+	end = min(int(width * done / total), width) if total else 0
+	return "[%s%s]" % ('=' * end, ' ' * (width - end))
+
+# Tracks per job and aggregate progress of a download run
+# Every job being downloaded gets a line with its own progress and throughput above the aggregate line.
+# The lines are redrawn in place by moving the cursor back up to the first of them
+class Progress:
+	def __init__(self, jobs):
+		self.jobs = jobs
+		self.totals = {}
+		self.done = {}
+		# Job id to (time the download began, bytes transferred this run) of jobs still downloading
+		self.active = {}
+		self.finished = 0
+		self.transferred = 0
+		self.start = time.time()
+		self.drawn = 0
+		self.lines = 0
+		self.lock = threading.Lock()
+
+	# done is the number of bytes already on disk from an earlier run
+	def begin(self, jobid, total, done = 0):
+		with self.lock:
+			self.totals[jobid] = total
+			self.done[jobid] = done
+			self.active[jobid] = (time.time(), 0)
+
+	def update(self, jobid, size):
+		with self.lock:
+			self.done[jobid] += size
+			self.transferred += size
+			started, transferred = self.active[jobid]
+			self.active[jobid] = (started, transferred + size)
+			# Redraw at most 10 times a second so printing never slows the download
+			if time.time() - self.drawn >= 0.1:
+				self.draw()
+
+	# Bytes a second a job has been downloaded at this run
+	def rate(self, jobid):
+		with self.lock:
+			started, transferred = self.active.get(jobid, (time.time(), 0))
+			return transferred / max(time.time() - started, 0.001)
+
+	def finish(self, jobid, message):
+		with self.lock:
+			self.finished += 1
+			self.active.pop(jobid, None)
+			print(self.clear() + message, flush=True)
+			self.lines = 0
+			self.draw()
+
+	# Moves the cursor to the first line drawn and erases everything below it
+	def clear(self):
+		return "\r" + ("\033[%sA" % (self.lines - 1) if self.lines > 1 else "") + "\033[J"
+
+	def draw(self):
+		now = time.time()
+		lines = []
+		for jobid, (started, transferred) in sorted(self.active.items()):
+			lines.append("Job %s: %s %s/%s %s/s" % (jobid, bar(self.done[jobid], self.totals[jobid], 20), human(self.done[jobid]), human(self.totals[jobid]) if self.totals[jobid] else "?", human(transferred / max(now - started, 0.001))))
+		downloaded = sum(self.done.values())
+		total = sum(t for t in self.totals.values() if t)
+		elapsed = max(now - self.start, 0.001)
+		lines.append("%s %s/%s %s/s %s/%s jobs" % (bar(downloaded, total, 50), human(downloaded), human(total), human(self.transferred / elapsed), self.finished, self.jobs))
+		print(self.clear() + "\n".join(lines), flush=True, end='')
+		self.lines = len(lines)
+		self.drawn = now
+
+# Loads the checkpoint of a download, returns None when there is none
+def load_checkpoint(path):
+	try:
+		with open(path + ".ckpt", "r") as ckptfile:
+			return json.load(ckptfile)
+	except (OSError, ValueError):
+		return None
+
+# Saves the checkpoint of a download
+def save_checkpoint(path, checkpoint):
+	with open(path + ".ckpt.tmp", "w") as ckptfile:
+		json.dump(checkpoint, ckptfile)
+	os.replace(path + ".ckpt.tmp", path + ".ckpt")
+
+# Downloads left lists of several jobs at once using a bounded pool of workers
+# Every job is downloaded to <path>.part next to a <path>.ckpt checkpoint holding the job id, lastUpdate,
+# byte offset and the validator the server sent. Interrupted downloads continue from the offset with a Range
+# request and only replace <path> once complete. Jobs whose copy matches the current lastUpdate are skipped
+class Downloader:
+	def __init__(self, client, workers = config.DOWNLOAD_WORKERS, chunksize = config.DOWNLOAD_CHUNK_SIZE):
+		self.client = client
+		self.workers = max(1, workers)
+		self.chunksize = chunksize
+
+	# Returns True if path already holds the left list for the jobs current lastUpdate
+	def current(self, job, path):
+		checkpoint = load_checkpoint(path)
+		return checkpoint is not None and checkpoint.get('complete') and checkpoint.get('lastUpdate') == job.get('lastUpdate') and os.path.exists(path)
+
+	# Streams the left list of a single job into path, resuming a partial download when possible
+	# Returns the size of the finished file and whether it was skipped
+	def fetch(self, job, path, progress):
+		if self.current(job, path):
+			size = os.path.getsize(path)
+			progress.begin(job['id'], size, size)
+			return size, True
+		part = path + ".part"
+		checkpoint = load_checkpoint(path)
+		offset = 0
+		headers = {'Accept-Encoding': None}
+		if checkpoint is not None and not checkpoint.get('complete') and checkpoint.get('lastUpdate') == job.get('lastUpdate') and os.path.exists(part):
+			offset = os.path.getsize(part)
+			if offset > 0:
+				headers['Range'] = "bytes=%s-" % (offset)
+				if checkpoint.get('validator'):
+					headers['If-Range'] = checkpoint['validator']
+		req = self.client.get(job['leftList'], stream=True, headers=headers)
+		if req.status_code == 416:
+			# Range past the end of the file, the partial copy can not be trusted so start again
+			req.close()
+			offset = 0
+			headers.pop('Range', None)
+			headers.pop('If-Range', None)
+			req = self.client.get(job['leftList'], stream=True, headers=headers)
+		req.raise_for_status()
+		if req.status_code != 206:
+			offset = 0
+		length = req.headers.get('Content-Length')
+		progress.begin(job['id'], offset + int(length) if length is not None else None, offset)
+		checkpoint = {"id": job['id'], "lastUpdate": job.get('lastUpdate'), "offset": offset, "validator": req.headers.get('ETag') or req.headers.get('Last-Modified'), "complete": False}
+		save_checkpoint(path, checkpoint)
+		saved = offset
+		with open(part, "ab" if offset > 0 else "wb") as outfile:
+			for chunk in req.iter_content(self.chunksize):
+				outfile.write(chunk)
+				offset += len(chunk)
+				progress.update(job['id'], len(chunk))
+				# Checkpoint every 8 MB so an interruption loses little
+				if offset - saved >= 1 << 23:
+					outfile.flush()
+					checkpoint['offset'] = saved = offset
+					save_checkpoint(path, checkpoint)
+		os.replace(part, path)
+		checkpoint['offset'] = offset
+		checkpoint['complete'] = True
+		save_checkpoint(path, checkpoint)
+		return offset, False
+
+	# Downloads all jobs. Writes one file per job to outdir or writes every job to outfile in the order given
+	# Single file downloads keep their parts in a .<name>.parts directory next to outfile so they can be resumed
+	# and outfile is replaced in one step instead of being appended to. Once outfile is written only the parts of
+	# failed jobs are kept, for the next run to resume or fall back to
+	# Returns dict of job id to bytes in the finished file, failed jobs are left out
+	# Raises OSError when a job failed that has no earlier download to put in outfile
+	def run(self, jobs, outfile = None, outdir = None):
+		progress = Progress(len(jobs))
+		results = {}
+		if outdir is None:
+			outdir = os.path.join(os.path.dirname(os.path.abspath(outfile)), "." + os.path.basename(outfile) + ".parts")
+		os.makedirs(outdir, exist_ok=True)
+		paths = {}
+		for job in jobs:
+			paths[job['id']] = os.path.join(outdir, "%s.txt" % (job['id']))
+
+		def work(job):
+			try:
+				size, skipped = self.fetch(job, paths[job['id']], progress)
+				results[job['id']] = size
+				if skipped:
+					progress.finish(job['id'], "Job %s: already up to date" % (job['id']))
+				else:
+					progress.finish(job['id'], "Job %s: %s downloaded at %s/s" % (job['id'], human(size), human(progress.rate(job['id']))))
+			except Exception as e:
+				progress.finish(job['id'], "Job %s: download failed (%s)" % (job['id'], e))
+
+		with ThreadPoolExecutor(max_workers=self.workers) as pool:
+			list(pool.map(work, jobs))
+		print()
+		if outfile is not None:
+			# Failed jobs keep the part downloaded last time, outfile is left alone when a failed job has none
+			failed = [job['id'] for job in jobs if job['id'] not in results]
+			missing = [str(jobid) for jobid in failed if not os.path.exists(paths[jobid])]
+			if missing:
+				raise OSError("Job IDs %s failed to download, %s was left unchanged." % (",".join(missing), outfile))
+			if failed:
+				print("Job IDs %s failed to download, their last downloaded left lists were used." % (",".join(str(jobid) for jobid in failed)))
+			# Parts are joined in job order so the output does not depend on which download finished first
+			with open(outfile + ".tmp", "wb") as out:
+				for job in jobs:
+					with open(paths[job['id']], "rb") as part:
+						shutil.copyfileobj(part, out, self.chunksize)
+			os.replace(outfile + ".tmp", outfile)
+			if failed:
+				for job in jobs:
+					if job['id'] in results:
+						for suffix in ("", ".ckpt"):
+							if os.path.exists(paths[job['id']] + suffix):
+								os.remove(paths[job['id']] + suffix)
+			else:
+				shutil.rmtree(outdir, ignore_errors=True)
+		return results
@@ -0,0 +1,10 @@
+import string
+
+HEXDIGITS = set(string.hexdigits)
+
+# Key a hash or hash:salt is indexed under. Hex hashes are lowercased so case differences between hashcat and escrow still match
+def hash_key(fields):
+	hashh = fields[0]
+	if hashh and all(c in HEXDIGITS for c in hashh):
+		fields = [hashh.lower()] + fields[1:]
+	return ":".join(fields)
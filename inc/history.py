@@ -0,0 +1,110 @@
+import os
+import time
+import sqlite3
+from inc import config
+
+# Columns of an upload kept in the store, in the order they are returned
+COLUMNS = ("id", "date", "algorithm", "status", "totalHashes", "validHashes", "btc", "xmr", "ltc")
+CURRENCIES = ("btc", "xmr", "ltc")
+
+# Values of an upload row from /api/uploads in store order
+def upload_row(row):
+	return (int(row['id']), str(row['date']), str(row['algorithm']), str(row['status']), int(row['totalHashes']), int(row['validHashes']), str(row['btc']), str(row['xmr']), str(row['ltc']))
+
+# Local store of submitted crack history
+# /api/uploads always returns every upload, so only new uploads and uploads whose status or earnings changed are written
+# and the per algorithm totals are kept up to date by adding the difference instead of being summed again
+class HistoryStore:
+	def __init__(self, client, path = config.HISTORY_DB_FILE, max_age = config.HISTORY_MAX_AGE):
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		self.client = client
+		self.max_age = max_age
+		self.db = sqlite3.connect(path)
+		self.db.execute("CREATE TABLE IF NOT EXISTS uploads (id INTEGER PRIMARY KEY, date TEXT NOT NULL, algorithm TEXT NOT NULL, status TEXT NOT NULL, totalHashes INTEGER NOT NULL, validHashes INTEGER NOT NULL, btc TEXT NOT NULL, xmr TEXT NOT NULL, ltc TEXT NOT NULL)")
+		self.db.execute("CREATE TABLE IF NOT EXISTS algorithms (algorithm TEXT PRIMARY KEY, uploads INTEGER NOT NULL, totalHashes INTEGER NOT NULL, validHashes INTEGER NOT NULL, btc REAL NOT NULL, xmr REAL NOT NULL, ltc REAL NOT NULL)")
+		self.db.execute("CREATE INDEX IF NOT EXISTS algorithms_btc ON algorithms (btc)")
+		self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+		self.db.commit()
+
+	def meta(self, key, default = None):
+		row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+		return row[0] if row is not None and row[0] is not None else default
+
+	def set_meta(self, values):
+		self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", list(values.items()))
+
+	def stale(self):
+		return time.time() - float(self.meta("fetched", 0)) >= self.max_age
+
+	# Makes the next sync fetch history again, used after an upload
+	def invalidate(self):
+		self.set_meta({"fetched": "0"})
+		self.db.commit()
+
+	# Adds sign times the values of an upload row to the totals of its algorithm
+	def adjust(self, row, sign):
+		self.db.execute("INSERT OR IGNORE INTO algorithms VALUES (?, 0, 0, 0, 0, 0, 0)", (row[2],))
+		self.db.execute("UPDATE algorithms SET uploads = uploads + ?, totalHashes = totalHashes + ?, validHashes = validHashes + ?, btc = btc + ?, xmr = xmr + ?, ltc = ltc + ? WHERE algorithm = ?",
+			(sign, sign * row[4], sign * row[5], sign * float(row[6]), sign * float(row[7]), sign * float(row[8]), row[2]))
+
+	# Brings the store up to date with /api/uploads unless it was fetched less than max_age seconds ago or force is set
+	# Returns (added, changed, removed) counts, or None when nothing was fetched
+	# Raises ValueError with the message from hashes.com when history could not be fetched
+	def sync(self, force = False):
+		if not force and not self.stale():
+			return None
+		headers = {}
+		if self.meta("etag"):
+			headers['If-None-Match'] = self.meta("etag")
+		if self.meta("modified"):
+			headers['If-Modified-Since'] = self.meta("modified")
+		resp = self.client.get("/en/api/uploads", params=self.client.keyed(), headers=headers)
+		if resp.status_code == 304:
+			self.set_meta({"fetched": str(time.time())})
+			self.db.commit()
+			return 0, 0, 0
+		get = self.client.decode(resp)
+		if get.get('success') != True:
+			raise ValueError(get.get('message', "Could not fetch history."))
+		latest = [upload_row(row) for row in get['list']]
+		stored = dict((row[0], row) for row in self.db.execute("SELECT * FROM uploads"))
+		added, changed = 0, 0
+		for row in latest:
+			old = stored.pop(row[0], None)
+			if old == row:
+				continue
+			if old is None:
+				added += 1
+			else:
+				changed += 1
+				self.adjust(old, -1)
+			self.adjust(row, 1)
+			self.db.execute("INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row)
+		for old in stored.values():
+			self.adjust(old, -1)
+		self.db.executemany("DELETE FROM uploads WHERE id = ?", [(uid,) for uid in stored])
+		self.db.execute("DELETE FROM algorithms WHERE uploads <= 0")
+		# History is shown in the order hashes.com lists it, which is remembered as the direction of the ids
+		descending = len(latest) > 1 and latest[0][0] > latest[-1][0]
+		self.set_meta({"fetched": str(time.time()), "etag": resp.headers.get("ETag"), "modified": resp.headers.get("Last-Modified"), "descending": "1" if descending else self.meta("descending", "0")})
+		self.db.commit()
+		return added, changed, len(stored)
+
+	# Returns up to limit upload rows in the order hashes.com lists them, or the opposite order with reverse
+	def rows(self, reverse = False, limit = None):
+		descending = self.meta("descending", "0") == "1"
+		order = "DESC" if descending != bool(reverse) else "ASC"
+		query = "SELECT * FROM uploads ORDER BY id %s" % (order)
+		if limit:
+			return self.db.execute(query + " LIMIT ?", (limit,)).fetchall()
+		return self.db.execute(query).fetchall()
+
+	# Returns list of per algorithm totals, highest BTC first, and a dict of totals over every algorithm
+	def stats(self):
+		algorithms = self.db.execute("SELECT algorithm, totalHashes, validHashes, btc, xmr, ltc FROM algorithms ORDER BY btc DESC").fetchall()
+		row = self.db.execute("SELECT COALESCE(SUM(totalHashes), 0), COALESCE(SUM(validHashes), 0), COALESCE(SUM(btc), 0), COALESCE(SUM(xmr), 0), COALESCE(SUM(ltc), 0) FROM algorithms").fetchone()
+		totals = dict(zip(("totalHashes", "validHashes") + CURRENCIES, row))
+		return algorithms, totals
+
+	def close(self):
+		self.db.close()
@@ -0,0 +1,98 @@
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from inc import config
+
+# What to do with a new message when the hook queue is full
+# block waits for room which slows down reading the websocket, drop throws the new message away and
+# coalesce folds the oldest waiting message into the new one so no jobs are lost
+POLICIES = ("block", "drop", "coalesce")
+
+# Runs websocket hook code away from the websocket receive loop
+# Messages go into a bounded queue that workers take from. process_message can be an async function, which
+# runs on the event loop, or a normal function, which runs in a thread or process pool
+# Message rate and hook lag are recorded in metrics when one is given
+class HookRunner:
+	def __init__(self, hookcode, workers = config.HOOK_WORKERS, queue_size = config.HOOK_QUEUE_SIZE, policy = "block", executor = "thread", metrics = None):
+		if policy not in POLICIES:
+			raise ValueError("policy must be one of " + ", ".join(POLICIES))
+		self.hookcode = hookcode
+		self.workers = max(1, workers)
+		self.queue_size = max(1, queue_size)
+		self.policy = policy
+		self.metrics = metrics
+		self.is_async = asyncio.iscoroutinefunction(hookcode.process_message)
+		self.executor = None
+		if not self.is_async:
+			self.executor = ProcessPoolExecutor(self.workers) if executor == "process" else ThreadPoolExecutor(self.workers)
+		self.queue = None
+		self.tasks = []
+		self.counters = {"received": 0, "processed": 0, "errors": 0, "dropped": 0, "coalesced": 0, "max depth": 0, "total latency": 0.0, "max latency": 0.0, "total wait": 0.0}
+
+	async def start(self):
+		self.queue = asyncio.Queue(self.queue_size)
+		self.tasks = [asyncio.create_task(self.worker()) for _ in range(self.workers)]
+
+	async def stop(self):
+		for task in self.tasks:
+			task.cancel()
+		await asyncio.gather(*self.tasks, return_exceptions=True)
+		self.tasks = []
+		if self.executor is not None:
+			self.executor.shutdown(wait=False, cancel_futures=True)
+
+	# Queues a message for the hook following the queue policy
+	async def submit(self, message):
+		self.counters['received'] += 1
+		if self.metrics is not None:
+			self.metrics.message()
+		item = (time.time(), message)
+		if self.policy == "block":
+			await self.queue.put(item)
+		elif self.queue.full() and self.policy == "drop":
+			self.counters['dropped'] += 1
+			return
+		else:
+			if self.queue.full():
+				queued, oldest = self.queue.get_nowait()
+				self.queue.task_done()
+				message = dict(message)
+				message['new'] = list(oldest.get('new', [])) + list(message.get('new', []))
+				item = (queued, message)
+				self.counters['coalesced'] += 1
+			self.queue.put_nowait(item)
+		self.counters['max depth'] = max(self.counters['max depth'], self.queue.qsize())
+
+	async def worker(self):
+		loop = asyncio.get_running_loop()
+		while True:
+			queued, message = await self.queue.get()
+			start = time.time()
+			self.counters['total wait'] += start - queued
+			try:
+				if self.is_async:
+					await self.hookcode.process_message(message)
+				else:
+					await loop.run_in_executor(self.executor, self.hookcode.process_message, message)
+				self.counters['processed'] += 1
+			except asyncio.CancelledError:
+				raise
+			except Exception as e:
+				self.counters['errors'] += 1
+				print("Hook failed: %s" % (e))
+			finally:
+				latency = time.time() - start
+				self.counters['total latency'] += latency
+				self.counters['max latency'] = max(self.counters['max latency'], latency)
+				if self.metrics is not None:
+					self.metrics.hook(time.time() - queued)
+				self.queue.task_done()
+
+	# Returns counters with averages worked out
+	def stats(self):
+		stats = dict(self.counters)
+		done = stats['processed'] + stats['errors']
+		stats['depth'] = self.queue.qsize() if self.queue is not None else 0
+		stats['avg latency'] = stats['total latency'] / done if done else 0.0
+		stats['avg wait'] = stats['total wait'] / done if done else 0.0
+		return stats
@@ -0,0 +1,153 @@
+import os
+import re
+from multiprocessing import Pool
+from inc.algorithms import validalgs
+
+# Hashes with a fixed prefix: (algorithm id, prefix, pattern the whole hash must match)
+PREFIXED = [
+	("3200", "$2a$", r"\$2[abxy]?\$\d{2}\$[./A-Za-z0-9]{53}"),
+	("3200", "$2b$", r"\$2[abxy]?\$\d{2}\$[./A-Za-z0-9]{53}"),
+	("3200", "$2x$", r"\$2[abxy]?\$\d{2}\$[./A-Za-z0-9]{53}"),
+	("3200", "$2y$", r"\$2[abxy]?\$\d{2}\$[./A-Za-z0-9]{53}"),
+	("500", "$1$", r"\$1\$[./A-Za-z0-9]{0,8}\$[./A-Za-z0-9]{22}"),
+	("7400", "$5$", r"\$5\$(rounds=\d+\$)?[./A-Za-z0-9]{0,16}\$[./A-Za-z0-9]{43}"),
+	("1800", "$6$", r"\$6\$(rounds=\d+\$)?[./A-Za-z0-9]{0,16}\$[./A-Za-z0-9]{86}"),
+	("400", "$P$", r"\$[PH]\$[./A-Za-z0-9]{31}"),
+	("400", "$H$", r"\$[PH]\$[./A-Za-z0-9]{31}"),
+	("7900", "$S$", r"\$S\$[./A-Za-z0-9]{52}"),
+	("9200", "$8$", r"\$8\$[./A-Za-z0-9]{14}\$[./A-Za-z0-9]{43}"),
+	("9300", "$9$", r"\$9\$[./A-Za-z0-9]{14}\$[./A-Za-z0-9]{43}"),
+	("2612", "$PHPS$", r"\$PHPS\$[0-9a-fA-F]{6}\$[0-9a-fA-F]{32}"),
+	("2100", "$DCC2$", r"\$DCC2\$\d+#[^#]+#[0-9a-fA-F]{32}"),
+	("13100", "$krb5tgs$23$", r"\$krb5tgs\$23\$.+"),
+	("11300", "$bitcoin$", r"\$bitcoin\$.+"),
+	("15700", "$ethereum$s", r"\$ethereum\$s\*.+"),
+	("13400", "$keepass$", r"\$keepass\$\*.+"),
+	("8900", "SCRYPT:", r"SCRYPT:\d+:\d+:\d+:[A-Za-z0-9+/=]+:[A-Za-z0-9+/=]+"),
+	("10000", "pbkdf2_sha256$", r"pbkdf2_sha256\$\d+\$[^$]+\$[A-Za-z0-9+/=]{44}"),
+	("10900", "sha256:", r"sha256:\d+:[A-Za-z0-9+/=]+:[A-Za-z0-9+/=]+"),
+	("12100", "sha512:", r"sha512:\d+:[A-Za-z0-9+/=]+:[A-Za-z0-9+/=]+"),
+	("1711", "{SSHA512}", r"\{SSHA512\}[A-Za-z0-9+/]+={0,2}"),
+	("111", "{SSHA}", r"\{SSHA\}[A-Za-z0-9+/]+={0,2}"),
+	("101", "{SHA}", r"\{SHA\}[A-Za-z0-9+/]{27}="),
+	("1731", "0x0200", r"0x0200[0-9A-Fa-f]{136}"),
+	("300", "*", r"\*[0-9A-Fa-f]{40}"),
+	("16500", "eyJ", r"eyJ[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+"),
+	("22000", "WPA*", r"WPA\*0[12]\*.+"),
+]
+
+# Hex hashes without a prefix: (algorithm id, hex length, salted, salt length or None for any)
+# Salted hashes are written as hash:salt
+HEX = [
+	("5100", 16, False, None),
+	("0", 32, False, None),
+	("900", 32, False, None),
+	("1000", 32, False, None),
+	("3000", 32, False, None),
+	("100", 40, False, None),
+	("1300", 56, False, None),
+	("1400", 64, False, None),
+	("17400", 64, False, None),
+	("10800", 96, False, None),
+	("17500", 96, False, None),
+	("1700", 128, False, None),
+	("6100", 128, False, None),
+	("10", 32, True, None),
+	("20", 32, True, None),
+	("3910", 32, True, None),
+	("21", 32, True, 2),
+	("2611", 32, True, 3),
+	("2811", 32, True, 8),
+	("2711", 32, True, 30),
+	("11", 32, True, 32),
+	("110", 40, True, None),
+	("120", 40, True, None),
+	("1410", 64, True, None),
+	("1420", 64, True, None),
+	("1710", 128, True, None),
+	("1720", 128, True, None),
+]
+
+# Other hashes matched by pattern alone
+PATTERNS = [
+	("5600", r"[^:]+::[^:]*:[0-9a-fA-F]{16}:[0-9a-fA-F]{32}:[0-9a-fA-F]+"),
+]
+
+HEXCHARS = re.compile(r"[0-9a-fA-F]+")
+
+# Signatures compiled and indexed for fast lookups
+# Prefixed signatures are indexed by first character with the longest prefixes first,
+# hex signatures are indexed by (hex length, salted)
+class Signatures:
+	def __init__(self, algorithms = validalgs):
+		self.prefixed = {}
+		for algid, prefix, pattern in sorted(PREFIXED, key=lambda sig: -len(sig[1])):
+			if algid in algorithms:
+				self.prefixed.setdefault(prefix[0], []).append((prefix, algid, re.compile(pattern)))
+		self.hex = {}
+		for algid, length, salted, saltlen in HEX:
+			if algid in algorithms:
+				self.hex.setdefault((length, salted), []).append((algid, saltlen))
+		self.patterns = [(algid, re.compile(pattern)) for algid, pattern in PATTERNS if algid in algorithms]
+
+	# Returns list of candidate algorithm ids for a hash, empty when nothing matched
+	def classify(self, line):
+		if not line:
+			return []
+		for prefix, algid, pattern in self.prefixed.get(line[0], ()):
+			if line.startswith(prefix) and pattern.fullmatch(line):
+				return [algid]
+		hashh, sep, salt = line.partition(":")
+		if HEXCHARS.fullmatch(hashh):
+			candidates = [algid for algid, saltlen in self.hex.get((len(hashh), bool(sep)), ()) if saltlen is None or saltlen == len(salt)]
+			if candidates:
+				return candidates
+		return [algid for algid, pattern in self.patterns if pattern.fullmatch(line)]
+
+signatures = None
+
+# Classifies a chunk of lines in a worker process, returns list of (line, candidates)
+def classify_chunk(lines):
+	global signatures
+	if signatures is None:
+		signatures = Signatures()
+	return [(line, signatures.classify(line)) for line in lines]
+
+# Reads a file in chunks of lines
+def read_chunks(path, size):
+	chunk = []
+	with open(path, "r", errors="replace") as infile:
+		for line in infile:
+			line = line.strip()
+			if not line:
+				continue
+			chunk.append(line)
+			if len(chunk) >= size:
+				yield chunk
+				chunk = []
+	if chunk:
+		yield chunk
+
+# Classifies every hash in path across processes and writes each hash to <outdir>/<algid>.txt for every candidate
+# Hashes that matched nothing are written to <outdir>/unknown.txt
+# Returns (dict of algorithm id to hash count, list of unknown hashes kept for a remote lookup up to keep)
+def identify_file(path, outdir, processes = None, chunksize = 20000, keep = 0):
+	os.makedirs(outdir, exist_ok=True)
+	counts = {}
+	unknown = []
+	outfiles = {}
+	try:
+		with Pool(processes) as pool:
+			for results in pool.imap(classify_chunk, read_chunks(path, chunksize)):
+				for line, candidates in results:
+					for algid in candidates or ["unknown"]:
+						if algid not in outfiles:
+							outfiles[algid] = open(os.path.join(outdir, "%s.txt" % (algid)), "w")
+						outfiles[algid].write(line + "\n")
+						counts[algid] = counts.get(algid, 0) + 1
+					if not candidates and len(unknown) < keep:
+						unknown.append(line)
+	finally:
+		for outfile in outfiles.values():
+			outfile.close()
+	return counts, unknown
@@ -0,0 +1,103 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from inc import config
+from inc.jobtable import JobTable
+
+# Paths of the job list endpoints keyed by snapshot name
+ENDPOINTS = {"jobs": "/en/api/jobs", "jobs_self": "/en/api/jobs_self"}
+
+# Snapshot file of the API key and server of client, so switching either never serves another account's jobs
+def cache_path(path, client):
+	digest = hashlib.sha256(("%s\n%s" % (client.apikey or "", client.base)).encode()).hexdigest()[0:16]
+	root, ext = os.path.splitext(path)
+	return "%s-%s%s" % (root, digest, ext)
+
+# Local store of job list snapshots
+# Snapshots younger than max_age are returned without a request. Older ones are revalidated with
+# If-None-Match/If-Modified-Since when the server sent validators, otherwise the full list is fetched again.
+# The file is only written when a list or its validators change, not on every revalidation
+class JobCache:
+	def __init__(self, client, max_age = config.JOB_MAX_AGE, path = config.JOB_CACHE_FILE):
+		self.client = client
+		self.max_age = max_age
+		self.path = cache_path(path, client) if path is not None else None
+		self.snapshots = {}
+		self.tables = {}
+		self.lock = threading.Lock()
+		self.load()
+
+	# Loads saved snapshots from disk
+	def load(self):
+		if self.path is None or not os.path.exists(self.path):
+			return
+		try:
+			with open(self.path, "r") as cachefile:
+				self.snapshots = json.load(cachefile)
+		except (OSError, ValueError):
+			self.snapshots = {}
+
+	# Writes snapshots to disk. Written to a temp file first so a crash never leaves a half written cache
+	def save(self):
+		if self.path is None:
+			return
+		try:
+			os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+			temp = self.path + ".tmp"
+			with open(temp, "w") as cachefile:
+				json.dump(self.snapshots, cachefile)
+			os.replace(temp, self.path)
+		except OSError as e:
+			print(e)
+
+	# Returns the job list response for jobs or jobs_self
+	# force skips the max age check and always asks the server
+	def get(self, name = "jobs", force = False):
+		with self.lock:
+			snapshot = self.snapshots.get(name)
+			if snapshot is not None and not force and time.time() - snapshot['fetched'] < self.max_age:
+				return snapshot['response']
+			headers = {}
+			if snapshot is not None:
+				if snapshot.get('etag'):
+					headers['If-None-Match'] = snapshot['etag']
+				if snapshot.get('modified'):
+					headers['If-Modified-Since'] = snapshot['modified']
+			params = self.client.keyed() if name == "jobs" else None
+			resp = self.client.get(ENDPOINTS[name], params=params, headers=headers)
+			if resp.status_code == 304 and snapshot is not None:
+				snapshot['fetched'] = time.time()
+				validators = {"etag": resp.headers.get("ETag") or snapshot.get('etag'), "modified": resp.headers.get("Last-Modified") or snapshot.get('modified')}
+				if validators['etag'] != snapshot.get('etag') or validators['modified'] != snapshot.get('modified'):
+					snapshot.update(validators)
+					self.save()
+				return snapshot['response']
+			response = self.client.decode(resp)
+			if response.get("success") == True:
+				etag, modified = resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+				if snapshot is not None and snapshot.get('etag') == etag and snapshot.get('modified') == modified and snapshot['response'] == response:
+					# The same list again, keeping the old response also keeps its JobTable
+					snapshot['fetched'] = time.time()
+					return snapshot['response']
+				self.snapshots[name] = {"response": response, "fetched": time.time(), "etag": etag, "modified": modified}
+				self.save()
+			return response
+
+	# Returns the job list as a JobTable, the table is only built again when the snapshot changes
+	def table(self, name = "jobs", force = False):
+		response = self.get(name, force)
+		if response.get("success") != True:
+			return None
+		cached = self.tables.get(name)
+		if cached is None or cached[0] is not response:
+			cached = (response, JobTable.from_response(response))
+			self.tables[name] = cached
+		return cached[1]
+
+	# Drops all snapshots so the next call fetches the full list
+	def invalidate(self):
+		with self.lock:
+			self.snapshots = {}
+			self.save()
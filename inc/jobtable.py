@@ -0,0 +1,90 @@
+from array import array
+
+# Columns parsed from the job list, with the type code of numeric columns
+NUMERIC = {"id": "q", "algorithmId": "q", "totalHashes": "q", "foundHashes": "q", "leftHashes": "q", "maxCracksNeeded": "q", "pricePerHash": "d", "pricePerHashUsd": "d"}
+TEXT = ("createdAt", "lastUpdate", "currency", "algorithmName")
+
+# Column oriented table of escrow jobs
+# The API response is parsed once into typed columns with indexes by job id, algorithm id and currency.
+# Filtering, sorting and slicing work on row positions and return new tables that share the parsed columns
+class JobTable:
+	__slots__ = ("rows", "columns", "positions", "by_id", "by_alg", "by_currency")
+
+	def __init__(self, rows, columns = None, positions = None, by_id = None, by_alg = None, by_currency = None):
+		self.rows = rows
+		if columns is None:
+			columns = {}
+			for name, code in NUMERIC.items():
+				columns[name] = array(code, (float(row[name]) if code == "d" else int(row[name]) for row in rows))
+			for name in TEXT:
+				columns[name] = [row[name] for row in rows]
+			by_id, by_alg, by_currency = {}, {}, {}
+			for i, row in enumerate(rows):
+				by_id[str(row['id'])] = i
+				by_alg.setdefault(str(row['algorithmId']), []).append(i)
+				by_currency.setdefault(str(row['currency']).upper(), []).append(i)
+		self.columns = columns
+		self.positions = list(range(len(rows))) if positions is None else positions
+		self.by_id = by_id
+		self.by_alg = by_alg
+		self.by_currency = by_currency
+
+	# Builds a table from a job list API response
+	@classmethod
+	def from_response(cls, response):
+		return cls(response['list'])
+
+	# New table over the same columns holding only positions
+	def take(self, positions):
+		return JobTable(self.rows, self.columns, positions, self.by_id, self.by_alg, self.by_currency)
+
+	def __len__(self):
+		return len(self.positions)
+
+	# Iterating gives the job dicts as returned by the API
+	def __iter__(self):
+		for i in self.positions:
+			yield self.rows[i]
+
+	def __getitem__(self, key):
+		if isinstance(key, slice):
+			return self.take(self.positions[key])
+		return self.rows[self.positions[key]]
+
+	# Values of a column for the rows in the table
+	def column(self, name):
+		col = self.columns[name]
+		return [col[i] for i in self.positions]
+
+	# Returns rows matching every filter given. Each filter is a collection of ids or currencies
+	def filter(self, algids = None, currencies = None, jobids = None):
+		keep = None
+		if algids is not None:
+			keep = set(i for aid in algids for i in self.by_alg.get(str(aid), ()))
+		if currencies is not None:
+			matched = set(i for cur in currencies for i in self.by_currency.get(str(cur).upper(), ()))
+			keep = matched if keep is None else keep & matched
+		if jobids is not None:
+			matched = set(self.by_id[str(jid)] for jid in jobids if str(jid) in self.by_id)
+			keep = matched if keep is None else keep & matched
+		if keep is None:
+			return self
+		return self.take([i for i in self.positions if i in keep])
+
+	# Job ids from jobids that are not in the table
+	def missing(self, jobids):
+		present = set(str(self.columns['id'][i]) for i in self.positions)
+		return [str(jid) for jid in jobids if str(jid) not in present]
+
+	# Returns the table sorted by a column
+	def sort(self, name, reverse = False):
+		col = self.columns[name]
+		return self.take(sorted(self.positions, key=col.__getitem__, reverse=reverse))
+
+	# Splits the table by the values of a column, returns dict of value to table
+	def group(self, name):
+		col = self.columns[name]
+		groups = {}
+		for i in self.positions:
+			groups.setdefault(col[i], []).append(i)
+		return dict((key, self.take(positions)) for key, positions in groups.items())
@@ -0,0 +1,212 @@
+import os
+import mmap
+import heapq
+import shutil
+import struct
+import tempfile
+from inc import config
+
+# Header of a binary left list: magic, version, digest width in bytes, number of digests,
+# Bloom filter size in bits, number of Bloom filter probes and a reserved field
+MAGIC = b"HLB1"
+VERSION = 1
+HEADER = struct.Struct("<4sHHQQII")
+# Rough memory used by every digest held in a list while building, used to size sorted runs
+ENTRY_OVERHEAD = 41
+
+# Bloom filter bit positions of a digest. Digests are already uniformly distributed so each probe is 4 bytes of the digest
+def probes(digest, bits, count):
+	return [int.from_bytes(digest[i * 4:i * 4 + 4], "little") % bits for i in range(count)]
+
+# Parses a hex left list line, returns None for blank lines
+def parse_digest(line, width = None):
+	line = line.strip()
+	if not line:
+		return None
+	try:
+		digest = bytes.fromhex(line)
+	except ValueError:
+		raise ValueError("'%s' is not a hex digest, only unsalted hashes can be stored in binary left lists" % (line))
+	if width is not None and len(digest) != width:
+		raise ValueError("'%s' is not %s bytes like the other hashes" % (line, width))
+	return digest
+
+# Writes sorted unique digests as a run file
+def spill(digests, directory, number):
+	path = os.path.join(directory, "run%s.bin" % (number))
+	with open(path, "wb") as run:
+		run.write(b"".join(sorted(set(digests))))
+	return path
+
+def read_run(path, width):
+	with open(path, "rb") as run:
+		while True:
+			block = run.read(width * 4096)
+			if not block:
+				return
+			for i in range(0, len(block), width):
+				yield block[i:i + width]
+
+# Builds a binary left list from text left lists
+# Digests are sorted in runs of at most budget megabytes which are combined with an external merge, so any number of
+# hashes can be converted. bloom is the number of Bloom filter bits per hash, 0 leaves the filter out
+# Returns (lines read, unique digests written)
+# Raises ValueError when a line is not a hex digest of the same width as the first one
+def build(sources, outfile, bloom = config.LEFTBIN_BLOOM_BITS, budget = config.MERGE_MEMORY_BUDGET):
+	width = None
+	digests = []
+	runs = []
+	total = 0
+	limit = None
+	tempdir = tempfile.mkdtemp(prefix=".leftbin-", dir=os.path.dirname(os.path.abspath(outfile)))
+	try:
+		for path in sources:
+			with open(path, "r", errors="replace") as infile:
+				for line in infile:
+					digest = parse_digest(line, width)
+					if digest is None:
+						continue
+					if width is None:
+						width = len(digest)
+						limit = max(1, budget * (1 << 20) // (width + ENTRY_OVERHEAD))
+					total += 1
+					digests.append(digest)
+					if len(digests) >= limit:
+						runs.append(spill(digests, tempdir, len(runs)))
+						digests = []
+		if width is None:
+			raise ValueError("No hashes to store")
+		if runs and digests:
+			runs.append(spill(digests, tempdir, len(runs)))
+			digests = []
+		merged = heapq.merge(*[read_run(run, width) for run in runs]) if runs else iter(sorted(set(digests)))
+		count = min(4, width // 4) if bloom else 0
+		bits = max(64, (total * bloom + 7) // 8 * 8) if count else 0
+		bloomfilter = bytearray(bits // 8)
+		unique = 0
+		with open(outfile + ".tmp", "wb") as out:
+			out.write(HEADER.pack(MAGIC, VERSION, width, 0, bits, count, 0))
+			out.write(bloomfilter)
+			previous = None
+			block = []
+			for digest in merged:
+				if digest == previous:
+					continue
+				previous = digest
+				unique += 1
+				for bit in probes(digest, bits, count):
+					bloomfilter[bit >> 3] |= 1 << (bit & 7)
+				block.append(digest)
+				if len(block) >= 4096:
+					out.write(b"".join(block))
+					block = []
+			out.write(b"".join(block))
+			out.seek(0)
+			out.write(HEADER.pack(MAGIC, VERSION, width, unique, bits, count, 0))
+			out.write(bloomfilter)
+		os.replace(outfile + ".tmp", outfile)
+	finally:
+		shutil.rmtree(tempdir, ignore_errors=True)
+		if os.path.exists(outfile + ".tmp"):
+			os.remove(outfile + ".tmp")
+	return total, unique
+
+# Sorted fixed width digests of a binary left list opened with mmap
+# Only pages that are touched are read in, so membership tests and differences need next to no resident memory.
+# Membership checks the Bloom filter first and then binary searches the digests
+class BinaryLeftList:
+	def __init__(self, path):
+		self.path = path
+		self.map = None
+		self.file = open(path, "rb")
+		try:
+			self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+			if len(self.map) < HEADER.size:
+				raise ValueError
+			magic, version, self.width, self.count, self.bits, self.probes, reserved = HEADER.unpack(self.map[0:HEADER.size])
+			if magic != MAGIC or version != VERSION or len(self.map) != HEADER.size + self.bits // 8 + self.count * self.width:
+				raise ValueError
+		except ValueError:
+			self.close()
+			raise ValueError("%s is not a binary left list" % (path))
+		self.bloom = HEADER.size
+		self.offset = HEADER.size + self.bits // 8
+
+	def close(self):
+		if self.map is not None:
+			self.map.close()
+			self.map = None
+		self.file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		self.close()
+
+	def __len__(self):
+		return self.count
+
+	def digest(self, i):
+		start = self.offset + i * self.width
+		return self.map[start:start + self.width]
+
+	# False when the Bloom filter rules the digest out, True when it might be stored
+	def might_contain(self, digest):
+		for bit in probes(digest, self.bits, self.probes):
+			if not self.map[self.bloom + (bit >> 3)] & (1 << (bit & 7)):
+				return False
+		return True
+
+	# Accepts a digest as bytes or hex
+	def __contains__(self, digest):
+		if isinstance(digest, str):
+			try:
+				digest = bytes.fromhex(digest)
+			except ValueError:
+				return False
+		if len(digest) != self.width or not self.might_contain(digest):
+			return False
+		low, high = 0, self.count
+		while low < high:
+			mid = (low + high) // 2
+			current = self.digest(mid)
+			if current < digest:
+				low = mid + 1
+			elif current > digest:
+				high = mid
+			else:
+				return True
+		return False
+
+	# Yields every digest in sorted order
+	def __iter__(self):
+		step = self.width * 4096
+		end = self.offset + self.count * self.width
+		for start in range(self.offset, end, step):
+			block = self.map[start:min(start + step, end)]
+			for i in range(0, len(block), self.width):
+				yield block[i:i + self.width]
+
+	# Yields digests stored here that are not in other, walking both sorted lists once
+	def difference(self, other):
+		if other.width != self.width:
+			yield from self
+			return
+		theirs = iter(other)
+		current = next(theirs, None)
+		for digest in self:
+			while current is not None and current < digest:
+				current = next(theirs, None)
+			if current != digest:
+				yield digest
+
+# Writes digests as lowercase hex lines in the text format download writes, returns number of lines
+def write_text(digests, outfile):
+	count = 0
+	with open(outfile + ".tmp", "w") as out:
+		for digest in digests:
+			out.write(digest.hex() + "\n")
+			count += 1
+	os.replace(outfile + ".tmp", outfile)
+	return count
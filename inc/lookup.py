@@ -0,0 +1,105 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from inc import config
+
+# Most hashes hashes.com accepts in a single search request
+BATCH_SIZE = 250
+
+# Reads unique hashes from a file line by line, keeping the order they first appear in
+def read_hashes(path):
+	seen = set()
+	hashes = []
+	with open(path, "r", errors="replace") as infile:
+		for line in infile:
+			line = line.strip()
+			if line and line not in seen:
+				seen.add(line)
+				hashes.append(line)
+	return hashes
+
+# Splits hashes into batches the search endpoint accepts
+def batches(hashes, size = BATCH_SIZE):
+	for i in range(0, len(hashes), size):
+		yield hashes[i:i + size]
+
+# Potential credit cost of looking up count hashes, every request costs one credit on top of one per hash
+def potential_cost(count, size = BATCH_SIZE):
+	return count + (count + size - 1) // size
+
+# Formats a search result the same way as the lookup command always has
+def format_found(found, verbose = False):
+	if len(found['salt']) == 0:
+		line = "%s:%s" % (found['hash'], found['plaintext'])
+	else:
+		line = "%s:%s:%s" % (found['hash'], found['salt'], found['plaintext'])
+	if verbose == True:
+		line += ":" + found['algorithm']
+	return line
+
+# Looks up any number of hashes by splitting them into batches and searching several batches at once
+class LookupEngine:
+	def __init__(self, client, workers = config.LOOKUP_WORKERS, size = BATCH_SIZE):
+		self.client = client
+		self.workers = max(1, workers)
+		self.size = size
+
+	def search(self, batch):
+		return self.client.post_json("/en/api/search", data=self.client.keyed({"hashes[]": batch}))
+
+	# Looks up hashes and calls on_found with every result as batches finish
+	# No new batch is sent once its potential cost would take spending over budget credits
+	# Results of every batch are recorded in cache when one is given
+	# Returns dict with totals of the run
+	def run(self, hashes, on_found, budget = None, cache = None):
+		summary = {"hashes": 0, "found": 0, "cost": 0, "batches": 0, "skipped": 0, "error": None}
+		pending = batches(hashes, self.size)
+		reserved = 0
+		running = {}
+		held = None
+		stop = False
+		with ThreadPoolExecutor(max_workers=self.workers) as pool:
+			while True:
+				while not stop and len(running) < self.workers:
+					batch = held if held is not None else next(pending, None)
+					held = None
+					if batch is None:
+						break
+					cost = potential_cost(len(batch), self.size)
+					if budget is not None and summary['cost'] + reserved + cost > budget:
+						# Wait for running batches to report their actual cost before giving up on the budget
+						if running:
+							held = batch
+						else:
+							summary['skipped'] += len(batch)
+							stop = True
+						break
+					reserved += cost
+					running[pool.submit(self.search, batch)] = (batch, cost)
+				if not running:
+					break
+				done, _ = wait(running, return_when=FIRST_COMPLETED)
+				for future in done:
+					batch, cost = running.pop(future)
+					reserved -= cost
+					try:
+						post = future.result()
+					except Exception as e:
+						post = {"success": False, "message": str(e)}
+					if post['success'] == True:
+						summary['batches'] += 1
+						summary['hashes'] += len(batch)
+						summary['cost'] += int(post['cost'])
+						summary['found'] += len(post['founds'])
+						if cache is not None:
+							cache.record(batch, post['founds'])
+						for found in post['founds']:
+							on_found(found)
+					else:
+						# A failed batch usually means the balance ran out, so nothing else is sent
+						summary['error'] = post['message']
+						summary['skipped'] += len(batch)
+						stop = True
+		if held is not None:
+			summary['skipped'] += len(held)
+		for batch in pending:
+			summary['skipped'] += len(batch)
+		return summary
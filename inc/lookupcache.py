@@ -0,0 +1,70 @@
+import os
+import time
+import sqlite3
+from inc import config
+from inc.hashkey import hash_key
+
+# Returns the founds that answer a searched line
+# Hex hashes are compared without case, and a salt only has to agree when both the line and the result have one
+def line_founds(line, byhash):
+	fields = line.split(":", 1)
+	founds = []
+	for found in byhash.get(hash_key(fields[0:1]), ()):
+		if len(fields) == 1 or len(found['salt']) == 0 or fields[1] == found['salt']:
+			founds.append(found)
+	return founds
+
+# Local store of hash lookup results so hashes that were already resolved are never paid for again
+# Founds are kept forever, hashes that were not found are kept for negative_ttl seconds
+class LookupCache:
+	def __init__(self, path = config.LOOKUP_CACHE_FILE, negative_ttl = config.LOOKUP_NEGATIVE_TTL):
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		self.negative_ttl = negative_ttl
+		self.db = sqlite3.connect(path)
+		self.db.execute("CREATE TABLE IF NOT EXISTS founds (key TEXT NOT NULL, hash TEXT NOT NULL, salt TEXT NOT NULL, plaintext TEXT NOT NULL, algorithm TEXT NOT NULL, added REAL NOT NULL, PRIMARY KEY (key, algorithm, plaintext))")
+		self.db.execute("CREATE TABLE IF NOT EXISTS misses (key TEXT PRIMARY KEY, checked REAL NOT NULL)")
+		self.db.commit()
+
+	# Splits hashes into results already known and hashes that still need to be looked up
+	# Returns (list of found dicts, list of hashes to look up, number of hashes known not to be found)
+	def split(self, hashes):
+		founds = []
+		misses = []
+		negatives = 0
+		cutoff = time.time() - self.negative_ttl
+		for hashh in hashes:
+			rows = self.db.execute("SELECT hash, salt, plaintext, algorithm FROM founds WHERE key = ?", (hashh,)).fetchall()
+			if rows:
+				for row in rows:
+					founds.append({"hash": row[0], "salt": row[1], "plaintext": row[2], "algorithm": row[3]})
+				continue
+			row = self.db.execute("SELECT checked FROM misses WHERE key = ?", (hashh,)).fetchone()
+			if row is not None and row[0] >= cutoff:
+				negatives += 1
+				continue
+			misses.append(hashh)
+		return founds, misses, negatives
+
+	# Records the results of a searched batch under the lines that were searched
+	# Lines of the batch without a result are stored as misses
+	def record(self, batch, founds):
+		now = time.time()
+		byhash = {}
+		for found in founds:
+			byhash.setdefault(hash_key([found['hash']]), []).append(found)
+		keys = set()
+		misses = []
+		for line in batch:
+			matched = line_founds(line, byhash)
+			if not matched:
+				misses.append(line)
+				continue
+			keys.add(line)
+			for found in matched:
+				self.db.execute("INSERT OR REPLACE INTO founds VALUES (?, ?, ?, ?, ?, ?)", (line, found['hash'], found['salt'], found['plaintext'], found['algorithm'], now))
+		self.db.executemany("DELETE FROM misses WHERE key = ?", [(key,) for key in keys])
+		self.db.executemany("INSERT OR REPLACE INTO misses VALUES (?, ?)", [(line, now) for line in misses])
+		self.db.commit()
+
+	def close(self):
+		self.db.close()
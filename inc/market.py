@@ -0,0 +1,224 @@
+import os
+import zlib
+import time
+import struct
+from array import array
+from inc import config
+
+# Columns of a market sample with their array type codes
+COLUMNS = (("time", "d"), ("jobid", "q"), ("algid", "q"), ("price", "d"), ("priceusd", "d"), ("left", "q"), ("found", "q"), ("source", "b"))
+# Where a sample came from
+POLL, NEW = 0, 1
+
+# Every chunk starts with magic, row count, first and last sample time and the compressed size of every column
+MAGIC = b"HCM1"
+HEADER = struct.Struct("<4sIdd" + "I" * len(COLUMNS))
+# Seen chunks hold the ids of jobs a poll found unchanged: magic, job count, poll time and compressed size of the ids
+SEEN_MAGIC = b"HCS1"
+SEEN_HEADER = struct.Struct("<4sIdI")
+HEADERS = {MAGIC: HEADER, SEEN_MAGIC: SEEN_HEADER}
+
+# Reads the next chunk header. Returns (header fields, size of the chunk with its header) or None at the end of the chunks
+def read_header(infile):
+	magic = infile.read(4)
+	header = HEADERS.get(magic)
+	if header is None:
+		return None
+	rest = infile.read(header.size - 4)
+	if len(rest) < header.size - 4:
+		return None
+	fields = header.unpack(magic + rest)
+	return fields, header.size + sum(fields[4:] if magic == MAGIC else fields[3:])
+
+# Append only store of job samples
+# Samples are written in chunks, each column of a chunk is packed into an array and compressed with zlib on its own.
+# Chunk headers carry the time range so queries skip chunks outside it without decompressing them.
+# Jobs a poll finds unchanged are only written as their id in a seen chunk, load turns them back into samples.
+# A chunk cut short by a crash stops reading and is cut off before the next chunk is appended
+class MarketStore:
+	def __init__(self, path = config.MARKET_FILE):
+		self.path = path
+		# Last recorded (price, left, found) of every job, jobs that did not change are only written to seen chunks
+		self.last = None
+
+	# Returns the offset just past the last complete chunk
+	def complete(self):
+		end = 0
+		with open(self.path, "rb") as infile:
+			size = os.fstat(infile.fileno()).st_size
+			while True:
+				header = read_header(infile)
+				if header is None or end + header[1] > size:
+					return end
+				end += header[1]
+				infile.seek(end)
+
+	# Appends one chunk of rows, rows is a list of tuples in COLUMNS order
+	# seen is a list of ids of jobs observed unchanged at when, written as a seen chunk after the rows
+	def append(self, rows, seen = (), when = None):
+		if not rows and not seen:
+			return 0
+		data = b""
+		if rows:
+			rows.sort(key=lambda row: (row[1], row[0]))
+			blobs = [zlib.compress(array(code, [row[i] for row in rows]).tobytes()) for i, (name, code) in enumerate(COLUMNS)]
+			times = [row[0] for row in rows]
+			data += HEADER.pack(MAGIC, len(rows), min(times), max(times), *[len(blob) for blob in blobs]) + b"".join(blobs)
+		if seen:
+			blob = zlib.compress(array("q", sorted(seen)).tobytes())
+			data += SEEN_HEADER.pack(SEEN_MAGIC, len(seen), when, len(blob)) + blob
+		os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+		with open(self.path, "ab") as outfile:
+			# Drop what is left of a chunk that was being written when the recorder stopped
+			end = self.complete()
+			if end != outfile.tell():
+				outfile.truncate(end)
+			outfile.write(data)
+		return len(rows)
+
+	# Yields dict of column name to array for every chunk overlapping since to until
+	# Seen chunks are yielded as a dict of "when" to the poll time and "seen" to an array of job ids
+	def chunks(self, since = None, until = None):
+		if not os.path.exists(self.path):
+			return
+		with open(self.path, "rb") as infile:
+			while True:
+				header = read_header(infile)
+				if header is None:
+					return
+				fields = header[0]
+				if fields[0] == SEEN_MAGIC:
+					count, when, size = fields[1:]
+					if (since is not None and when < since) or (until is not None and when > until):
+						infile.seek(size, os.SEEK_CUR)
+						continue
+					blob = infile.read(size)
+					seen = array("q")
+					try:
+						seen.frombytes(zlib.decompress(blob))
+					except (zlib.error, ValueError):
+						return
+					if len(seen) != count:
+						return
+					yield {"when": when, "seen": seen}
+					continue
+				count, first, last, sizes = fields[1], fields[2], fields[3], fields[4:]
+				if (since is not None and last < since) or (until is not None and first > until):
+					infile.seek(sum(sizes), os.SEEK_CUR)
+					continue
+				chunk = {}
+				for (name, code), size in zip(COLUMNS, sizes):
+					blob = infile.read(size)
+					if len(blob) < size:
+						return
+					col = array(code)
+					try:
+						col.frombytes(zlib.decompress(blob))
+					except (zlib.error, ValueError):
+						return
+					chunk[name] = col
+				if any(len(col) != count for col in chunk.values()):
+					return
+				yield chunk
+
+	# Returns dict of column name to list of every sample matching the filters, in time order
+	# Jobs in seen chunks get a sample with the state they were last recorded with, so queries run up to the last poll.
+	# Chunks before since are still read for that state
+	def load(self, algids = None, jobids = None, since = None, until = None):
+		algids = set(int(aid) for aid in algids) if algids is not None else None
+		jobids = set(int(jid) for jid in jobids) if jobids is not None else None
+		data = dict((name, []) for name, code in COLUMNS)
+		# Job id to (algid, price, priceusd, left, found) as last recorded
+		state = {}
+		for chunk in self.chunks(None, until):
+			if "seen" in chunk:
+				when = chunk['when']
+				if since is not None and when < since:
+					continue
+				for jobid in chunk['seen']:
+					last = state.get(jobid)
+					if last is None or (algids is not None and last[0] not in algids) or (jobids is not None and jobid not in jobids):
+						continue
+					for (name, code), value in zip(COLUMNS, (when, jobid) + last + (POLL,)):
+						data[name].append(value)
+				continue
+			for jobid, algid, price, priceusd, left, found in zip(chunk['jobid'], chunk['algid'], chunk['price'], chunk['priceusd'], chunk['left'], chunk['found']):
+				state[jobid] = (algid, price, priceusd, left, found)
+			keep = range(len(chunk['time']))
+			if algids is not None:
+				keep = [i for i in keep if chunk['algid'][i] in algids]
+			if jobids is not None:
+				keep = [i for i in keep if chunk['jobid'][i] in jobids]
+			if since is not None or until is not None:
+				times = chunk['time']
+				keep = [i for i in keep if (since is None or times[i] >= since) and (until is None or times[i] <= until)]
+			for name, code in COLUMNS:
+				col = chunk[name]
+				data[name].extend(col[i] for i in keep)
+		order = sorted(range(len(data['time'])), key=data['time'].__getitem__)
+		return dict((name, [values[i] for i in order]) for name, values in data.items())
+
+	# Records jobs whose price, left or found hashes changed since they were last recorded
+	# jobs is an iterable of job dicts as returned by the API. Returns number of samples written
+	def record(self, jobs, source = POLL, when = None):
+		if self.last is None:
+			self.last = {}
+			for chunk in self.chunks():
+				if "seen" in chunk:
+					continue
+				for jobid, price, left, found in zip(chunk['jobid'], chunk['price'], chunk['left'], chunk['found']):
+					self.last[jobid] = (price, left, found)
+		when = time.time() if when is None else when
+		rows = []
+		seen = []
+		for job in jobs:
+			jobid = int(job['id'])
+			state = (float(job['pricePerHash']), int(job['leftHashes']), int(job['foundHashes']))
+			if self.last.get(jobid) == state:
+				seen.append(jobid)
+				continue
+			self.last[jobid] = state
+			rows.append((when, jobid, int(job['algorithmId']), state[0], float(job['pricePerHashUsd']), state[1], state[2], source))
+		return self.append(rows, seen, when)
+
+## Queries, all take the dict returned by MarketStore.load
+
+# USD price per hash of every algorithm in buckets of bucket seconds
+# Returns list of (algid, bucket start, samples, min, avg, max) sorted by algorithm then time
+def price_trends(data, bucket = 3600):
+	buckets = {}
+	for when, algid, price in zip(data['time'], data['algid'], data['priceusd']):
+		key = (algid, when - when % bucket)
+		row = buckets.get(key)
+		if row is None:
+			buckets[key] = [1, price, price, price]
+		else:
+			row[0] += 1
+			row[1] = min(row[1], price)
+			row[2] += price
+			row[3] = max(row[3], price)
+	return [(algid, start, row[0], row[1], row[2] / row[0], row[3]) for (algid, start), row in sorted(buckets.items())]
+
+# Hashes cracked an hour of every job between its first and last sample, with an estimate of when it finishes
+# Returns list of dicts sorted fastest first. eta is seconds from the last sample, None when nothing was cracked
+def crack_velocity(data):
+	jobs = {}
+	for when, jobid, algid, left, found in zip(data['time'], data['jobid'], data['algid'], data['left'], data['found']):
+		job = jobs.get(jobid)
+		if job is None:
+			jobs[jobid] = {"id": jobid, "algorithmId": algid, "first": when, "last": when, "startFound": found, "found": found, "left": left}
+		else:
+			job['last'] = when
+			job['found'] = found
+			job['left'] = left
+	rows = []
+	for job in jobs.values():
+		elapsed = job['last'] - job['first']
+		cracked = job['found'] - job['startFound']
+		velocity = cracked / elapsed * 3600 if elapsed > 0 else 0.0
+		job['cracked'] = cracked
+		job['velocity'] = velocity
+		job['eta'] = job['left'] / velocity * 3600 if velocity > 0 else None
+		rows.append(job)
+	rows.sort(key=lambda job: job['velocity'], reverse=True)
+	return rows
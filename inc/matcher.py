@@ -0,0 +1,154 @@
+import os
+import json
+from inc import config
+from inc.hashkey import hash_key
+from inc.leftbin import BinaryLeftList, build
+
+# Joins cracked potfile lines against local left lists
+# Left list lines are indexed by how many fields they have, 1 for plain hashes and 2 or more for hash:salt formats,
+# so every potfile line is matched with one dict lookup per format instead of scanning left lists.
+# Unsalted algorithms can be matched against binary left lists instead, which keeps them out of memory
+class PotfileMatcher:
+	def __init__(self, log = None):
+		self.log = log
+		# Number of fields to dict of key to algorithm id, or a tuple of ids when algorithms share a hash
+		self.index = {}
+		# List of (algorithm id, BinaryLeftList)
+		self.stores = []
+		self.jobs = 0
+
+	def close(self):
+		for algid, store in self.stores:
+			store.close()
+		self.stores = []
+
+	# Matches plain hashes of algid against a binary left list
+	def add_store(self, algid, store):
+		self.stores.append((str(algid), store))
+
+	# Indexes a left list file of algorithm algid
+	def add(self, algid, path):
+		algid = str(algid)
+		with open(path, "r", errors="replace") as infile:
+			for line in infile:
+				line = line.rstrip("\r\n")
+				if not line:
+					continue
+				fields = line.split(":")
+				keys = self.index.setdefault(len(fields), {})
+				key = hash_key(fields)
+				have = keys.get(key)
+				if have is None:
+					keys[key] = algid
+				elif have != algid and not (isinstance(have, tuple) and algid in have):
+					keys[key] = (have if isinstance(have, tuple) else (have,)) + (algid,)
+		self.jobs += 1
+
+	# Indexes every left list in a directory. The algorithm of each file comes from the manifest sync writes,
+	# files without one use algid when a single algorithm is given. Returns list of files that were skipped
+	# With binary the left lists of every unsalted algorithm are converted to <path>/<algid>.hbin, rebuilt when
+	# a left list or the manifest is newer, and matched from there. Algorithms that can not be converted are indexed as text
+	def add_dir(self, path = config.LEFTLIST_DIR, algids = None, binary = False):
+		manifest = {}
+		if os.path.exists(os.path.join(path, "manifest.json")):
+			with open(os.path.join(path, "manifest.json"), "r") as manifestfile:
+				manifest = json.load(manifestfile)
+		skipped = []
+		files = {}
+		for name in sorted(os.listdir(path)):
+			jobid, ext = os.path.splitext(name)
+			if ext != ".txt" or not jobid.isdigit():
+				continue
+			algid = str(manifest[jobid]['algorithmId']) if jobid in manifest else algids[0] if algids is not None and len(algids) == 1 else None
+			if algid is None:
+				skipped.append(name)
+				continue
+			if algids is not None and algid not in algids:
+				continue
+			files.setdefault(algid, []).append(os.path.join(path, name))
+		for algid, sources in files.items():
+			if binary:
+				binpath = os.path.join(path, "%s.hbin" % (algid))
+				try:
+					# The manifest changes when sync drops closed jobs, which leaves no newer left list behind
+					changed = [source for source in sources + [os.path.join(path, "manifest.json")] if os.path.exists(source)]
+					if not os.path.exists(binpath) or os.path.getmtime(binpath) < max(os.path.getmtime(source) for source in changed):
+						build(sources, binpath)
+					self.add_store(algid, BinaryLeftList(binpath))
+					self.jobs += len(sources)
+					continue
+				except ValueError:
+					None
+			for source in sources:
+				self.add(algid, source)
+		return skipped
+
+	# Finds the algorithms and keys a potfile line cracks. Text left lists and binary left lists are both checked,
+	# algorithms matching the same key are merged. Returns list of (key, plaintext, algids), empty when nothing matched
+	def lookup(self, line):
+		fields = line.split(":")
+		founds = []
+		for count in sorted(self.index, reverse=True):
+			if len(fields) <= count:
+				continue
+			key = hash_key(fields[0:count])
+			algids = self.index[count].get(key)
+			if algids is not None:
+				founds.append((key, ":".join(fields[count:]), algids if isinstance(algids, tuple) else (algids,)))
+				break
+		if self.stores and len(fields) > 1:
+			key = hash_key(fields[0:1])
+			algids = tuple(algid for algid, store in self.stores if key in store)
+			if algids:
+				if founds and founds[0][0] == key:
+					founds[0] = (key, founds[0][1], founds[0][2] + tuple(algid for algid in algids if algid not in founds[0][2]))
+				else:
+					founds.append((key, ":".join(fields[1:]), algids))
+		return founds
+
+	# Streams a potfile and writes one deduplicated founds file per algorithm to <outdir>/<algid>.txt
+	# Lines already uploaded according to the upload log are left out
+	# Returns (totals dict, dict of algid to founds written)
+	def match(self, potfile, outdir):
+		os.makedirs(outdir, exist_ok=True)
+		totals = {"read": 0, "matched": 0, "already uploaded": 0, "duplicate": 0, "unmatched": 0, "malformed": 0}
+		written = {}
+		outfiles = {}
+		seen = set()
+		try:
+			with open(potfile, "r", errors="replace") as infile:
+				for line in infile:
+					line = line.rstrip("\r\n")
+					if not line:
+						continue
+					totals['read'] += 1
+					if ":" not in line:
+						totals['malformed'] += 1
+						continue
+					founds = self.lookup(line)
+					if not founds:
+						totals['unmatched'] += 1
+						continue
+					founds = [(key, plaintext, algids) for key, plaintext, algids in founds if key not in seen]
+					if not founds:
+						totals['duplicate'] += 1
+						continue
+					new = []
+					for key, plaintext, algids in founds:
+						seen.add(key)
+						found = "%s:%s" % (key, plaintext)
+						new.extend((algid, found) for algid in algids if self.log is None or not self.log.seen(algid, found))
+					if not new:
+						totals['already uploaded'] += 1
+						continue
+					totals['matched'] += 1
+					for algid, found in new:
+						if algid not in outfiles:
+							outfiles[algid] = open(os.path.join(outdir, "%s.txt" % (algid)), "w")
+							written[algid] = 0
+						outfiles[algid].write(found + "\n")
+						written[algid] += 1
+		finally:
+			for outfile in outfiles.values():
+				outfile.close()
+		return totals, written
@@ -0,0 +1,113 @@
+import os
+import sys
+import heapq
+import shutil
+import tempfile
+from inc import config
+
+# Rough per entry overhead of a dict key and a set of job ids, used to estimate memory use
+ENTRY_OVERHEAD = 200
+
+# Writes the in memory entries as a sorted run of "hash<TAB>jobid,jobid" lines
+def spill(entries, directory, number):
+	path = os.path.join(directory, "run%s.txt" % (number))
+	with open(path, "w") as run:
+		for line in sorted(entries):
+			run.write("%s\t%s\n" % (line, ",".join(sorted(entries[line]))))
+	return path
+
+# Reads a sorted run back as (hash, [jobids]) tuples
+# Job ids never contain a tab, so lines are split on the last one and hashes containing tabs are kept whole
+def read_run(path):
+	with open(path, "r") as run:
+		for line in run:
+			hashh, jobids = line.rstrip("\n").rsplit("\t", 1)
+			yield hashh, jobids.split(",")
+
+# Merges left lists into one deduplicated file and an index of which jobs contain each hash
+# sources is a list of (jobid, path) tuples. Entries are kept in memory until budget megabytes are used, then
+# spilled to sorted runs which are combined with an external merge
+# outfile gets one hash per line, indexfile gets "hash<TAB>jobid,jobid" lines split on their last tab. Both are sorted by hash
+# No index is written when indexfile is None
+# Returns (lines read, unique hashes written)
+def merge_leftlists(sources, outfile, indexfile, budget = config.MERGE_MEMORY_BUDGET):
+	limit = budget * (1 << 20)
+	entries = {}
+	used = 0
+	runs = []
+	total = 0
+	tempdir = tempfile.mkdtemp(prefix=".merge-", dir=os.path.dirname(os.path.abspath(outfile)))
+	try:
+		for jobid, path in sources:
+			jobid = str(jobid)
+			with open(path, "r", errors="replace") as infile:
+				for line in infile:
+					line = line.rstrip("\r\n")
+					if not line:
+						continue
+					total += 1
+					jobids = entries.get(line)
+					if jobids is None:
+						entries[line] = {jobid}
+						used += sys.getsizeof(line) + ENTRY_OVERHEAD
+					else:
+						jobids.add(jobid)
+					if used >= limit:
+						runs.append(spill(entries, tempdir, len(runs)))
+						entries = {}
+						used = 0
+		if runs and entries:
+			runs.append(spill(entries, tempdir, len(runs)))
+			entries = {}
+		if runs:
+			merged = heapq.merge(*[read_run(run) for run in runs])
+		else:
+			merged = ((line, entries[line]) for line in sorted(entries))
+		unique = 0
+		with open(outfile + ".tmp", "w") as out, open(indexfile + ".tmp" if indexfile is not None else os.devnull, "w") as index:
+			current, jobids = None, set()
+			for hashh, ids in merged:
+				if hashh != current:
+					if current is not None:
+						out.write(current + "\n")
+						if indexfile is not None:
+							index.write("%s\t%s\n" % (current, ",".join(sorted(jobids))))
+						unique += 1
+					current, jobids = hashh, set()
+				jobids.update(ids)
+			if current is not None:
+				out.write(current + "\n")
+				if indexfile is not None:
+					index.write("%s\t%s\n" % (current, ",".join(sorted(jobids))))
+				unique += 1
+		os.replace(outfile + ".tmp", outfile)
+		if indexfile is not None:
+			os.replace(indexfile + ".tmp", indexfile)
+	finally:
+		shutil.rmtree(tempdir, ignore_errors=True)
+	return total, unique
+
+# Next line of a sorted file without its newline, None at the end of the file
+def next_line(infile):
+	line = infile.readline()
+	return line[:-1] if line else None
+
+# Compares two sorted files of unique lines as written by merge_leftlists in one pass
+# Lines only in oldfile are written to removedfile and lines only in newfile to addedfile, None leaves a file out
+# Returns (removed, added) line counts
+def diff_sorted(oldfile, newfile, removedfile = None, addedfile = None):
+	removed, added = 0, 0
+	with open(oldfile, "r") as old, open(newfile, "r") as new, open(removedfile or os.devnull, "w") as removedout, open(addedfile or os.devnull, "w") as addedout:
+		a, b = next_line(old), next_line(new)
+		while a is not None or b is not None:
+			if b is None or (a is not None and a < b):
+				removedout.write(a + "\n")
+				removed += 1
+				a = next_line(old)
+			elif a is None or b < a:
+				addedout.write(b + "\n")
+				added += 1
+				b = next_line(new)
+			else:
+				a, b = next_line(old), next_line(new)
+	return removed, added
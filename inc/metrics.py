@@ -0,0 +1,190 @@
+import os
+import json
+import time
+import threading
+import contextlib
+import urllib.parse
+
+# Upper bounds in seconds of latency histogram buckets, the Prometheus client defaults
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Latency histogram with fixed buckets so recording a value never allocates
+class Histogram:
+	__slots__ = ("counts", "count", "sum", "max")
+
+	def __init__(self):
+		self.counts = [0] * (len(BUCKETS) + 1)
+		self.count = 0
+		self.sum = 0.0
+		self.max = 0.0
+
+	def observe(self, value):
+		i = 0
+		while i < len(BUCKETS) and value > BUCKETS[i]:
+			i += 1
+		self.counts[i] += 1
+		self.count += 1
+		self.sum += value
+		self.max = max(self.max, value)
+
+	# Estimated quantile, the upper bound of the bucket it falls in or the max seen for the last bucket
+	def quantile(self, q):
+		if self.count == 0:
+			return 0.0
+		rank = q * self.count
+		seen = 0
+		for i, count in enumerate(self.counts):
+			seen += count
+			if seen >= rank:
+				return min(BUCKETS[i], self.max) if i < len(BUCKETS) else self.max
+		return self.max
+
+	def avg(self):
+		return self.sum / self.count if self.count else 0.0
+
+	def to_dict(self):
+		return {"count": self.count, "sum": self.sum, "max": self.max, "buckets": dict(zip([str(bound) for bound in BUCKETS] + ["+Inf"], self.counts))}
+
+# Endpoint name of a request url, left lists are grouped together as every job has its own path
+def endpoint(method, url):
+	path = urllib.parse.urlsplit(url).path
+	if path.startswith("/unfound/"):
+		path = "/unfound/*"
+	return "%s %s" % (method, path)
+
+# Counters for API calls, commands and the websocket
+# Time a command spends in requests and JSON parsing is only counted for requests made from the thread running the command,
+# what is left of the command time is rendering and local work
+class Metrics:
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.local = threading.local()
+		self.reset()
+
+	def reset(self):
+		with self.lock:
+			self.started = time.time()
+			self.endpoints = {}
+			self.commands = {}
+			self.websocket = {"messages": 0, "first": None, "last": None, "lag": Histogram()}
+
+	# Records one HTTP request
+	def request(self, method, url, status, size, seconds, error = False):
+		name = endpoint(method, url)
+		with self.lock:
+			row = self.endpoints.get(name)
+			if row is None:
+				row = self.endpoints[name] = {"requests": 0, "errors": 0, "bytes": 0, "statuses": {}, "latency": Histogram()}
+			row['requests'] += 1
+			row['bytes'] += size
+			if error or status is None or status >= 400:
+				row['errors'] += 1
+			if status is not None:
+				row['statuses'][str(status)] = row['statuses'].get(str(status), 0) + 1
+			row['latency'].observe(seconds)
+		phase = getattr(self.local, "phase", None)
+		if phase is not None:
+			phase['network'] += seconds
+
+	# Records time spent decoding a JSON response
+	def parse(self, seconds):
+		phase = getattr(self.local, "phase", None)
+		if phase is not None:
+			phase['parse'] += seconds
+
+	# Times a command run inside the with block
+	@contextlib.contextmanager
+	def command(self, name):
+		phase = {"network": 0.0, "parse": 0.0}
+		self.local.phase = phase
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			total = time.perf_counter() - start
+			self.local.phase = None
+			with self.lock:
+				row = self.commands.get(name)
+				if row is None:
+					row = self.commands[name] = {"runs": 0, "network": 0.0, "parse": 0.0, "other": 0.0, "latency": Histogram()}
+				row['runs'] += 1
+				row['network'] += phase['network']
+				row['parse'] += phase['parse']
+				row['other'] += max(0.0, total - phase['network'] - phase['parse'])
+				row['latency'].observe(total)
+
+	# Records a websocket message being received
+	def message(self):
+		now = time.time()
+		with self.lock:
+			ws = self.websocket
+			ws['messages'] += 1
+			if ws['first'] is None:
+				ws['first'] = now
+			ws['last'] = now
+
+	# Records the time from a websocket message being received until the hook finished with it
+	def hook(self, lag):
+		with self.lock:
+			self.websocket['lag'].observe(lag)
+
+	# Websocket messages a second between the first and last message
+	def message_rate(self):
+		ws = self.websocket
+		if ws['messages'] < 2 or ws['last'] == ws['first']:
+			return 0.0
+		return (ws['messages'] - 1) / (ws['last'] - ws['first'])
+
+	# Returns all metrics as a dict that can be dumped as JSON
+	def snapshot(self):
+		with self.lock:
+			endpoints = dict((name, dict(row, latency=row['latency'].to_dict(), statuses=dict(row['statuses']))) for name, row in self.endpoints.items())
+			commands = dict((name, dict(row, latency=row['latency'].to_dict())) for name, row in self.commands.items())
+			ws = self.websocket
+			websocket = {"messages": ws['messages'], "rate": self.message_rate(), "lag": ws['lag'].to_dict()}
+		return {"started": self.started, "uptime": time.time() - self.started, "endpoints": endpoints, "commands": commands, "websocket": websocket}
+
+	# Returns all metrics in the Prometheus text format
+	def prometheus(self):
+		lines = []
+		def histogram(metric, labels, hist):
+			seen = 0
+			for bound, count in zip([str(bound) for bound in BUCKETS] + ["+Inf"], hist.counts):
+				seen += count
+				lines.append('%s_bucket{%sle="%s"} %s' % (metric, labels, bound, seen))
+			lines.append("%s_sum{%s} %s" % (metric, labels.rstrip(","), hist.sum))
+			lines.append("%s_count{%s} %s" % (metric, labels.rstrip(","), hist.count))
+		with self.lock:
+			lines.append("# TYPE hashes_requests_total counter")
+			for name, row in self.endpoints.items():
+				lines.append('hashes_requests_total{endpoint="%s"} %s' % (name, row['requests']))
+			lines.append("# TYPE hashes_request_errors_total counter")
+			for name, row in self.endpoints.items():
+				lines.append('hashes_request_errors_total{endpoint="%s"} %s' % (name, row['errors']))
+			lines.append("# TYPE hashes_request_bytes_total counter")
+			for name, row in self.endpoints.items():
+				lines.append('hashes_request_bytes_total{endpoint="%s"} %s' % (name, row['bytes']))
+			lines.append("# TYPE hashes_request_seconds histogram")
+			for name, row in self.endpoints.items():
+				histogram("hashes_request_seconds", 'endpoint="%s",' % (name), row['latency'])
+			lines.append("# TYPE hashes_command_seconds histogram")
+			for name, row in self.commands.items():
+				histogram("hashes_command_seconds", 'command="%s",' % (name), row['latency'])
+			lines.append("# TYPE hashes_command_phase_seconds_total counter")
+			for name, row in self.commands.items():
+				for phase in ("network", "parse", "other"):
+					lines.append('hashes_command_phase_seconds_total{command="%s",phase="%s"} %s' % (name, phase, row[phase]))
+			lines.append("# TYPE hashes_websocket_messages_total counter")
+			lines.append("hashes_websocket_messages_total %s" % (self.websocket['messages']))
+			lines.append("# TYPE hashes_hook_lag_seconds histogram")
+			histogram("hashes_hook_lag_seconds", "", self.websocket['lag'])
+		return "\n".join(lines) + "\n"
+
+	# Writes metrics to path, as JSON when it ends in .json and in the Prometheus text format otherwise
+	# Written to a temp file first so a collector never reads half a file
+	def export(self, path):
+		data = json.dumps(self.snapshot(), indent=4) if path.endswith(".json") else self.prometheus()
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		with open(path + ".tmp", "w") as outfile:
+			outfile.write(data)
+		os.replace(path + ".tmp", path)
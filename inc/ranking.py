@@ -0,0 +1,133 @@
+import os
+import re
+import json
+import time
+import hashlib
+from inc import config
+
+# Algorithms that can be timed with hashlib: algorithm id to function hashing one candidate
+# Salted variants of a fast algorithm run at the same speed as the plain one
+FAST = {
+	"0": lambda data: hashlib.md5(data).digest(),
+	"100": lambda data: hashlib.sha1(data).digest(),
+	"1300": lambda data: hashlib.sha224(data).digest(),
+	"1400": lambda data: hashlib.sha256(data).digest(),
+	"10800": lambda data: hashlib.sha384(data).digest(),
+	"1700": lambda data: hashlib.sha512(data).digest(),
+	"17400": lambda data: hashlib.sha3_256(data).digest(),
+	"17500": lambda data: hashlib.sha3_384(data).digest(),
+	"900": lambda data: hashlib.new("md4", data).digest(),
+	"1000": lambda data: hashlib.new("md4", data.decode().encode("utf-16le")).digest(),
+}
+SAME_SPEED = {"10": "0", "20": "0", "21": "0", "110": "100", "120": "100", "1410": "1400", "1420": "1400", "1710": "1700", "1720": "1700"}
+
+# Algorithms where every hash has its own salt, so each candidate has to be hashed once per hash left
+# Algorithms with "salt" in their name are treated as salted as well
+SALTED = frozenset([
+	"10", "11", "12", "20", "21", "22", "23", "30", "40", "110", "111", "112", "120", "121", "122", "124", "130", "140",
+	"400", "500", "1100", "1410", "1411", "1420", "1430", "1440", "1710", "1711", "1720", "1722", "1730", "1740", "1731",
+	"1800", "2100", "2500", "2611", "2711", "2811", "3200", "3710", "3910", "5500", "5600", "6300", "6400", "6500",
+	"7100", "7400", "7900", "8900", "10000", "10900", "12000", "12100", "13400", "22000",
+])
+
+# Times each hashlib algorithm for about seconds and returns dict of algorithm id to hashes per second
+def benchmark(seconds = 0.1):
+	speeds = {}
+	candidates = [("password%d" % (i)).encode() for i in range(1000)]
+	for algid, func in FAST.items():
+		try:
+			func(b"test")
+		except ValueError:
+			# md4 is missing from some OpenSSL builds
+			continue
+		count = 0
+		start = time.perf_counter()
+		while time.perf_counter() - start < seconds:
+			for candidate in candidates:
+				func(candidate)
+			count += len(candidates)
+		speeds[algid] = count / (time.perf_counter() - start)
+	for algid, base in SAME_SPEED.items():
+		if base in speeds:
+			speeds[algid] = speeds[base]
+	return speeds
+
+# Reads hash speeds from a JSON file of algorithm id to hashes per second or from hashcat --benchmark output
+# Raises ValueError when the file is neither
+def load_speeds(path):
+	with open(path, "r", errors="replace") as speedfile:
+		text = speedfile.read()
+	try:
+		data = json.loads(text)
+	except ValueError:
+		data = None
+	if data is not None:
+		if not isinstance(data, dict):
+			raise ValueError("%s is not a valid speeds file, JSON speeds must be an object of algorithm ID to H/s." % (path))
+		try:
+			return dict((str(algid), float(speed)) for algid, speed in data.items())
+		except (TypeError, ValueError):
+			raise ValueError("%s is not a valid speeds file, every speed must be a number of H/s." % (path))
+	units = {"": 1, "k": 1e3, "M": 1e6, "G": 1e9, "T": 1e12}
+	speeds = {}
+	mode = None
+	for line in text.splitlines():
+		match = re.search(r"Hash-Mode (\d+)", line)
+		if match:
+			mode = match.group(1)
+			continue
+		match = re.search(r"Speed\.#(\*|1)\.*:\s*([\d.]+) ?([kMGT]?)H/s", line)
+		if match and mode is not None:
+			speed = float(match.group(2)) * units[match.group(3)]
+			# The combined speed of all devices wins over the first device
+			if match.group(1) == "*" or mode not in speeds:
+				speeds[mode] = speed
+	if not speeds:
+		raise ValueError("%s is not a valid speeds file, no JSON or hashcat benchmark speeds were found." % (path))
+	return speeds
+
+# Hash speeds used for ranking
+# Benchmarked once with hashlib and saved, overrides from a hashcat benchmark replace the measured speeds
+def get_speeds(path = config.SPEEDS_FILE, override = None, rerun = False):
+	speeds = None
+	if not rerun and os.path.exists(path):
+		try:
+			with open(path, "r") as speedfile:
+				speeds = json.load(speedfile)
+		except ValueError:
+			speeds = None
+	if speeds is None:
+		speeds = {"measured": benchmark(), "override": {}}
+	if override is not None:
+		speeds['override'].update(load_speeds(override))
+	try:
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		with open(path, "w") as speedfile:
+			json.dump(speeds, speedfile, indent=4)
+	except OSError as e:
+		print(e)
+	merged = dict(speeds['measured'])
+	merged.update(speeds['override'])
+	return merged
+
+# Ranks jobs by expected USD per unit of compute
+# payout is pricePerHashUsd times the hashes still paid for (the smaller of maxCracksNeeded - foundHashes and leftHashes).
+# Every candidate costs 1 / speed seconds, times leftHashes for algorithms with a salt per hash.
+# score is payout divided by the seconds one candidate costs, so it compares jobs for the same wordlist or attack.
+# Jobs for algorithms without a known speed get a score of None and are listed last
+# Returns list of dicts sorted best first
+def rank_jobs(jobs, speeds, names = {}):
+	columns = [jobs.column(name) for name in ("id", "algorithmId", "currency", "foundHashes", "leftHashes", "maxCracksNeeded", "pricePerHashUsd")]
+	ranked = []
+	for jobid, algid, currency, found, left, maxcracks, priceusd in zip(*columns):
+		algid = str(algid)
+		payout = priceusd * max(0, min(maxcracks - found, left))
+		speed = speeds.get(algid)
+		salted = algid in SALTED or "salt" in names.get(algid, "").lower()
+		score = None
+		if speed:
+			cost = (max(left, 1) if salted else 1) / speed
+			score = payout / cost
+		ranked.append({"id": jobid, "algorithmId": algid, "currency": currency, "leftHashes": left, "payoutUsd": payout, "speed": speed, "salted": salted, "score": score})
+	ranked.sort(key=lambda row: (row['score'] is not None, row['score'] or 0, row['payoutUsd']), reverse=True)
+	return ranked
@@ -0,0 +1,50 @@
+import time
+import threading
+from inc import config
+
+# Cache of crypto to USD conversion rates
+# All rates are returned by a single call to /api/conversion so one fetch is shared by every conversion until the TTL runs out
+class RateCache:
+	def __init__(self, client, ttl = config.RATE_TTL):
+		self.client = client
+		self.ttl = ttl
+		self.snapshot = None
+		self.fetched = 0
+		self.lock = threading.Lock()
+
+	# Returns dict of current rates, only fetching them when the cache is empty, expired or force is set
+	def rates(self, force = False):
+		with self.lock:
+			if force or self.snapshot is None or time.time() - self.fetched >= self.ttl:
+				self.snapshot = self.client.get_json("/en/api/conversion")
+				self.fetched = time.time()
+			return self.snapshot
+
+	# Drops cached rates so the next conversion fetches them again
+	def invalidate(self):
+		with self.lock:
+			self.snapshot = None
+			self.fetched = 0
+
+	# Converts a single value. Rates can be passed in to price several values from the same snapshot
+	# Credits and currencies the API has no rate for are converted to N/A
+	def convert(self, value, currency, rates = None):
+		if currency.lower() == "credits":
+			return {"currentprice": None, "converted": "N/A"}
+		if rates is None:
+			rates = self.rates()
+		currentprice = rates.get(currency.upper())
+		if currentprice is None:
+			return {"currentprice": None, "converted": "N/A"}
+		converted = "${0:.3f}".format(float(value) * float(currentprice))
+		return {"currentprice": currentprice, "converted": converted}
+
+	# Converts a list of (value, currency) pairs using one rate snapshot
+	def convert_many(self, values):
+		rates = None
+		results = []
+		for value, currency in values:
+			if rates is None and currency.lower() != "credits":
+				rates = self.rates()
+			results.append(self.convert(value, currency, rates))
+		return results
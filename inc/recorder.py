@@ -0,0 +1,76 @@
+import json
+import time
+import asyncio
+import websockets
+from inc import config
+from inc.market import POLL, NEW
+
+# Samples the job list on a schedule and captures every new job pushed on the websocket into a MarketStore
+# Websocket jobs are buffered and written with the next poll, or sooner once flush of them are waiting
+class Recorder:
+	def __init__(self, store, fetch, url = None, interval = config.RECORD_INTERVAL, flush = config.RECORD_FLUSH):
+		self.store = store
+		self.fetch = fetch
+		self.url = url
+		self.interval = interval
+		self.flush = flush
+		self.pending = []
+		self.counters = {"polls": 0, "sampled": 0, "new": 0, "errors": 0}
+
+	def write_pending(self):
+		if self.pending:
+			self.store.record(self.pending, NEW)
+			self.pending = []
+
+	async def poll(self):
+		while True:
+			try:
+				table = await asyncio.to_thread(self.fetch)
+				self.write_pending()
+				written = self.store.record(table, POLL)
+				self.counters['polls'] += 1
+				self.counters['sampled'] += written
+				print("[%s] Sampled %s jobs, %s changed." % (time.strftime("%H:%M:%S"), len(table), written))
+			except Exception as e:
+				self.counters['errors'] += 1
+				print("Poll failed: %s" % (e))
+			await asyncio.sleep(self.interval)
+
+	# Reads new jobs from the websocket forever, reconnecting when it drops
+	# Polling carries on when the websocket can not be used at all
+	async def listen(self):
+		try:
+			async for ws in websockets.connect(self.url):
+				try:
+					print("Connected to hashes.com websocket API...")
+					while True:
+						message = json.loads(await ws.recv())
+						if message.get('success') == False:
+							print(message.get('message'))
+							continue
+						new = message.get('new', [])
+						self.counters['new'] += len(new)
+						self.pending.extend(new)
+						if len(self.pending) >= self.flush:
+							self.write_pending()
+				except websockets.exceptions.ConnectionClosedError:
+					# Redundant close request to avoid 3 connection limit error
+					await ws.close()
+					print("\nConnection closed. Reconnecting...")
+					await asyncio.sleep(5)
+					continue
+				except websockets.exceptions.ConnectionClosedOK:
+					break
+		except (websockets.exceptions.WebSocketException, OSError) as e:
+			print("Websocket failed, only sampling the job list: %s" % (e))
+
+	async def run(self):
+		print("Recording to %s every %s seconds." % (self.store.path, self.interval))
+		print("Use Ctrl + C to stop recording.\n")
+		tasks = [self.poll()]
+		if self.url is not None:
+			tasks.append(self.listen())
+		try:
+			await asyncio.gather(*tasks)
+		finally:
+			self.write_pending()
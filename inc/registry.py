@@ -0,0 +1,122 @@
+import os
+import re
+import json
+import time
+import threading
+from inc import config
+from inc.algorithms import validalgs
+
+# Splits an algorithm name into lower case words
+def tokens(text):
+	return re.findall(r"[a-z0-9]+", text.lower())
+
+# Algorithms supported by hashes.com
+# Starts from inc/algorithms.py and the list saved in ALGORITHMS_FILE, then refreshes with a conditional GET once
+# the saved list is older than ttl. A refresh replaces algorithms with a new dict instead of changing it in place,
+# so a command reading the old one from another thread never sees it change size under it
+class AlgorithmRegistry:
+	def __init__(self, client, path = config.ALGORITHMS_FILE, ttl = config.ALGORITHMS_TTL, algorithms = validalgs):
+		self.client = client
+		self.path = path
+		self.ttl = ttl
+		self.algorithms = algorithms
+		self.meta = {"fetched": 0, "etag": None, "modified": None}
+		self.index = {}
+		self.lock = threading.Lock()
+		if os.path.exists(path):
+			try:
+				with open(path, "r") as algfile:
+					saved = json.load(algfile)
+				self.apply(saved['algorithms'])
+				self.meta = saved['meta']
+			except (OSError, ValueError, KeyError):
+				None
+		self.build()
+
+	# Builds the word prefix index used by search
+	def build(self):
+		index = {}
+		for aid, name in self.algorithms.items():
+			for token in tokens(name):
+				for i in range(1, len(token) + 1):
+					index.setdefault(token[:i], set()).add(aid)
+		self.index = index
+
+	# Replaces the algorithm list and returns (added, removed, renamed) where renamed is a dict of id to (old, new)
+	def apply(self, latest):
+		with self.lock:
+			current = self.algorithms
+			added = [aid for aid in latest if aid not in current]
+			removed = [aid for aid in current if aid not in latest]
+			renamed = dict((aid, (current[aid], name)) for aid, name in latest.items() if aid in current and current[aid] != name)
+			self.algorithms = dict(latest)
+		return added, removed, renamed
+
+	def save(self):
+		try:
+			os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+			with open(self.path + ".tmp", "w") as algfile:
+				json.dump({"algorithms": dict(self.algorithms), "meta": self.meta}, algfile, indent=4)
+			os.replace(self.path + ".tmp", self.path)
+		except OSError as e:
+			print(e)
+
+	def stale(self):
+		return time.time() - self.meta['fetched'] >= self.ttl
+
+	# Checks hashes.com for changes to the algorithm list
+	# Returns (added, removed, renamed) or None when the list could not be fetched
+	def refresh(self, force = False):
+		if not force and not self.stale():
+			return [], [], {}
+		headers = {}
+		if self.meta.get('etag'):
+			headers['If-None-Match'] = self.meta['etag']
+		if self.meta.get('modified'):
+			headers['If-Modified-Since'] = self.meta['modified']
+		resp = self.client.get("/en/api/algorithms", headers=headers)
+		if resp.status_code == 304:
+			self.meta['fetched'] = time.time()
+			self.save()
+			return [], [], {}
+		json2 = self.client.decode(resp)
+		if json2.get('success') != True:
+			return None
+		latest = dict((str(alg['id']), alg['algorithmName']) for alg in json2['list'])
+		changes = self.apply(latest)
+		self.build()
+		self.meta = {"fetched": time.time(), "etag": resp.headers.get("ETag"), "modified": resp.headers.get("Last-Modified")}
+		self.save()
+		return changes
+
+	# Runs refresh in a background thread and calls done with its result
+	def refresh_async(self, done = None, force = False):
+		def run():
+			try:
+				changes = self.refresh(force)
+			except Exception:
+				changes = None
+			if done is not None:
+				done(changes)
+		thread = threading.Thread(target=run, daemon=True)
+		thread.start()
+		return thread
+
+	# Returns list of (id, name) sorted by id
+	def items(self):
+		with self.lock:
+			return sorted(self.algorithms.items(), key=lambda item: int(item[0]) if item[0].isdigit() else 0)
+
+	# Returns ids of algorithms with a word starting with every word of text
+	# Text without any words, e.g. "$", falls back to a plain substring match
+	def search(self, text):
+		words = tokens(text)
+		if not words:
+			with self.lock:
+				return [aid for aid, name in self.algorithms.items() if text.upper() in name.upper()]
+		index = self.index
+		found = None
+		for word in words:
+			ids = index.get(word, set())
+			found = set(ids) if found is None else found & ids
+		return sorted(found, key=lambda aid: int(aid) if aid.isdigit() else 0)
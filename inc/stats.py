@@ -0,0 +1,28 @@
+# Totals of hashes and value left in escrow grouped by algorithm and currency
+# Works in one pass over the columns of a JobTable and keeps every amount numeric
+# Returns dict:
+# {
+#	'algorithms': {algid: {'left': int, 'found': int, 'usd': float, 'currencies': {currency: float}}},
+#	'totals': {'left': int, 'found': int, 'usd': float, 'currencies': {currency: float}},
+#	'currencies': [sorted list of every currency seen]
+# }
+def escrow_stats(jobs):
+	algorithms = {}
+	totals = {"left": 0, "found": 0, "usd": 0.0, "currencies": {}}
+	columns = [jobs.column(name) for name in ("algorithmId", "currency", "foundHashes", "leftHashes", "maxCracksNeeded", "pricePerHash", "pricePerHashUsd")]
+	for algid, currency, found, left, maxcracks, price, priceusd in zip(*columns):
+		neededleft = maxcracks - found
+		stats = algorithms.get(algid)
+		if stats is None:
+			stats = algorithms[algid] = {"left": 0, "found": 0, "usd": 0.0, "currencies": {}}
+		value = price * neededleft
+		usd = priceusd * neededleft
+		stats['left'] += left
+		stats['found'] += found
+		stats['usd'] += usd
+		stats['currencies'][currency] = stats['currencies'].get(currency, 0.0) + value
+		totals['left'] += left
+		totals['found'] += found
+		totals['usd'] += usd
+		totals['currencies'][currency] = totals['currencies'].get(currency, 0.0) + value
+	return {"algorithms": algorithms, "totals": totals, "currencies": sorted(totals['currencies'])}
@@ -0,0 +1,114 @@
+import os
+import json
+import shutil
+import tempfile
+from inc import config
+from inc.downloader import Downloader
+from inc.merge import merge_leftlists, diff_sorted
+
+# Number of hashes in a left list
+def count_lines(path):
+	count = 0
+	with open(path, "r", errors="replace") as infile:
+		for line in infile:
+			if line.rstrip("\r\n"):
+				count += 1
+	return count
+
+# Works out the hashes removed from and added to a left list without holding either copy in memory
+# Both copies are sorted with the external merge in a temp directory and compared in one pass
+# Returns (removed, added) and writes them to removedfile and addedfile
+def diff_leftlists(oldfile, newfile, removedfile, addedfile, budget = config.MERGE_MEMORY_BUDGET):
+	tempdir = tempfile.mkdtemp(prefix=".sync-", dir=os.path.dirname(os.path.abspath(newfile)))
+	try:
+		merge_leftlists([(0, oldfile)], os.path.join(tempdir, "old.txt"), None, budget)
+		merge_leftlists([(0, newfile)], os.path.join(tempdir, "new.txt"), None, budget)
+		return diff_sorted(os.path.join(tempdir, "old.txt"), os.path.join(tempdir, "new.txt"), removedfile, addedfile)
+	finally:
+		shutil.rmtree(tempdir, ignore_errors=True)
+
+# Local copies of job left lists kept up to date with escrow
+# A manifest records the lastUpdate, foundHashes and algorithm of every copy so only jobs that changed are downloaded again
+class LeftListStore:
+	def __init__(self, client, path = config.LEFTLIST_DIR):
+		self.client = client
+		self.path = path
+		self.manifestpath = os.path.join(path, "manifest.json")
+		os.makedirs(path, exist_ok=True)
+		self.manifest = {}
+		if os.path.exists(self.manifestpath):
+			try:
+				with open(self.manifestpath, "r") as manifestfile:
+					self.manifest = json.load(manifestfile)
+			except ValueError:
+				self.manifest = {}
+
+	def save(self):
+		with open(self.manifestpath + ".tmp", "w") as manifestfile:
+			json.dump(self.manifest, manifestfile)
+		os.replace(self.manifestpath + ".tmp", self.manifestpath)
+
+	# Path of the local copy of a job
+	def leftlist(self, jobid):
+		return os.path.join(self.path, "%s.txt" % (jobid))
+
+	# Returns True if the local copy of job matches escrow
+	def current(self, job):
+		entry = self.manifest.get(str(job['id']))
+		return entry is not None and entry['lastUpdate'] == job['lastUpdate'] and entry['foundHashes'] == job['foundHashes'] and os.path.exists(self.leftlist(job['id']))
+
+	# Brings the local copies of jobs up to date and works out what changed
+	# Removed and added hashes of every changed job are written to <outdir>/<jobid>_removed.txt and <jobid>_added.txt
+	# openjobs is the full escrow list, local copies of jobs missing from it are dropped
+	# Both lists are sorted by hash. budget is the megabytes the external sort may use
+	# Returns list of dicts describing each job and list of job ids that are no longer in escrow
+	def sync(self, jobs, openjobs, outdir = None, workers = config.DOWNLOAD_WORKERS, chunksize = config.DOWNLOAD_CHUNK_SIZE, budget = config.MERGE_MEMORY_BUDGET):
+		if outdir is None:
+			outdir = self.path
+		os.makedirs(outdir, exist_ok=True)
+		changed = [job for job in jobs if not self.current(job)]
+		changedids = set(job['id'] for job in changed)
+		# Previous copies are moved aside so they can be compared once the new copy is downloaded
+		previous = {}
+		for job in changed:
+			path = self.leftlist(job['id'])
+			if os.path.exists(path):
+				os.replace(path, path + ".prev")
+				previous[job['id']] = path + ".prev"
+		downloaded = Downloader(self.client, workers, chunksize).run(changed, outdir=self.path) if changed else {}
+		results = []
+		for job in jobs:
+			result = {"id": job['id'], "algorithmId": job['algorithmId'], "leftHashes": job['leftHashes'], "status": "current", "removed": 0, "added": 0}
+			if job['id'] in changedids:
+				if job['id'] not in downloaded:
+					result['status'] = "failed"
+					if job['id'] in previous:
+						os.replace(previous[job['id']], self.leftlist(job['id']))
+					results.append(result)
+					continue
+				if job['id'] in previous:
+					result['status'] = "updated"
+					result['removed'], result['added'] = diff_leftlists(previous[job['id']], self.leftlist(job['id']), os.path.join(outdir, "%s_removed.txt" % (job['id'])), os.path.join(outdir, "%s_added.txt" % (job['id'])), budget)
+					os.remove(previous[job['id']])
+				else:
+					result['status'] = "new"
+					result['added'] = count_lines(self.leftlist(job['id']))
+				self.manifest[str(job['id'])] = {"lastUpdate": job['lastUpdate'], "foundHashes": job['foundHashes'], "algorithmId": job['algorithmId']}
+			results.append(result)
+		self.save()
+		return results, self.closed(openjobs)
+
+	# Returns ids of jobs in the manifest that are no longer in escrow and forgets them
+	def closed(self, openjobs):
+		openids = set(str(job['id']) for job in openjobs)
+		gone = []
+		for jobid in list(self.manifest):
+			if jobid in openids:
+				continue
+			gone.append(jobid)
+			for suffix in ("", ".ckpt"):
+				if os.path.exists(self.leftlist(jobid) + suffix):
+					os.remove(self.leftlist(jobid) + suffix)
+			del self.manifest[jobid]
+		self.save()
+		return gone
@@ -0,0 +1,100 @@
+import os
+import time
+import sqlite3
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from inc import config
+
+# Normalises a founds line, returns None for lines that can not be uploaded
+def normalise(line):
+	line = line.rstrip("\r\n").strip()
+	if not line or ":" not in line:
+		return None
+	hashh = line.split(":", 1)[0]
+	if not hashh:
+		return None
+	return line
+
+# Tracks which founds have already been uploaded for each algorithm and the chunks they were sent in
+class UploadLog:
+	def __init__(self, path = config.UPLOAD_DB_FILE):
+		os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+		self.db = sqlite3.connect(path, check_same_thread=False)
+		self.lock = threading.Lock()
+		self.db.execute("CREATE TABLE IF NOT EXISTS uploaded (algid TEXT NOT NULL, line TEXT NOT NULL, chunk INTEGER NOT NULL, PRIMARY KEY (algid, line))")
+		self.db.execute("CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY AUTOINCREMENT, algid TEXT NOT NULL, source TEXT NOT NULL, lines INTEGER NOT NULL, status TEXT NOT NULL, uploaded REAL NOT NULL)")
+		self.db.commit()
+
+	def seen(self, algid, line):
+		with self.lock:
+			return self.db.execute("SELECT 1 FROM uploaded WHERE algid = ? AND line = ?", (algid, line)).fetchone() is not None
+
+	# Records a chunk and, when it was accepted, every line in it. Returns the chunk id
+	def record(self, algid, source, lines, status):
+		with self.lock:
+			cur = self.db.execute("INSERT INTO chunks (algid, source, lines, status, uploaded) VALUES (?, ?, ?, ?, ?)", (algid, source, len(lines), status, time.time()))
+			chunk = cur.lastrowid
+			if status == "uploaded":
+				self.db.executemany("INSERT OR IGNORE INTO uploaded VALUES (?, ?, ?)", [(algid, line, chunk) for line in lines])
+			self.db.commit()
+			return chunk
+
+	def close(self):
+		self.db.close()
+
+# Prepares and uploads a founds file
+# The file is streamed, lines are normalised and deduplicated, lines uploaded before are dropped and
+# what is left is split into chunks that are uploaded at the same time
+class Uploader:
+	def __init__(self, client, log = None, chunklines = config.UPLOAD_CHUNK_LINES, workers = config.UPLOAD_WORKERS):
+		self.client = client
+		self.log = log if log is not None else UploadLog()
+		self.chunklines = max(1, chunklines)
+		self.workers = max(1, workers)
+
+	# Reads the founds file and returns (lines to upload, stats dict)
+	def prepare(self, algid, path):
+		stats = {"read": 0, "malformed": 0, "duplicate": 0, "uploaded before": 0, "new": 0}
+		seen = set()
+		lines = []
+		with open(path, "r", errors="replace") as infile:
+			for raw in infile:
+				stats['read'] += 1
+				line = normalise(raw)
+				if line is None:
+					if raw.strip():
+						stats['malformed'] += 1
+					continue
+				if line in seen:
+					stats['duplicate'] += 1
+					continue
+				seen.add(line)
+				if self.log.seen(algid, line):
+					stats['uploaded before'] += 1
+					continue
+				lines.append(line)
+		stats['new'] = len(lines)
+		return lines, stats
+
+	# Uploads one chunk of lines, returns (number, lines, status, chunk id, time)
+	def send(self, algid, source, number, lines):
+		handle, temp = tempfile.mkstemp(prefix="founds-", suffix=".txt")
+		try:
+			with os.fdopen(handle, "w") as chunkfile:
+				chunkfile.write("\n".join(lines) + "\n")
+			with open(temp, "rb") as userfile:
+				post = self.client.post_json("/en/api/founds", files={"userfile": (os.path.basename(source), userfile)}, data=self.client.keyed({"algo": algid}))
+			status = "uploaded" if post["success"] == True else "failed: %s" % (post.get("message", "rejected"))
+		except Exception as e:
+			status = "failed: %s" % (e)
+		finally:
+			os.remove(temp)
+		chunk = self.log.record(algid, source, lines, status)
+		return {"chunk": number, "lines": len(lines), "status": status, "id": chunk, "time": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+	# Uploads lines in chunks and returns a result dict per chunk in order
+	def upload(self, algid, source, lines):
+		chunks = [lines[i:i + self.chunklines] for i in range(0, len(lines), self.chunklines)]
+		with ThreadPoolExecutor(max_workers=self.workers) as pool:
+			return list(pool.map(lambda c: self.send(algid, source, c[0] + 1, c[1]), enumerate(chunks)))
@@ -0,0 +1,91 @@
+import time
+import threading
+from inc import config
+
+# Watches any number of jobs from one background thread
+# Every poll fetches the job list once and updates all watched jobs from it. Jobs that changed are polled again
+# after fast seconds, jobs that did not change back off to slow seconds. Only jobs whose found or left hashes
+# changed are printed so the prompt stays usable while watching
+class Watcher:
+	def __init__(self, fetch, fast = config.WATCH_FAST_INTERVAL, slow = config.WATCH_SLOW_INTERVAL, output = print):
+		self.fetch = fetch
+		self.fast = fast
+		self.slow = slow
+		self.output = output
+		self.jobs = {}
+		self.lock = threading.Lock()
+		self.wake = threading.Event()
+		self.thread = None
+
+	# Starts watching jobids for length minutes
+	def watch(self, jobids, length):
+		now = time.time()
+		with self.lock:
+			for jobid in jobids:
+				self.jobs[str(jobid)] = {"expires": now + 60 * length, "due": now, "interval": self.fast, "found": None, "left": None}
+			if self.thread is None:
+				self.thread = threading.Thread(target=self.run, daemon=True)
+				self.thread.start()
+		self.wake.set()
+
+	# Stops watching jobids or every job when none are given
+	def stop(self, jobids = None):
+		with self.lock:
+			for jobid in list(self.jobs) if jobids is None else jobids:
+				self.jobs.pop(str(jobid), None)
+		self.wake.set()
+
+	# Returns list of (job id, found, left, seconds until next poll, seconds until watch ends)
+	def status(self):
+		now = time.time()
+		with self.lock:
+			return [(jobid, job['found'], job['left'], max(0, int(job['due'] - now)), max(0, int(job['expires'] - now))) for jobid, job in self.jobs.items()]
+
+	def run(self):
+		while True:
+			with self.lock:
+				if not self.jobs:
+					self.thread = None
+					return
+				now = time.time()
+				for jobid in [jobid for jobid, job in self.jobs.items() if job['expires'] <= now]:
+					del self.jobs[jobid]
+					self.output("Watch completed on job ID: %s" % (jobid))
+				due = [jobid for jobid, job in self.jobs.items() if job['due'] <= now]
+				wait = min([job['due'] for job in self.jobs.values()] or [now]) - now
+			if due:
+				self.poll()
+			else:
+				self.wake.wait(max(0, wait))
+				self.wake.clear()
+
+	# Fetches the job list once and updates every watched job from it
+	def poll(self):
+		try:
+			table = self.fetch()
+		except Exception as e:
+			self.output("Watch poll failed: %s" % (e))
+			with self.lock:
+				for job in self.jobs.values():
+					job['due'] = time.time() + self.fast
+			return
+		now = time.time()
+		stamp = time.strftime("%H:%M:%S")
+		with self.lock:
+			jobs = table.filter(jobids = list(self.jobs))
+			for row in jobs:
+				job = self.jobs[str(row['id'])]
+				found, left = row['foundHashes'], row['leftHashes']
+				if job['found'] is None:
+					self.output("[%s] Job %s: %s cracked, %s left" % (stamp, row['id'], found, left))
+					job['interval'] = self.fast
+				elif found != job['found'] or left != job['left']:
+					self.output("[%s] Job %s: %s cracked (%+d), %s left (%+d)" % (stamp, row['id'], found, found - job['found'], left, left - job['left']))
+					job['interval'] = self.fast
+				else:
+					job['interval'] = min(job['interval'] * 2, self.slow)
+				job['found'], job['left'] = found, left
+				job['due'] = now + job['interval']
+			for jobid in jobs.missing(list(self.jobs)):
+				del self.jobs[jobid]
+				self.output("Job ID %s is no longer valid." % (jobid))